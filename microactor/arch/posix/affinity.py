@@ -0,0 +1,42 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+
+
+def _get_sched_setaffinity():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno = True)
+        func = libc.sched_setaffinity
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_void_p]
+    return func
+
+_sched_setaffinity = _get_sched_setaffinity()
+
+def is_supported():
+    return _sched_setaffinity is not None
+
+def cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+def set_thread_affinity(cpus):
+    """pins the calling thread to the given set of CPUs (linux only)"""
+    if _sched_setaffinity is None:
+        raise OSError("setting CPU affinity is not supported on this platform")
+    cpus = list(cpus)
+    words = max(cpus) // 64 + 1
+    mask = (ctypes.c_uint64 * words)()
+    for cpu in cpus:
+        mask[cpu // 64] |= 1 << (cpu % 64)
+    # pid 0 stands for the calling thread
+    if _sched_setaffinity(0, ctypes.sizeof(mask), ctypes.byref(mask)) != 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
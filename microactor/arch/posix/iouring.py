@@ -0,0 +1,289 @@
+"""
+a minimal ctypes binding of linux's io_uring: sets up the rings, queues
+submissions and reaps completions. only what the reactor needs is exposed
+"""
+import os
+import sys
+import mmap
+import errno
+import ctypes
+import ctypes.util
+import platform
+
+
+# the io_uring syscalls share the same numbers on all architectures
+SYS_io_uring_setup = 425
+SYS_io_uring_enter = 426
+
+IORING_OP_NOP = 0
+IORING_OP_POLL_ADD = 6
+IORING_OP_POLL_REMOVE = 7
+IORING_OP_ACCEPT = 13
+IORING_OP_ASYNC_CANCEL = 14
+IORING_OP_CONNECT = 16
+IORING_OP_SEND = 26
+IORING_OP_RECV = 27
+
+IORING_ENTER_GETEVENTS = 1 << 0
+IORING_ENTER_EXT_ARG = 1 << 3
+# linux 5.11; implies all of the opcodes above
+IORING_FEAT_EXT_ARG = 1 << 8
+
+IORING_OFF_SQ_RING = 0
+IORING_OFF_CQ_RING = 0x8000000
+IORING_OFF_SQES = 0x10000000
+
+POLLIN = 0x001
+POLLPRI = 0x002
+POLLOUT = 0x004
+POLLERR = 0x008
+POLLHUP = 0x010
+POLLRDHUP = 0x2000
+
+# the rings are shared with the kernel, which takes memory barriers on its
+# side. ctypes can't take them on ours, so this binding relies on x86's 
+# ordering: stores aren't reordered with other stores (the tail is published 
+# after the entries), and loads aren't reordered with other loads or with 
+# later stores (completions are read after the tail, and the head is 
+# released after them). weakly ordered CPUs (ARM, POWER...) aren't supported
+STRONGLY_ORDERED = platform.machine().lower() in ("x86_64", "amd64", "i386", 
+    "i486", "i586", "i686", "x86")
+
+# missing from python 2's errno
+ECANCELED = getattr(errno, "ECANCELED", 125)
+
+MSG_NOSIGNAL = 0x4000
+SOCK_CLOEXEC = 0o2000000
+
+u8 = ctypes.c_uint8
+u16 = ctypes.c_uint16
+u32 = ctypes.c_uint32
+u64 = ctypes.c_uint64
+s32 = ctypes.c_int32
+s64 = ctypes.c_int64
+
+class SqringOffsets(ctypes.Structure):
+    _fields_ = [("head", u32), ("tail", u32), ("ring_mask", u32),
+        ("ring_entries", u32), ("flags", u32), ("dropped", u32), ("array", u32),
+        ("resv1", u32), ("user_addr", u64)]
+
+class CqringOffsets(ctypes.Structure):
+    _fields_ = [("head", u32), ("tail", u32), ("ring_mask", u32),
+        ("ring_entries", u32), ("overflow", u32), ("cqes", u32), ("flags", u32),
+        ("resv1", u32), ("user_addr", u64)]
+
+class Params(ctypes.Structure):
+    _fields_ = [("sq_entries", u32), ("cq_entries", u32), ("flags", u32),
+        ("sq_thread_cpu", u32), ("sq_thread_idle", u32), ("features", u32),
+        ("wq_fd", u32), ("resv", u32 * 3), ("sq_off", SqringOffsets),
+        ("cq_off", CqringOffsets)]
+
+class Sqe(ctypes.Structure):
+    _fields_ = [("opcode", u8), ("flags", u8), ("ioprio", u16), ("fd", s32),
+        ("off", u64), ("addr", u64), ("len", u32), ("op_flags", u32),
+        ("user_data", u64), ("buf_index", u16), ("personality", u16),
+        ("splice_fd_in", s32), ("addr3", u64), ("pad", u64)]
+
+class Cqe(ctypes.Structure):
+    _fields_ = [("user_data", u64), ("res", s32), ("flags", u32)]
+
+class KernelTimespec(ctypes.Structure):
+    _fields_ = [("tv_sec", s64), ("tv_nsec", s64)]
+
+class GeteventsArg(ctypes.Structure):
+    _fields_ = [("sigmask", u64), ("sigmask_sz", u32), ("pad", u32), ("ts", u64)]
+
+
+def _get_syscall():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno = True)
+        func = libc.syscall
+    except (OSError, AttributeError):
+        return None
+    func.restype = ctypes.c_long
+    return func
+
+_syscall = _get_syscall()
+
+def _raise_errno():
+    err = ctypes.get_errno()
+    raise OSError(err, os.strerror(err))
+
+def _address_of(mm):
+    return ctypes.addressof(ctypes.c_char.from_buffer(mm))
+
+def _map(fd, size, offset):
+    return mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE,
+        offset = offset)
+
+
+class IoUring(object):
+    """a submission/completion ring pair. submissions are queued with
+    ``prep`` and handed to the kernel (in a single syscall) by ``enter``,
+    which may also wait for completions; ``reap`` returns the completions
+    that are available, as (user_data, res) tuples"""
+
+    def __init__(self, entries = 256):
+        if _syscall is None:
+            raise OSError(errno.ENOSYS, "io_uring is not supported on this platform")
+        params = Params()
+        fd = _syscall(ctypes.c_long(SYS_io_uring_setup), ctypes.c_long(entries),
+            ctypes.byref(params))
+        if fd < 0:
+            _raise_errno()
+        self.fd = fd
+        self._maps = []
+        try:
+            self._setup(params)
+        except Exception:
+            self.close()
+            raise
+
+    def _setup(self, params):
+        self.features = params.features
+        self.sq_entries = params.sq_entries
+        self.cq_entries = params.cq_entries
+        sq_off = params.sq_off
+        cq_off = params.cq_off
+
+        sq_map = _map(self.fd, sq_off.array + params.sq_entries * 4, IORING_OFF_SQ_RING)
+        self._maps.append(sq_map)
+        base = _address_of(sq_map)
+        self._sq_head = u32.from_address(base + sq_off.head)
+        self._sq_tail = u32.from_address(base + sq_off.tail)
+        self._sq_mask = u32.from_address(base + sq_off.ring_mask).value
+        self._sq_array = (u32 * params.sq_entries).from_address(base + sq_off.array)
+
+        sqes_map = _map(self.fd, params.sq_entries * ctypes.sizeof(Sqe), IORING_OFF_SQES)
+        self._maps.append(sqes_map)
+        self._sqes = (Sqe * params.sq_entries).from_address(_address_of(sqes_map))
+
+        cq_map = _map(self.fd, cq_off.cqes + params.cq_entries * ctypes.sizeof(Cqe),
+            IORING_OFF_CQ_RING)
+        self._maps.append(cq_map)
+        base = _address_of(cq_map)
+        self._cq_head = u32.from_address(base + cq_off.head)
+        self._cq_tail = u32.from_address(base + cq_off.tail)
+        self._cq_mask = u32.from_address(base + cq_off.ring_mask).value
+        self._cqes = (Cqe * params.cq_entries).from_address(base + cq_off.cqes)
+
+        # our (not yet published) tail of the submission queue
+        self._tail = self._sq_tail.value
+        self._ts = KernelTimespec()
+        self._arg = GeteventsArg()
+
+    def close(self):
+        if self.fd < 0:
+            return
+        self._sqes = self._cqes = self._sq_array = None
+        for mm in self._maps:
+            try:
+                mm.close()
+            except (BufferError, ValueError):
+                # pointers into it may still be alive; the mapping will go
+                # away along with them
+                pass
+        del self._maps[:]
+        os.close(self.fd)
+        self.fd = -1
+
+    def __len__(self):
+        """the number of queued (not yet submitted) submissions"""
+        return (self._tail - self._sq_tail.value) & 0xffffffff
+
+    def prep(self, opcode, fd, addr = 0, length = 0, off = 0, op_flags = 0,
+            user_data = 0):
+        """queues a submission; returns False if the submission queue is full
+        (``enter`` it and try again)"""
+        tail = self._tail
+        if (tail - self._sq_head.value) & 0xffffffff >= self.sq_entries:
+            return False
+        index = tail & self._sq_mask
+        sqe = self._sqes[index]
+        ctypes.memset(ctypes.addressof(sqe), 0, ctypes.sizeof(Sqe))
+        sqe.opcode = opcode
+        sqe.fd = fd
+        sqe.addr = addr
+        sqe.len = length
+        sqe.off = off
+        sqe.op_flags = op_flags
+        sqe.user_data = user_data
+        self._sq_array[index] = index
+        self._tail = (tail + 1) & 0xffffffff
+        return True
+
+    def enter(self, wait = False, timeout = None):
+        """submits all queued submissions; with ``wait``, blocks until at
+        least one completion is available, or ``timeout`` (seconds) elapses.
+        returns the number of submissions consumed"""
+        to_submit = len(self)
+        # the tail is published only now, so the kernel never sees a
+        # half-written entry (see STRONGLY_ORDERED)
+        self._sq_tail.value = self._tail
+        if wait:
+            flags = IORING_ENTER_GETEVENTS | IORING_ENTER_EXT_ARG
+            min_complete = 1
+            if timeout is None:
+                self._arg.ts = 0
+            else:
+                self._ts.tv_sec = int(timeout)
+                self._ts.tv_nsec = int((timeout - int(timeout)) * 1000000000)
+                self._arg.ts = ctypes.addressof(self._ts)
+            arg = ctypes.addressof(self._arg)
+            argsz = ctypes.sizeof(self._arg)
+        elif not to_submit:
+            return 0
+        else:
+            flags = min_complete = arg = argsz = 0
+        res = _syscall(ctypes.c_long(SYS_io_uring_enter), ctypes.c_long(self.fd),
+            ctypes.c_long(to_submit), ctypes.c_long(min_complete),
+            ctypes.c_long(flags), ctypes.c_void_p(arg), ctypes.c_long(argsz))
+        if res < 0:
+            err = ctypes.get_errno()
+            # ETIME: the timeout expired; EBUSY: the completion queue
+            # overflowed and must be reaped first
+            if err in (errno.EINTR, errno.ETIME, errno.EAGAIN, errno.EBUSY):
+                return 0
+            raise OSError(err, os.strerror(err))
+        return res
+
+    def reap(self):
+        """returns a list of (user_data, res) of the available completions"""
+        # the completions are read only after the tail, and the head is 
+        # released only after them (see STRONGLY_ORDERED)
+        head = self._cq_head.value
+        tail = self._cq_tail.value
+        if head == tail:
+            return []
+        mask = self._cq_mask
+        cqes = self._cqes
+        completions = []
+        while head != tail:
+            cqe = cqes[head & mask]
+            completions.append((cqe.user_data, cqe.res))
+            head = (head + 1) & 0xffffffff
+        self._cq_head.value = head
+        return completions
+
+
+_supported = None
+
+def is_supported():
+    """checks (once) whether io_uring is available and recent enough (5.11);
+    it may be missing, disabled by sysctl, or blocked by seccomp. it's not
+    used on CPUs this binding can't order its memory accesses on"""
+    global _supported
+    if _supported is None:
+        if not STRONGLY_ORDERED:
+            _supported = False
+            return _supported
+        try:
+            ring = IoUring(4)
+        except EnvironmentError:
+            _supported = False
+        else:
+            _supported = bool(ring.features & IORING_FEAT_EXT_ARG)
+            ring.close()
+    return _supported
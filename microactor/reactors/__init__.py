@@ -1,10 +1,12 @@
 from .base import BaseReactor, ReactorError
-from .posix import SelectReactor,  PollReactor, EpollReactor, KqueueReactor
+from .posix import (SelectReactor,  PollReactor, EpollReactor, KqueueReactor, 
+    IoUringReactor, AsyncioReactor)
 from .windows import IocpReactor
+from .group import ReactorGroup
 
 
 def get_reactor_factory():
-    for cls in [EpollReactor, KqueueReactor, IocpReactor, PollReactor, SelectReactor]:
+    for cls in [IoUringReactor, EpollReactor, KqueueReactor, IocpReactor, PollReactor, SelectReactor]:
         if cls.supported():
             return cls
     raise ReactorError("no reactor supports this platform")
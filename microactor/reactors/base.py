@@ -1,7 +1,10 @@
 import sys
-import time
 import weakref
-from microactor.utils.colls import MinHeap
+import traceback
+from microactor.utils.timers import TimingWheel, monotonic
+from collections import deque
+from microactor.utils.colls import CallbackQueue
+from .stats import ReactorStats
 from microactor.utils import ReactorDeferred
 from microactor.subsystems import GENERIC_SUBSYSTEMS
 
@@ -14,20 +17,40 @@ class BaseReactor(object):
         MAX_TIMEOUT = 0.2   # to process Ctrl+C
     else:
         MAX_TIMEOUT = 1
+    TIMER_RESOLUTION = 0.001
+    # callback lanes: I/O completions run ahead of work posted by ``call``
+    LANE_IO = 0
+    LANE_DEFAULT = 1
+    # per-iteration budget of _process_callbacks; whatever remains is left
+    # for the next iteration, so that a burst of callbacks can't starve 
+    # I/O polling. None means unlimited
+    CALLBACKS_BUDGET = 2000
+    CALLBACKS_TIME_BUDGET = 0.02
     SUBSYSTEMS = GENERIC_SUBSYSTEMS
     
     def __init__(self):
         self._active = False
-        self._jobs = MinHeap()
-        self._callbacks = []
+        self._jobs = TimingWheel(self.TIMER_RESOLUTION, self.clock)
+        self._callbacks = CallbackQueue(2)
+        # callbacks posted from other threads, drained once per iteration
+        self._inbox = deque()
+        self._wakeup_pending = False
         #self._rcallbacks = []
         self._subsystems = []
         self.started = ReactorDeferred(weakref.proxy(self))
+        self._instrumented = False
+        self.stats = ReactorStats(weakref.proxy(self))
 
     @classmethod
     def supported(cls):
         return False
     
+    @staticmethod
+    def clock():
+        """the reactor's (monotonic) clock; timestamps passed to ``call_at``
+        are given in terms of this clock"""
+        return monotonic()
+    
     #===========================================================================
     # Core
     #===========================================================================
@@ -81,35 +104,155 @@ class BaseReactor(object):
         raise NotImplementedError()
     
     def _work(self):
-        now = time.time()
+        if self._instrumented:
+            return self._work_instrumented()
+        now = self.clock()
         timeout = self._process_jobs(now)
-        if self._callbacks:
+        if self._callbacks or self._inbox:
             timeout = 0
         self._handle_transports(min(timeout, self.MAX_TIMEOUT))
+        if self._inbox:
+            self._drain_inbox()
         self._process_callbacks()
     
+    def _work_instrumented(self):
+        stats = self.stats
+        t0 = now = self.clock()
+        timeout = min(self._process_jobs(now), self.MAX_TIMEOUT)
+        if self._callbacks or self._inbox:
+            timeout = 0
+        for hook in stats._before_poll:
+            hook(timeout)
+        events = self._handle_transports(timeout) or 0
+        for hook in stats._after_poll:
+            hook(events)
+        if self._inbox:
+            self._drain_inbox()
+        t1 = self.clock()
+        callbacks = self._process_callbacks()
+        if stats.enabled:
+            stats._record_iteration(t0, t1, self.clock(), events, callbacks, 
+                self._get_num_of_transports())
+    
+    def _get_num_of_transports(self):
+        return 0
+    
+    def _drain_inbox(self):
+        # clear the flag *before* draining: a producer that still sees it set
+        # has already appended its callback, so we're bound to pick it up
+        self._wakeup_pending = False
+        inbox = self._inbox
+        lane = self._callbacks.lanes[self.LANE_DEFAULT]
+        for _ in range(len(inbox)):
+            lane.append(inbox.popleft())
+    
     def _process_jobs(self, now):
-        while self._jobs:
-            ts, func, args, kwargs  = self._jobs.peek()
-            if now < ts:
-                return ts - now
-            self._jobs.pop()
-            self._callbacks.append((func, args, kwargs))
-        return self.MAX_TIMEOUT
+        expired = self._jobs.pop_expired(now)
+        for timer in expired:
+            self._callbacks.push(self.LANE_DEFAULT, timer.fire)
+        if expired and self._instrumented and self.stats.enabled:
+            self.stats._record_lateness(now, expired)
+        deadline = self._jobs.next_deadline()
+        if deadline is None:
+            return self.MAX_TIMEOUT
+        return max(deadline - now, 0)
     
     def _process_callbacks(self):
-        callbacks = self._callbacks
-        self._callbacks = []
-        for cb, args, kwargs in callbacks:
-            cb(*args, **kwargs)
+        # only callbacks that were queued before we started count; anything
+        # queued while processing will run on the next iteration
+        count = len(self._callbacks)
+        if not count:
+            return 0
+        if self.CALLBACKS_BUDGET is not None:
+            count = min(count, self.CALLBACKS_BUDGET)
+        if self.CALLBACKS_TIME_BUDGET is not None:
+            tmax = self.clock() + self.CALLBACKS_TIME_BUDGET
+        else:
+            tmax = None
+        hooked = self._instrumented and self.stats._callback_hooked
+        pop = self._callbacks.pop
+        i = 0
+        while i < count:
+            cb = pop()
+            if hooked:
+                if cb.__class__ is tuple:
+                    self._run_hooked(*cb)
+                else:
+                    self._run_hooked(cb, (), None)
+            elif cb.__class__ is tuple:
+                cb, args, kwargs = cb
+                cb(*args, **kwargs)
+            else:
+                cb()
+            i += 1
+            if tmax is not None and not (i & 15) and self.clock() > tmax:
+                break
+        return i
     
     #===========================================================================
     # Callbacks
     #===========================================================================
     def call(self, func, *args, **kwargs):
-        self._callbacks.append((func, args, kwargs))
+        self._callbacks.push(self.LANE_DEFAULT, func, args, kwargs)
+    def call_threadsafe(self, func, *args, **kwargs):
+        """like ``call``, but may be invoked from any thread. wakeups are 
+        coalesced: the reactor is woken up at most once per iteration, no 
+        matter how many callbacks are posted"""
+        if args or kwargs:
+            self._inbox.append((func, args, kwargs))
+        else:
+            self._inbox.append(func)
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self._wakeup()
+    def _call_io(self, func, *args):
+        """like ``call``, but for I/O completions (takes precedence). used 
+        where running the handler right away might reenter the caller"""
+        self._callbacks.push(self.LANE_IO, func, args)
+    def _dispatch(self, func, *args):
+        """runs an I/O handler right away, from within ``_handle_transports``.
+        an exception raised by the handler is confined to its transport"""
+        try:
+            if self._instrumented and self.stats._callback_hooked:
+                self._run_hooked(func, args, None)
+            else:
+                func(*args)
+        except Exception:
+            self._dispatch_failed(func, sys.exc_info())
+    def _run_hooked(self, func, args, kwargs):
+        # runs a callback between the stats' callback hooks
+        stats = self.stats
+        for hook in stats._before_callback:
+            hook(func, args)
+        try:
+            if kwargs:
+                func(*args, **kwargs)
+            else:
+                func(*args)
+        finally:
+            for hook in stats._after_callback:
+                hook(func, args)
+    def _dispatch_failed(self, func, exc_info):
+        print >>sys.stderr, "exception in I/O handler %r:" % (func,)
+        traceback.print_exception(*exc_info)
+        transport = getattr(func, "__self__", None)
+        if transport is None:
+            return
+        # the fd is probably still ready; drop the transport, or we'd spin
+        unregister = getattr(self, "unregister", None)
+        if unregister is not None:
+            unregister(transport)
+        on_error = getattr(transport, "on_error", None)
+        if on_error is not None and func != on_error:
+            self._call_io(on_error, exc_info[1])
     def call_at(self, ts, func, *args, **kwargs):
-        self._jobs.push((ts, func, args, kwargs))
+        """schedules ``func`` to be called at ``ts`` (in terms of 
+        ``reactor.clock()``); returns a cancellable Timer"""
+        return self._jobs.schedule(ts, func, args, kwargs)
+    def call_later(self, interval, func, *args, **kwargs):
+        """schedules ``func`` to be called in ``interval`` seconds; returns a 
+        cancellable Timer"""
+        return self._jobs.schedule(self.clock() + interval, func, args, kwargs)
     
     
 
@@ -0,0 +1,163 @@
+import os
+import signal
+import threading
+from microactor.utils import Deferred, ReactorDeferred, safe_import
+from .base import ReactorError
+affinity = safe_import("microactor.arch.posix.affinity")
+
+
+class ReactorGroup(object):
+    """a group of ``size`` reactors, each running in its own thread (or, if
+    ``use_processes`` is set, in its own forked process), optionally pinned
+    to a CPU. ``home`` is the reactor of the thread creating the group (if
+    any); results of ``call_in`` made from it are delivered back to it"""
+
+    def __init__(self, size = None, factory = None, use_processes = False,
+            pin_cpus = False, home = None):
+        if factory is None:
+            from microactor.reactors import get_reactor_factory
+            factory = get_reactor_factory()
+        if size is None:
+            size = affinity.cpu_count() if affinity else 1
+        if use_processes and not hasattr(os, "fork"):
+            raise ReactorError("process groups require fork()")
+        if pin_cpus and not (affinity and affinity.is_supported()):
+            raise ReactorError("pinning to CPUs is not supported on this platform")
+        self.size = size
+        self.factory = factory
+        self.use_processes = use_processes
+        self.pin_cpus = pin_cpus
+        self.reactors = []
+        self.index = None       # of this process' member, in forked children
+        self._threads = []
+        self._pids = []
+        self._by_thread = {}
+        self._next_index = 0
+        if home is not None:
+            self._by_thread[threading.current_thread().ident] = home
+        if not use_processes:
+            self.reactors = [factory() for _ in range(size)]
+
+    def __len__(self):
+        return self.size
+    def __iter__(self):
+        return iter(self.reactors)
+
+    def _pin(self, index):
+        if self.pin_cpus:
+            affinity.set_thread_affinity([index % affinity.cpu_count()])
+
+    def start(self, func = None):
+        """starts all member reactors; ``func(reactor)``, if given, is called
+        in the context of each member once it's running"""
+        if self._threads or self._pids:
+            raise ReactorError("group already started")
+        if self.use_processes:
+            for i in range(self.size):
+                pid = os.fork()
+                if pid == 0:
+                    self._run_child(i, func)
+                self._pids.append(pid)
+        else:
+            for i, reactor in enumerate(self.reactors):
+                if func is not None:
+                    reactor.call(func, reactor)
+                thd = threading.Thread(name = "reactor-%d" % (i,),
+                    target = self._run_member, args = (i, reactor))
+                thd.setDaemon(True)
+                self._threads.append(thd)
+                thd.start()
+
+    def _run_member(self, index, reactor):
+        self._by_thread[threading.current_thread().ident] = reactor
+        self._pin(index)
+        reactor.start()
+
+    def _run_child(self, index, func):
+        code = 0
+        try:
+            self.index = index
+            self._pin(index)
+            reactor = self.factory()
+            self.reactors = [reactor]
+            if func is not None:
+                reactor.call(func, reactor)
+            reactor.start()
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(self):
+        """stops all member reactors"""
+        if self.use_processes:
+            for pid in self._pids:
+                try:
+                    os.kill(pid, signal.SIGINT)
+                except OSError:
+                    pass
+        else:
+            for reactor in self.reactors:
+                reactor.call_threadsafe(reactor.stop)
+
+    def join(self, timeout = None):
+        """waits for all member threads (or processes) to finish"""
+        for thd in self._threads:
+            thd.join(timeout)
+        while self._pids:
+            pid = self._pids.pop()
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+
+    def next(self):
+        """returns the next member reactor, in a round-robin fashion"""
+        if not self.reactors:
+            raise ReactorError("no member reactors in this process")
+        reactor = self.reactors[self._next_index % len(self.reactors)]
+        self._next_index += 1
+        return reactor
+    __next__ = next
+
+    def current(self):
+        """returns the reactor of the calling thread (a member or the home
+        reactor), or None"""
+        return self._by_thread.get(threading.current_thread().ident)
+
+    def call_in(self, reactor, func, *args, **kwargs):
+        """invokes ``func(*args, **kwargs)`` in the context of the given member
+        reactor. returns a deferred that's set (in the context of the calling
+        reactor, if it belongs to the group) with the result of ``func``; if
+        ``func`` returns a deferred, its result is delivered instead"""
+        if self.use_processes:
+            raise ReactorError("call_in is not supported across processes")
+        origin = self.current()
+        if origin is None:
+            dfr = Deferred()
+        else:
+            dfr = ReactorDeferred(origin)
+
+        def reply(is_exc, val):
+            if origin is None:
+                dfr._set(is_exc, val)
+            elif is_exc:
+                origin.call_threadsafe(dfr.throw, val)
+            else:
+                origin.call_threadsafe(dfr.set, val)
+
+        def invoke():
+            try:
+                res = func(*args, **kwargs)
+            except Exception as ex:
+                reply(True, ex)
+            else:
+                if isinstance(res, Deferred):
+                    res.register(reply)
+                else:
+                    reply(False, res)
+
+        reactor.call_threadsafe(invoke)
+        return dfr
@@ -2,4 +2,6 @@ from .base import PosixBaseReactor, PosixPollingReactor
 from .selecting import SelectReactor
 from .polling import PollReactor, EpollReactor
 from .kqueue import KqueueReactor
+from .uring import IoUringReactor
+from .aio import AsyncioReactor
 
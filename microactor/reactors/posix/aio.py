@@ -0,0 +1,204 @@
+import functools
+from microactor.utils import safe_import
+from ..base import BaseReactor
+from .base import PosixBaseReactor, ReactorError
+asyncio = safe_import("asyncio")
+if not asyncio:
+    asyncio = safe_import("trollius")
+
+
+class AsyncioReactor(PosixBaseReactor):
+    """runs on top of an asyncio event loop, rather than polling by itself:
+    transports are registered with the loop's ``add_reader``/``add_writer``
+    and timers are scheduled with its ``call_at``, so both share a single
+    poller (see also microactor.utils.aio).
+
+    ``start()`` runs the loop until the reactor is stopped; where the loop
+    is run by someone else (e.g., ``asyncio.run``), use ``attach()``.
+
+    the loop polls on its own, so an iteration of this reactor is a batch of
+    its callbacks: ``reactor.stats`` hooks are called around each batch (the
+    time between batches counts as polling, and the events are the I/O 
+    handlers dispatched in the meantime), and the ``before_poll`` timeout
+    is None, as it's up to the loop"""
+
+    def __init__(self, loop = None):
+        # no WakeupTransport; the loop is woken up by call_soon_threadsafe
+        BaseReactor.__init__(self)
+        self._signal_handlers = {}
+        if loop is None:
+            loop = asyncio.get_event_loop()
+        self.loop = loop
+        self._transports = {}    # fd -> [transport, reading, writing]
+        self._scheduled = False
+        self._owns_loop = False
+        self._events = 0         # I/O handlers dispatched since the last batch
+        self._poll_started = None
+        self._install_builtin_subsystems()
+
+    @classmethod
+    def supported(cls):
+        return bool(asyncio)
+
+    #===========================================================================
+    # Core
+    #===========================================================================
+    def attach(self):
+        """activates the reactor on its loop, without running the loop"""
+        if self._active:
+            raise ReactorError("reactor already running")
+        self._active = True
+        self.started.set()
+        self._schedule()
+
+    def start(self):
+        self.attach()
+        self._owns_loop = True
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._owns_loop = False
+            self._active = False
+
+    def stop(self):
+        if not self._active:
+            return
+        PosixBaseReactor.stop(self)
+        if self._owns_loop:
+            # after the subsystems have been unloaded
+            self.call(self.loop.stop)
+
+    def _wakeup(self):
+        self.loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        if not self._scheduled:
+            self._scheduled = True
+            self.loop.call_soon(self._run_callbacks)
+
+    def _run_callbacks(self):
+        self._scheduled = False
+        if self._instrumented:
+            return self._run_callbacks_instrumented()
+        self._poll_started = None
+        try:
+            if self._inbox:
+                self._drain_inbox()
+            self._process_callbacks()
+        finally:
+            if self._callbacks or self._inbox:
+                # out of budget (or a callback blew up); let the loop get
+                # a word in first
+                self._schedule()
+
+    def _run_callbacks_instrumented(self):
+        stats = self.stats
+        events = self._events
+        self._events = 0
+        for hook in stats._after_poll:
+            hook(events)
+        t1 = self.clock()
+        t0 = self._poll_started if self._poll_started is not None else t1
+        callbacks = 0
+        try:
+            if self._inbox:
+                self._drain_inbox()
+            callbacks = self._process_callbacks()
+        finally:
+            if self._callbacks or self._inbox:
+                self._schedule()
+            if stats.enabled:
+                stats._record_iteration(t0, t1, self.clock(), events, callbacks,
+                    self._get_num_of_transports())
+            for hook in stats._before_poll:
+                hook(None)
+            self._poll_started = self.clock()
+
+    #===========================================================================
+    # Callbacks
+    #===========================================================================
+    def call(self, func, *args, **kwargs):
+        self._callbacks.push(self.LANE_DEFAULT, func, args, kwargs)
+        if not self._scheduled:
+            self._schedule()
+    def _call_io(self, func, *args):
+        self._callbacks.push(self.LANE_IO, func, args)
+        if not self._scheduled:
+            self._schedule()
+    def call_at(self, ts, func, *args, **kwargs):
+        """schedules ``func`` to be called at ``ts`` (in terms of
+        ``reactor.clock()``), with the loop's ``call_at``; returns a
+        cancellable handle"""
+        when = self.loop.time() + (ts - self.clock())
+        return self.loop.call_at(when, functools.partial(self.call, func, *args, **kwargs))
+    def call_later(self, interval, func, *args, **kwargs):
+        return self.loop.call_at(self.loop.time() + interval,
+            functools.partial(self.call, func, *args, **kwargs))
+
+    #===========================================================================
+    # Transports
+    #===========================================================================
+    def _get_entry(self, transport):
+        fd = transport.fileno()
+        entry = self._transports.get(fd)
+        if entry is None:
+            entry = self._transports[fd] = [transport, False, False]
+        elif entry[0] is not transport:
+            raise ReactorError("multiple transports registered for the same fd")
+        return fd, entry
+
+    def register_read(self, transport):
+        fd, entry = self._get_entry(transport)
+        if not entry[1]:
+            entry[1] = True
+            self.loop.add_reader(fd, self._on_readable, fd)
+    def register_write(self, transport):
+        fd, entry = self._get_entry(transport)
+        if not entry[2]:
+            entry[2] = True
+            self.loop.add_writer(fd, self._on_writable, fd)
+
+    def _unregister(self, transport, reading, writing):
+        try:
+            fd = transport.fileno()
+        except Exception:
+            # assume the fd has been closed
+            for fd, entry in self._transports.items():
+                if entry[0] is transport:
+                    break
+            else:
+                return
+        entry = self._transports.get(fd)
+        if entry is None or entry[0] is not transport:
+            return
+        if reading and entry[1]:
+            entry[1] = False
+            self.loop.remove_reader(fd)
+        if writing and entry[2]:
+            entry[2] = False
+            self.loop.remove_writer(fd)
+        if not entry[1] and not entry[2]:
+            del self._transports[fd]
+
+    def unregister_read(self, transport):
+        self._unregister(transport, True, False)
+    def unregister_write(self, transport):
+        self._unregister(transport, False, True)
+    def unregister(self, transport):
+        self._unregister(transport, True, True)
+
+    def _on_readable(self, fd):
+        entry = self._transports.get(fd)
+        if entry is not None and entry[1]:
+            self._events += 1
+            self._dispatch(entry[0].on_read)
+    def _on_writable(self, fd):
+        entry = self._transports.get(fd)
+        if entry is not None and entry[2]:
+            self._events += 1
+            self._dispatch(entry[0].on_write)
+
+    def _get_num_of_transports(self):
+        return len(self._transports)
@@ -34,6 +34,11 @@ class PosixBaseReactor(BaseReactor):
         raise NotImplementedError()
     def unregister_write(self, transport):
         raise NotImplementedError()
+    def unregister(self, transport):
+        """unregisters the transport altogether (e.g., before it's closed or
+        detached)"""
+        self.unregister_read(transport)
+        self.unregister_write(transport)
 
     #===========================================================================
     # POSIX Signals
@@ -68,11 +73,16 @@ class PosixBaseReactor(BaseReactor):
 class PosixPollingReactor(PosixBaseReactor):
     REGISTER_READ_MASK = NotImplemented
     REGISTER_WRITE_MASK = NotImplemented
+    # added to the read mask of transports marked as ``exclusive``
+    EXCLUSIVE_MASK = 0
 
     def __init__(self):
         PosixBaseReactor.__init__(self)
         self._transports = {}
-        self._prev_transports = {}
+        # the masks the poller currently knows of, and the fds whose masks
+        # have (possibly) changed since it was last updated
+        self._registered = {}
+        self._dirty = set()
         self._poller = NotImplemented
     
     def _register_transport(self, transport, flags):
@@ -84,6 +94,7 @@ class PosixPollingReactor(PosixBaseReactor):
         else:
             mask = 0
         self._transports[fd] = (transport, mask | flags)
+        self._dirty.add(fd)
     
     def _unregister_transport(self, transport, flags):
         try:
@@ -96,38 +107,76 @@ class PosixPollingReactor(PosixBaseReactor):
             return
         _, mask = self._transports[fd]
         new_mask = mask & ~flags
+        self._dirty.add(fd)
         if not new_mask:
             del self._transports[fd]
         else:
             self._transports[fd] = (transport, new_mask)
 
     def register_read(self, transport):
-        self._register_transport(transport, self.REGISTER_READ_MASK)
+        if self.EXCLUSIVE_MASK and getattr(transport, "exclusive", False):
+            self._register_transport(transport, self.REGISTER_READ_MASK | self.EXCLUSIVE_MASK)
+        else:
+            self._register_transport(transport, self.REGISTER_READ_MASK)
     def register_write(self, transport):
         self._register_transport(transport, self.REGISTER_WRITE_MASK)
     def unregister_read(self, transport):
-        self._unregister_transport(transport, self.REGISTER_READ_MASK)
+        self._unregister_transport(transport, self.REGISTER_READ_MASK | self.EXCLUSIVE_MASK)
     def unregister_write(self, transport):
         self._unregister_transport(transport, self.REGISTER_WRITE_MASK)
+    def unregister(self, transport):
+        try:
+            fd = transport.fileno()
+        except Exception:
+            self._prune(transport)
+            return
+        entry = self._transports.get(fd)
+        if entry is not None and entry[0] is not transport:
+            return
+        self._transports.pop(fd, None)
+        self._dirty.discard(fd)
+        # the transport is about to be closed; don't leave it to the next
+        # update, as by then the fd might belong to someone else
+        if self._registered.pop(fd, None) is not None:
+            try:
+                self._poller.unregister(fd)
+            except EnvironmentError:
+                pass
+
+    def _get_num_of_transports(self):
+        return len(self._transports)
 
     def _prune(self, transport):
         for fd, (trns, _) in self._transports.items():
             if trns is transport:
                 del self._transports[fd]
+                self._dirty.add(fd)
                 break
     
     def _update_poller(self):
-        for fd, (_, flags) in self._transports.items():
-            if fd not in self._prev_transports:
-                self._poller.register(fd, flags)
-            else:
-                _, prev_flags = self._prev_transports[fd]
-                if flags != prev_flags:
-                    self._poller.modify(fd, flags)
-        for fd in self._prev_transports:
-            if fd not in self._transports:
-                self._poller.unregister(fd)
-        self._prev_transports = self._transports.copy()
+        # only fds whose registration changed since the last iteration are 
+        # looked at, so the cost is independent of the number of idle fds
+        if not self._dirty:
+            return
+        registered = self._registered
+        for fd in self._dirty:
+            entry = self._transports.get(fd)
+            prev_flags = registered.get(fd)
+            if entry is None:
+                if prev_flags is not None:
+                    del registered[fd]
+                    try:
+                        self._poller.unregister(fd)
+                    except EnvironmentError:
+                        # the fd has already been closed (and thus removed)
+                        pass
+            elif prev_flags is None:
+                self._poller.register(fd, entry[1])
+                registered[fd] = entry[1]
+            elif entry[1] != prev_flags:
+                self._poller.modify(fd, entry[1])
+                registered[fd] = entry[1]
+        self._dirty.clear()
     
     def _get_events(self, timeout):
         self._update_poller()
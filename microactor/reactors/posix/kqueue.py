@@ -44,11 +44,18 @@ class KqueueReactor(PosixPollingReactor):
         return hasattr(select, "kqueue")
     
     def _handle_transports(self, timeout):
-        for e in self._get_events(timeout):
-            trns, _ = self._registered_with_epoll[e.ident]
+        dispatch = self._dispatch
+        events = self._get_events(timeout)
+        for e in events:
+            # handlers run right away, so an earlier one may have already
+            # unregistered this fd
+            entry = self._transports.get(e.ident)
+            if entry is None:
+                continue
             if e.filter == select.KQ_FILTER_READ:
-                self.call(trns.on_read)
-            if e.filter == select.KQ_FILTER_WRITE:
-                self.call(trns.on_write)
+                dispatch(entry[0].on_read)
+            elif e.filter == select.KQ_FILTER_WRITE:
+                dispatch(entry[0].on_write)
+        return len(events)
 
 
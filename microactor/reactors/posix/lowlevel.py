@@ -1,3 +1,5 @@
+import os
+import sys
 import fcntl
 from array import array
 
@@ -15,3 +17,47 @@ def get_pending_write(fd):
     fcntl.ioctl(fd, TIOCOUTQ, a, True)
     return a[0]
 
+
+
+# eventfd(2) flags
+EFD_CLOEXEC = 0o2000000
+EFD_NONBLOCK = 0o4000
+
+def _get_libc_eventfd():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno = True)
+        func = libc.eventfd
+    except (ImportError, OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_uint, ctypes.c_int]
+    def eventfd(initval, flags):
+        fd = func(initval, flags)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        return fd
+    return eventfd
+
+if hasattr(os, "eventfd"):
+    _eventfd = os.eventfd
+else:
+    _eventfd = _get_libc_eventfd()
+
+def eventfd():
+    """returns a non-blocking eventfd, or None if not supported"""
+    if _eventfd is None:
+        return None
+    try:
+        return _eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC)
+    except OSError:
+        return None
+
+def set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL, 0)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+    flags = fcntl.fcntl(fd, fcntl.F_GETFD, 0)
+    fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
@@ -1,4 +1,5 @@
 import select
+import errno
 from .base import PosixPollingReactor
 
 
@@ -17,41 +18,187 @@ class PollReactor(PosixPollingReactor):
 
     def _handle_transports(self, timeout):
         READ_MASK = select.POLLIN | select.POLLPRI | select.POLLHUP
+        dispatch = self._dispatch
         
-        for fd, flags in self._get_events(timeout):
-            trns, _ = self._registered_with_epoll[fd]
+        # poll() takes milliseconds
+        events = self._get_events(int(timeout * 1000))
+        for fd, flags in events:
+            # handlers run right away, so an earlier one may have already
+            # unregistered this fd
+            entry = self._transports.get(fd)
+            if entry is None:
+                continue
+            trns = entry[0]
             if flags & READ_MASK:
-                self.call(trns.on_read, -1)
-            if flags & select.POLLOUT:
-                self.call(trns.on_write, -1)
-            if flags & select.POLLERR or flags & select.POLLHUP:
-                self.call(trns.on_error, None)
+                dispatch(trns.on_read)
+            if flags & select.POLLOUT and fd in self._transports:
+                dispatch(trns.on_write)
+            if flags & select.POLLERR and fd in self._transports:
+                dispatch(trns.on_error, None)
+        return len(events)
 
 
 class EpollReactor(PosixPollingReactor):
     REGISTER_READ_MASK = getattr(select, "EPOLLIN", NotImplemented)
     REGISTER_WRITE_MASK = getattr(select, "EPOLLOUT", NotImplemented)
+    # EPOLLEXCLUSIVE (linux 4.5) is missing from older select modules
+    EXCLUSIVE_MASK = getattr(select, "EPOLLEXCLUSIVE", 1 << 28)
+    # EPOLLRDHUP (linux 2.6.17) is missing from older select modules
+    EDGE_MASK = (REGISTER_READ_MASK | REGISTER_WRITE_MASK | 
+        getattr(select, "EPOLLET", 1 << 31) | getattr(select, "EPOLLRDHUP", 0x2000))
+    # whether transports that support it (see BaseTransport.EDGE_TRIGGERED) 
+    # are registered edge-triggered by default
+    EDGE_TRIGGERED = False
     
-    def __init__(self):
+    def __init__(self, edge_triggered = None):
         PosixPollingReactor.__init__(self)
         self._poller = select.epoll()
+        if edge_triggered is None:
+            edge_triggered = self.EDGE_TRIGGERED
+        self.edge_triggered = edge_triggered
+        # fd -> [transport, interest]. edge-triggered fds are registered with
+        # the kernel once, for both directions, and stay registered until the
+        # transport is unregistered altogether; read/write interest is only
+        # tracked here, so it doesn't cost an epoll_ctl
+        self._edge_transports = {}
         self._install_builtin_subsystems()
 
     @classmethod
     def supported(cls):
         return hasattr(select, "epoll")
 
+    def _is_edge(self, transport):
+        return (self.edge_triggered and transport.EDGE_TRIGGERED and 
+            not getattr(transport, "exclusive", False))
+
+    def _register_edge(self, transport, flags):
+        fd = transport.fileno()
+        entry = self._edge_transports.get(fd)
+        if entry is None:
+            if fd in self._registered:
+                # currently registered level-triggered
+                self._transports.pop(fd, None)
+                del self._registered[fd]
+                self._dirty.discard(fd)
+                self._poller.modify(fd, self.EDGE_MASK)
+            else:
+                self._transports.pop(fd, None)
+                self._dirty.discard(fd)
+                try:
+                    self._poller.register(fd, self.EDGE_MASK)
+                except EnvironmentError as ex:
+                    if getattr(ex, "errno", None) != errno.EEXIST:
+                        raise
+                    self._poller.modify(fd, self.EDGE_MASK)
+            entry = self._edge_transports[fd] = [transport, 0]
+        elif entry[0] is not transport:
+            # the fd has been reused by a new transport (the old one was 
+            # closed without unregistering); re-arm it, so that we get a 
+            # fresh edge for whatever's pending
+            try:
+                self._poller.modify(fd, self.EDGE_MASK)
+            except EnvironmentError as ex:
+                if getattr(ex, "errno", None) != errno.ENOENT:
+                    raise
+                self._poller.register(fd, self.EDGE_MASK)
+            entry[0] = transport
+            entry[1] = 0
+        entry[1] |= flags
+        # the edge may have already passed while we weren't interested
+        if flags & self.REGISTER_READ_MASK and transport._readable:
+            self._call_io(transport.on_read)
+        if flags & self.REGISTER_WRITE_MASK and transport._writable:
+            self._call_io(transport.on_write)
+
+    def _unregister_edge(self, transport, flags):
+        try:
+            fd = transport.fileno()
+        except Exception:
+            # assume fd has been closed
+            self._prune(transport)
+            return False
+        entry = self._edge_transports.get(fd)
+        if entry is None or entry[0] is not transport:
+            return False
+        entry[1] &= ~flags
+        return True
+
+    def register_read(self, transport):
+        if self._is_edge(transport):
+            self._register_edge(transport, self.REGISTER_READ_MASK)
+        else:
+            PosixPollingReactor.register_read(self, transport)
+    def register_write(self, transport):
+        if self._is_edge(transport):
+            self._register_edge(transport, self.REGISTER_WRITE_MASK)
+        else:
+            PosixPollingReactor.register_write(self, transport)
+    def unregister_read(self, transport):
+        if not self._unregister_edge(transport, self.REGISTER_READ_MASK):
+            PosixPollingReactor.unregister_read(self, transport)
+    def unregister_write(self, transport):
+        if not self._unregister_edge(transport, self.REGISTER_WRITE_MASK):
+            PosixPollingReactor.unregister_write(self, transport)
+    def unregister(self, transport):
+        try:
+            fd = transport.fileno()
+        except Exception:
+            self._prune(transport)
+            return
+        entry = self._edge_transports.get(fd)
+        if entry is None or entry[0] is not transport:
+            PosixPollingReactor.unregister(self, transport)
+            return
+        del self._edge_transports[fd]
+        try:
+            self._poller.unregister(fd)
+        except EnvironmentError:
+            pass
+        transport._readable = transport._writable = False
+
+    def _prune(self, transport):
+        for fd, entry in self._edge_transports.items():
+            if entry[0] is transport:
+                del self._edge_transports[fd]
+                return
+        PosixPollingReactor._prune(self, transport)
+
+    def _get_num_of_transports(self):
+        return len(self._transports) + len(self._edge_transports)
+
     def _handle_transports(self, timeout):
         READ_MASK = select.EPOLLIN | select.EPOLLPRI | select.EPOLLHUP
+        EDGE_READ_MASK = READ_MASK | self.EDGE_MASK & ~select.EPOLLOUT & ~select.EPOLLET
+        dispatch = self._dispatch
         
-        for fd, flags in self._get_events(timeout):
-            trns, _ = self._transports[fd]
+        events = self._get_events(timeout)
+        for fd, flags in events:
+            # handlers run right away, so an earlier one may have already
+            # unregistered this fd
+            entry = self._edge_transports.get(fd)
+            if entry is not None:
+                trns = entry[0]
+                if flags & EDGE_READ_MASK:
+                    trns._readable = True
+                    if entry[1] & self.REGISTER_READ_MASK:
+                        dispatch(trns.on_read)
+                if flags & select.EPOLLOUT:
+                    trns._writable = True
+                    if entry[1] & self.REGISTER_WRITE_MASK and self._edge_transports.get(fd) is entry:
+                        dispatch(trns.on_write)
+                if flags & select.EPOLLERR and self._edge_transports.get(fd) is entry:
+                    dispatch(trns.on_error, None)
+                continue
+            entry = self._transports.get(fd)
+            if entry is None:
+                continue
+            trns = entry[0]
             if flags & READ_MASK:
-                self.call(trns.on_read)
-            if flags & select.EPOLLOUT:
-                self.call(trns.on_write)
-            if flags & select.EPOLLERR:
-                self.call(trns.on_error, None)
-
+                dispatch(trns.on_read)
+            if flags & select.EPOLLOUT and fd in self._transports:
+                dispatch(trns.on_write)
+            if flags & select.EPOLLERR and fd in self._transports:
+                dispatch(trns.on_error, None)
+        return len(events)
 
 
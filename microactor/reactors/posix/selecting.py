@@ -46,7 +46,7 @@ class SelectReactor(PosixBaseReactor):
     def _handle_transports(self, timeout):
         if not self._read_transports and not self._write_transports:
             time.sleep(timeout)
-            return
+            return 0
         try:
             rlst, wlst, _ = select.select(self._read_transports, self._write_transports, (), timeout)
         except (select.error, EnvironmentError) as ex:
@@ -57,11 +57,22 @@ class SelectReactor(PosixBaseReactor):
                 self._prune_bad_fds()
             else:
                 raise
+            return 0
         else:
+            # handlers run right away, so an earlier one may have already
+            # unregistered a later fd
             for fd in rlst:
-                self.call(self._read_transports[fd].on_read)
+                trns = self._read_transports.get(fd)
+                if trns is not None:
+                    self._dispatch(trns.on_read)
             for fd in wlst:
-                self.call(self._write_transports[fd].on_write)
+                trns = self._write_transports.get(fd)
+                if trns is not None:
+                    self._dispatch(trns.on_write)
+            return len(rlst) + len(wlst)
+
+    def _get_num_of_transports(self):
+        return len(set(self._read_transports).union(self._write_transports))
 
     def _prune_bad_fds(self):
         for transports in [self._read_transports, self._write_transports]:
@@ -72,7 +83,7 @@ class SelectReactor(PosixBaseReactor):
                     select.select(fds, fds, fds, 0)
                 except (select.error, EnvironmentError) as ex:
                     print "pruning", trns
-                    self.call(trns.on_error, ex)
+                    self._call_io(trns.on_error, ex)
                     bad.append(fd)
             for trns in bad:
                 transports.pop(fd, None)
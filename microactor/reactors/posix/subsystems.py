@@ -1,36 +1,122 @@
 import sys
 import socket
 from microactor.subsystems import Subsystem
-from microactor.subsystems.net import NetSubsystem
+from microactor.subsystems.net import NetSubsystem, SocketServer, ShardedServer
 from microactor.utils import reactive, rreturn, safe_import
 from .transports import (ListeningSocketTransport, ConnectingSocketTransport, 
     SslHandshakingTransport, SslListeninglSocketTransport, DatagramSocketTransport,
-    PipeTransport, FileTransport)
+    PipeTransport, FileTransport, UringListeningSocketTransport, 
+    UringConnectingSocketTransport)
 import os
 ssl = safe_import("ssl")
 
+if hasattr(socket, "SO_REUSEPORT"):
+    SO_REUSEPORT = socket.SO_REUSEPORT
+elif sys.platform.startswith("linux"):
+    SO_REUSEPORT = 15
+else:
+    SO_REUSEPORT = None
+
 
 class PosixNetSubsystem(NetSubsystem):
+    SHARDED = True
+    LISTENING_TRANSPORT = ListeningSocketTransport
+    CONNECTING_TRANSPORT = ConnectingSocketTransport
+
     @reactive
     def connect_tcp(self, host, port, timeout = None):
         yield self.reactor.started
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         hostaddr = yield self.resolve(host)
-        trns = ConnectingSocketTransport(self.reactor, sock, (hostaddr, port))
+        trns = self.CONNECTING_TRANSPORT(self.reactor, sock, (hostaddr, port))
         trns2 = yield trns.connect(timeout)
         rreturn(trns2)
     
-    @reactive
-    def listen_tcp(self, port, host = "0.0.0.0", backlog = 40):
-        yield self.reactor.started
+    @classmethod
+    def _bind_tcp(cls, host, port, backlog, reuse_port):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         if sys.platform != "win32":
             sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, True)
+        if reuse_port:
+            if SO_REUSEPORT is None:
+                raise socket.error("SO_REUSEPORT is not supported on this platform")
+            sock.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, True)
         sock.bind((host, port))
         sock.listen(backlog)
-        trns = ListeningSocketTransport(self.reactor, sock)
+        return sock
+
+    @reactive
+    def listen_tcp(self, port, host = "0.0.0.0", backlog = 40, reuse_port = False):
+        yield self.reactor.started
+        sock = self._bind_tcp(host, port, backlog, reuse_port)
+        trns = self.LISTENING_TRANSPORT(self.reactor, sock)
         rreturn(trns)
     
+    def wrap_listener(self, sock, exclusive = False):
+        """wraps an already-listening socket (which may be shared with other
+        reactors); with ``exclusive``, the reactor (if it supports it) will
+        register it with EPOLLEXCLUSIVE, to avoid thundering herds"""
+        trns = self.LISTENING_TRANSPORT(self.reactor, sock)
+        trns.exclusive = exclusive
+        return trns
+    
+    @reactive
+    def _serve_sharded(self, handler_factory, port, host, backlog, reactors,
+            use_processes, reuse_port):
+        from microactor.reactors.group import ReactorGroup
+        if reuse_port is None:
+            reuse_port = SO_REUSEPORT is not None
+        listener = yield self.listen_tcp(port, host, backlog, reuse_port = reuse_port)
+        # all listening sockets are bound here, before the members start (or
+        # get forked), so the port is served once this returns
+        if reuse_port:
+            port = listener.sock.getsockname()[1]
+            socks = [self._bind_tcp(host, port, backlog, True) 
+                for _ in range(reactors - 1)]
+        else:
+            # a single listening socket, shared by all; it's registered with
+            # EPOLLEXCLUSIVE, so a connection doesn't wake up every member
+            listener.exclusive = True
+            if use_processes:
+                socks = [listener.sock] * (reactors - 1)
+            else:
+                socks = [socket.fromfd(listener.sock.fileno(), socket.AF_INET, 
+                    socket.SOCK_STREAM) for _ in range(reactors - 1)]
+        group = ReactorGroup(reactors - 1, self.reactor.__class__, 
+            use_processes = use_processes, home = self.reactor)
+
+        def serve_member(member, sock):
+            trns = member.net.wrap_listener(sock, exclusive = not reuse_port)
+            server = SocketServer(member, handler_factory, trns)
+            member.call(server.start)
+            return server
+
+        def serve_child(member):
+            # the inherited listening sockets of the others (including the
+            # parent's) aren't served here
+            sock = socks[group.index]
+            if reuse_port:
+                listener.sock.close()
+                for other in socks:
+                    if other is not sock:
+                        other.close()
+            serve_member(member, sock)
+
+        server = SocketServer(self.reactor, handler_factory, listener)
+        self.reactor.call(server.start)
+        servers = [(self.reactor, server)]
+        if use_processes:
+            group.start(serve_child)
+            if reuse_port:
+                for sock in socks:
+                    sock.close()
+        else:
+            group.start()
+            for member, sock in zip(group, socks):
+                member_server = yield group.call_in(member, serve_member, member, sock)
+                servers.append((member, member_server))
+        rreturn(ShardedServer(self.reactor, group, servers))
+    
     @reactive
     def wrap_ssl_client(self, transport, keyfile = None, certfile = None, 
             ca_certs = None, cert_reqs = None, ssl_version = None):
@@ -156,7 +242,13 @@ class IOSubsystem(Subsystem):
         wtrns = PipeTransport(self.reactor, wf, "w")
         rreturn((rtrns, wtrns))
 
+class UringNetSubsystem(PosixNetSubsystem):
+    LISTENING_TRANSPORT = UringListeningSocketTransport
+    CONNECTING_TRANSPORT = UringConnectingSocketTransport
+
+
 POSIX_SUBSYSTEMS = [IOSubsystem, PosixNetSubsystem]
+URING_SUBSYSTEMS = [IOSubsystem, UringNetSubsystem]
 
 
 
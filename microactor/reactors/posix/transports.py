@@ -2,21 +2,42 @@ import sys
 import os
 import errno
 import socket
-from microactor.utils import ReactorDeferred, reactive, rreturn, safe_import
+import struct
+import functools
+from collections import deque
+from itertools import islice
+from microactor.utils import IODeferred, reactive, rreturn, safe_import
 from ..transports import ClosedFile, DetachedFile
-from ..transports import TransportError, ReadRequiresMoreData, OverlappingRequestError
+from ..transports import (TransportError, TransportClosed, ReadRequiresMoreData, 
+    OverlappingRequestError)
 fcntl = safe_import("fcntl")
+lowlevel = safe_import("microactor.reactors.posix.lowlevel")
+iouring = safe_import("microactor.arch.posix.iouring")
+ctypes = safe_import("ctypes")
 ssl = safe_import("ssl")
+# python 3 sockets can send several buffers at once
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+
+
+def _join(chunks):
+    return "".join([c.tobytes() if c.__class__ is memoryview else c for c in chunks])
 
 
 #===============================================================================
 # Base
 #===============================================================================
 class BaseTransport(object):
-    __slots__ = ["reactor", "properties"]
+    __slots__ = ["reactor", "properties", "_readable", "_writable"]
+    # whether the transport keeps track of its own readiness (_readable and 
+    # _writable), so it may be registered edge-triggered: it must clear the 
+    # respective flag whenever it runs into EAGAIN (or a short write)
+    EDGE_TRIGGERED = False
+
     def __init__(self, reactor):
         self.reactor = reactor
         self.properties = {}
+        self._readable = False
+        self._writable = False
     def fileno(self):
         raise NotImplementedError()
     def close(self):
@@ -24,8 +45,7 @@ class BaseTransport(object):
     def detach(self):
         raise NotImplementedError()
     def _unregister(self):
-        self.reactor.unregister_read(self)
-        self.reactor.unregister_write(self)
+        self.reactor.unregister(self)
 
     def on_read(self):
         pass
@@ -36,55 +56,81 @@ class BaseTransport(object):
 
 
 class WakeupTransport(BaseTransport):
-    __slots__ = ["wsock", "rsock", "auto_reset", "_set"]
+    """a transport used to wake up the reactor; relies on an eventfd where
+    available (linux), falling back to a pipe. redundant wakeups are already
+    coalesced by the reactor, so ``set`` always writes and ``reset`` drains
+    whatever has accumulated in a single read"""
+    __slots__ = ["rfd", "wfd", "auto_reset", "_token", "_drain_size"]
+    EDGE_TRIGGERED = True
+
     def __init__(self, reactor, auto_reset = True):
-        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        listener.bind(("localhost", 0))
-        listener.listen(1)
-        self.wsock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.wsock.connect(listener.getsockname())
-        self.rsock, _ = listener.accept()
-        listener.close()
+        fd = lowlevel.eventfd() if lowlevel else None
+        if fd is not None:
+            self.rfd = self.wfd = fd
+            # eventfd reads/writes 8-byte counters; a single read resets it
+            self._token = struct.pack("=Q", 1)
+            self._drain_size = 8
+        else:
+            self.rfd, self.wfd = os.pipe()
+            if lowlevel:
+                lowlevel.set_nonblocking(self.rfd)
+                lowlevel.set_nonblocking(self.wfd)
+            self._token = b"x"
+            self._drain_size = 4096
         self.auto_reset = auto_reset
-        self._set = False
         BaseTransport.__init__(self, reactor)
     def fileno(self):
-        return self.rsock.fileno()
+        if self.rfd < 0:
+            raise TransportClosed()
+        return self.rfd
     def close(self):
-        if self.wsock:
-            self.wsock.shutdown(socket.SHUT_RDWR)
-            self.wsock.close()
-            self.wsock = ClosedFile
-        if self.rsock:
-            self.rsock.shutdown(socket.SHUT_RDWR)
-            self.rsock.close()
-            self.rsock = ClosedFile
+        if self.rfd < 0:
+            return
+        self._unregister()
+        os.close(self.rfd)
+        if self.wfd != self.rfd:
+            os.close(self.wfd)
+        self.rfd = self.wfd = -1
     def on_read(self):
         if self.auto_reset:
             self.reset()
+            self._readable = False
 
     def set(self):
-        if self._set:
-            return
-        self.wsock.send("x")
-        self._set = True
+        try:
+            os.write(self.wfd, self._token)
+        except OSError as ex:
+            # a full pipe is as good as a written one
+            if ex.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
     def reset(self):
-        if not self._set:
-            return
-        self.rsock.recv(100)
-        self._set = False
+        try:
+            os.read(self.rfd, self._drain_size)
+        except OSError as ex:
+            if ex.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
 
 
 class StreamTransport(BaseTransport):
-    __slots__ = ["fileobj", "_read_req", "_write_req", "_eof"]
+    __slots__ = ["fileobj", "_read_req", "_write_queue", "_eof", "_rbuf", 
+        "_rbuf_start", "_rbuf_end"]
     MAX_READ_SIZE = 16300
     MAX_WRITE_SIZE = 16300
+    # the size of the buffer read_view() reads into
+    READ_BUFFER_SIZE = 16384
+    EDGE_TRIGGERED = True
+    # whether small writes queued together may go out in a single send
+    COALESCE_WRITES = True
 
     def __init__(self, reactor, fileobj):
         self.fileobj = fileobj
-        self._read_req = None
-        self._write_req = None
+        self._read_req = None          # (dfr, count, into)
+        self._write_queue = deque()    # [dfr, data, offset]
         self._eof = False
+        # allocated on first use; reads are served out of _rbuf[start:end]
+        # before anything new is read, and it's refilled from the start
+        self._rbuf = None
+        self._rbuf_start = self._rbuf_end = 0
         BaseTransport.__init__(self, reactor)
         self.properties["writable"] = True
         self.properties["readable"] = True
@@ -102,76 +148,213 @@ class StreamTransport(BaseTransport):
             self.fileobj = ClosedFile
 
     def read(self, count):
+        return self._read(count, None)
+
+    def readinto(self, buf):
+        """reads into ``buf`` (a bytearray or a writable memoryview), rather
+        than allocating a string; the deferred is set with the number of 
+        bytes read, 0 meaning EOF"""
+        return self._read(len(buf), buf)
+
+    def read_view(self, count):
+        """like ``read``, but the data is returned as a memoryview into a 
+        buffer the transport owns and keeps reusing, so nothing's allocated 
+        per read. the view is only good until the next read; keep a copy 
+        (``tobytes()``) if needed"""
+        if self._rbuf is None:
+            self._alloc_rbuf()
+        return self._read(count, self._rbuf)
+
+    def _alloc_rbuf(self):
+        self._rbuf = bytearray(self.READ_BUFFER_SIZE)
+
+    def _read(self, count, into):
         if self._read_req:
             raise OverlappingRequestError("overlapping reads")
-        dfr = ReactorDeferred(self.reactor)
-        if self._eof:
-            dfr.set(None)
+        dfr = IODeferred(self.reactor)
+        if self._rbuf_start < self._rbuf_end and count > 0:
+            dfr.set(self._read_buffered(count, into))
+        elif self._eof:
+            dfr.set(self._eof_result(into))
         elif count <= 0:
-            dfr.set("")
+            dfr.set(0 if into is not None and into is not self._rbuf else "")
         else:
-            self._read_req = (dfr, count)
-            self.reactor.register_read(self)
+            self._read_req = (dfr, count, into)
+            dfr._canceller = self._cancel_read
+            self._start_read()
         return dfr
 
+    def _start_read(self):
+        self.reactor.register_read(self)
+
+    def _read_buffered(self, count, into):
+        # serves a read out of what's left in _rbuf
+        start = self._rbuf_start
+        end = min(start + count, self._rbuf_end)
+        self._rbuf_start = end
+        if into is None:
+            return memoryview(self._rbuf)[start:end].tobytes()
+        elif into is self._rbuf:
+            return memoryview(into)[start:end]
+        else:
+            into[:end - start] = memoryview(self._rbuf)[start:end]
+            return end - start
+
+    def _eof_result(self, into):
+        return 0 if into is not None and into is not self._rbuf else None
+
     def write(self, data):
-        if self._write_req:
-            raise OverlappingRequestError("overlapping writes")
-        dfr = ReactorDeferred(self.reactor)
-        self._write_req = (dfr, data)
-        self.reactor.register_write(self)
+        """queues ``data`` (a string, bytearray or memoryview) to be written
+        in full; the deferred is set once all of it has been accepted. there's
+        no need to wait for one write before issuing the next: small writes 
+        that pile up go out together, in a single send. large payloads are 
+        sent in slices of a memoryview, so what's left isn't copied over and
+        over again"""
+        dfr = IODeferred(self.reactor)
+        if isinstance(data, bytearray) or (len(data) > self.MAX_WRITE_SIZE 
+                and isinstance(data, bytes)):
+            data = memoryview(data)
+        dfr._canceller = self._cancel_write
+        queue = self._write_queue
+        queue.append([dfr, data, 0])
+        if len(queue) == 1:
+            self.reactor.register_write(self)
         return dfr
 
+    def _cancel_read(self):
+        self._read_req = None
+        if self.fileobj:
+            self.reactor.unregister_read(self)
+    def _cancel_write(self):
+        # drops the canceled write, unless some of it has already been sent:
+        # then the rest of it goes out as well (only no one's told), as 
+        # whatever comes next mustn't follow a truncated message
+        queue = self._write_queue
+        for i, entry in enumerate(queue):
+            if entry[0].canceled and entry[2] == 0:
+                del queue[i]
+                break
+        if not queue and self.fileobj:
+            self.reactor.unregister_write(self)
+
     def on_read(self):
         if not self._read_req:
             self.reactor.unregister_read(self)
             return
 
-        dfr, count = self._read_req
+        dfr, count, into = self._read_req
         try:
-            data = self._do_read(min(self.MAX_READ_SIZE, count))
+            if into is None:
+                data = self._do_read(min(self.MAX_READ_SIZE, count))
+            elif into is self._rbuf:
+                # it's been drained, or we wouldn't get here
+                self._rbuf_start = self._rbuf_end = 0
+                data = self._do_readinto(memoryview(into))
+            else:
+                data = self._do_readinto(into)
         except ReadRequiresMoreData:
             # don't unregister_read and don't remove _read_req
+            self._readable = False
             return
         except Exception as ex:
             dfr.throw(ex)
         else:
             if not data:
                 self._eof = True
-                data = None
+                self._readable = False
+                data = self._eof_result(into)
+            elif into is not None and into is self._rbuf:
+                self._rbuf_end = data
+                data = self._read_buffered(count, into)
             dfr.set(data)
         self.reactor.unregister_read(self)
         self._read_req = None
 
     def on_write(self):
-        if not self._write_req:
+        queue = self._write_queue
+        if not queue:
             self.reactor.unregister_write(self)
             return
 
-        dfr, data = self._write_req
+        entry = queue[0]
+        data = entry[1]
+        chunk = data[entry[2]:entry[2] + self.MAX_WRITE_SIZE]
+        size = len(chunk)
+        chunks = None
+        if size < self.MAX_WRITE_SIZE and len(queue) > 1 and self.COALESCE_WRITES:
+            # the ones behind it haven't been started yet
+            chunks = [chunk]
+            for _, data, _ in islice(queue, 1, None):
+                chunk = data[:self.MAX_WRITE_SIZE - size]
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.MAX_WRITE_SIZE:
+                    break
         try:
-            if data:
-                count = self._do_write(data[:self.MAX_WRITE_SIZE])
-            else:
+            if not size:
                 count = 0
+            elif chunks is None:
+                count = self._do_write(chunk)
+            else:
+                count = self._do_writev(chunks)
+            if count is None:
+                # file objects write it all (or raise)
+                count = size
+            elif count < size:
+                # the send buffer is full
+                self._writable = False
         except Exception as ex:
-            data = None
-            dfr.throw(ex)
+            self.reactor.unregister_write(self)
+            self._fail_writes(ex)
+            return
+        if chunks is None and count == size and entry[2] + count >= len(entry[1]):
+            # the common case: a single write, gone in full
+            queue.popleft()
+            entry[0].set()
         else:
-            if count is None or count >= len(data):
-                data = None
-            else:
-                data = data[count:]
-                self._write_req = (dfr, data)
-        if not data:
-            dfr.set()
+            self._advance_writes(count)
+        if not queue:
             self.reactor.unregister_write(self)
-            self._write_req = None
+        elif self._writable:
+            # edge-triggered: no further event will come until we run into 
+            # EAGAIN, so keep going
+            self.reactor._call_io(self.on_write)
+
+    def _advance_writes(self, count):
+        # completes the writes whose last bytes are within the ``count`` 
+        # bytes that have just been sent; returns how many there were
+        queue = self._write_queue
+        done = 0
+        while queue:
+            entry = queue[0]
+            remaining = len(entry[1]) - entry[2]
+            if count < remaining:
+                entry[2] += count
+                break
+            count -= remaining
+            queue.popleft()
+            entry[0].set()
+            done += 1
+        return done
+    def _fail_writes(self, exc):
+        # the stream is broken: none of the pending writes will make it
+        pending = list(self._write_queue)
+        self._write_queue.clear()
+        for entry in pending:
+            entry[0].throw(exc)
 
     def _do_read(self, count):
         return self.fileobj.read(count)
+    def _do_readinto(self, buf):
+        # python 2 file objects' readinto() insists on filling the whole 
+        # buffer, and raises if the fd runs dry halfway through
+        data = self.fileobj.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
     def _do_write(self, data):
         return self.fileobj.write(data)
+    def _do_writev(self, chunks):
+        return self._do_write(_join(chunks))
 
 
 #===============================================================================
@@ -179,6 +362,9 @@ class StreamTransport(BaseTransport):
 #===============================================================================
 class PipeTransport(StreamTransport):
     #__slots__ = ["mode", "name", "_flush_dfr", "auto_flush"]
+    # file objects buffer data in userspace, which the poller can't see
+    EDGE_TRIGGERED = False
+
     def __init__(self, reactor, fileobj, mode, auto_flush = True):
         if mode not in ("r", "w", "rw"):
             raise ValueError("invalid mode")
@@ -209,13 +395,18 @@ class PipeTransport(StreamTransport):
 
     def flush(self):
         if not self._flush_dfr:
-            self._flush_dfr = ReactorDeferred(self.reactor)
+            self._flush_dfr = IODeferred(self.reactor)
             self.reactor.register_write(self)
         return self._flush_dfr
 
     def _flush(self):
         self.fileobj.flush()
-        os.fsync(self.fileno())
+        try:
+            os.fsync(self.fileno())
+        except OSError as ex:
+            # pipes and ttys can't be synced
+            if ex.errno != errno.EINVAL:
+                raise
         if self._flush_dfr:
             self._flush_dfr.set()
             self._flush_dfr = None
@@ -225,6 +416,12 @@ class PipeTransport(StreamTransport):
         if self.auto_flush or self._flush_dfr:
             self._flush()
 
+    def _do_write(self, data):
+        if data.__class__ is memoryview:
+            # file objects opened in text mode only take strings
+            data = data.tobytes()
+        return self.fileobj.write(data)
+
 
 class FileTransport(PipeTransport):
     __slots__ = []
@@ -276,6 +473,18 @@ class SocketStreamTransport(StreamTransport):
         except socket.error as ex:
             if ex.errno in (errno.ECONNRESET, errno.ECONNABORTED):
                 return ""  # EOF
+            elif ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise ReadRequiresMoreData()
+            else:
+                raise
+    def _do_readinto(self, buf):
+        try:
+            return self.fileobj.recv_into(buf)
+        except socket.error as ex:
+            if ex.errno in (errno.ECONNRESET, errno.ECONNABORTED):
+                return 0  # EOF
+            elif ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise ReadRequiresMoreData()
             else:
                 raise
 
@@ -287,6 +496,16 @@ class SocketStreamTransport(StreamTransport):
                 return 0
             else:
                 raise
+    def _do_writev(self, chunks):
+        if not HAS_SENDMSG:
+            return self._do_write(_join(chunks))
+        try:
+            return self.fileobj.sendmsg(chunks)
+        except socket.error as ex:
+            if ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return 0
+            else:
+                raise
 
 
 class BaseSocketTransport(BaseTransport):
@@ -309,41 +528,64 @@ class BaseSocketTransport(BaseTransport):
 
 
 class ListeningSocketTransport(BaseSocketTransport):
-    __slots__ = ["_accept_dfr", "factory"]
+    __slots__ = ["_accept_dfr", "factory", "exclusive"]
+    EDGE_TRIGGERED = True
     def __init__(self, reactor, sock, factory = SocketStreamTransport):
         BaseSocketTransport.__init__(self, reactor, sock)
         self._accept_dfr = None
         self.factory = factory
+        self.exclusive = False
     def accept(self):
         if self._accept_dfr:
             raise OverlappingRequestError("overlapping accept")
-        self._accept_dfr = ReactorDeferred(self.reactor)
+        self._accept_dfr = IODeferred(self.reactor)
+        self._accept_dfr._canceller = self._cancel_accept
         self.reactor.register_read(self)
         return self._accept_dfr
+    def _cancel_accept(self):
+        self._accept_dfr = None
+        if self.sock:
+            self.reactor.unregister_read(self)
     def on_read(self):
         if not self._accept_dfr:
             self.reactor.unregister_read(self)
             return
-        sock, _ = self.sock.accept()
+        try:
+            sock, _ = self.sock.accept()
+        except socket.error as ex:
+            if ex.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                # no pending connections (e.g., the listening socket is shared
+                # and someone else got there first); keep waiting
+                self._readable = False
+                return
+            # e.g., EMFILE: the one waiting for the connection is told; the
+            # listener stays, to be accepted on again
+            dfr = self._accept_dfr
+            self._accept_dfr = None
+            self.reactor.unregister_read(self)
+            dfr.throw(ex)
+            return
         dfr = self._accept_dfr
         self._accept_dfr = None
         dfr.set(self.factory(self.reactor, sock))
 
 
 class ConnectingSocketTransport(BaseSocketTransport):
-    __slots__ = ["addr", "connected_dfr", "_connecting"]
+    __slots__ = ["addr", "connected_dfr", "_connecting", "_timeout_timer"]
     def __init__(self, reactor, sock, addr):
         BaseSocketTransport.__init__(self, reactor, sock)
         self.addr = addr
-        self.connected_dfr = ReactorDeferred(self.reactor)
+        self.connected_dfr = IODeferred(self.reactor)
+        self.connected_dfr._canceller = self._abort
         self._connecting = False
+        self._timeout_timer = None
 
     def connect(self, timeout = None):
         if self._connecting:
             raise OverlappingRequestError("already connecting")
         self._connecting = True
         if timeout is not None:
-            self.reactor.jobs.schedule(timeout, self._cancel)
+            self._timeout_timer = self.reactor.call_later(timeout, self._cancel)
         self.reactor.register_write(self)
         self._attempt_connect()
         return self.connected_dfr
@@ -363,17 +605,27 @@ class ConnectingSocketTransport(BaseSocketTransport):
 
         sock = self.sock
         self.detach()
+        if self._timeout_timer:
+            self._timeout_timer.cancel()
+            self._timeout_timer = None
         if err in (0, errno.EISCONN):
             self.connected_dfr.set(SocketStreamTransport(self.reactor, sock))
         else:
             self.connected_dfr.throw(socket.error(err, errno.errorcode[err]))
 
     def _cancel(self):
+        self._timeout_timer = None
         if self.connected_dfr.is_set():
             return
         self.close()
         self.connected_dfr.throw(socket.timeout("connection timed out"))
 
+    def _abort(self):
+        if self._timeout_timer:
+            self._timeout_timer.cancel()
+            self._timeout_timer = None
+        self.close()
+
 
 #===============================================================================
 # Datagram Sockets
@@ -395,8 +647,9 @@ class DatagramSocketTransport(BaseSocketTransport):
     def recvfrom(self, count = -1):
         if self._read_req:
             raise OverlappingRequestError("overlapping recvfrom")
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         self._read_req = (dfr, count)
+        dfr._canceller = self._cancel_read
         self.reactor.register_read(self)
         return dfr
 
@@ -405,11 +658,21 @@ class DatagramSocketTransport(BaseSocketTransport):
             raise TransportError("data too long")
         if self._write_req:
             raise OverlappingRequestError("overlapping sendto")
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         self._write_req = (dfr, addr, data)
+        dfr._canceller = self._cancel_write
         self.reactor.register_write(self)
         return dfr
 
+    def _cancel_read(self):
+        self._read_req = None
+        if self.sock:
+            self.reactor.unregister_read(self)
+    def _cancel_write(self):
+        self._write_req = None
+        if self.sock:
+            self.reactor.unregister_write(self)
+
     def on_read(self):
         if not self._read_req:
             self.reactor.unregister_read(self)
@@ -429,6 +692,9 @@ class DatagramSocketTransport(BaseSocketTransport):
             dfr.set((addr, data))
 
     def on_write(self):
+        if not self._write_req:
+            self.reactor.unregister_write(self)
+            return
         dfr, addr, data = self._write_req
         self.reactor.unregister_write(self)
         self._write_req = None
@@ -446,6 +712,11 @@ class DatagramSocketTransport(BaseSocketTransport):
 #===============================================================================
 class SslStreamTransport(SocketStreamTransport):
     __slots__ = []
+    # SSL reads return one record at a time, so a short read doesn't mean 
+    # the socket has been drained
+    EDGE_TRIGGERED = False
+    # a write that would block must be retried with the very same buffer
+    COALESCE_WRITES = False
 
     def getpeercert(self, binary_form = False):
         return self.fileobj.getpeercert(binary_form)
@@ -470,6 +741,21 @@ class SslStreamTransport(SocketStreamTransport):
                 return ""  # EOF
             else:
                 raise
+    def _do_readinto(self, buf):
+        try:
+            return self.fileobj.recv_into(buf)
+        except ssl.SSLError as ex:
+            if ex.errno == ssl.SSL_ERROR_WANT_READ:
+                raise ReadRequiresMoreData
+            elif ex.errno == ssl.SSL_ERROR_EOF:
+                return 0 # EOF
+            else:
+                raise
+        except socket.error as ex:
+            if ex.errno in (errno.ECONNRESET, errno.ECONNABORTED):
+                return 0  # EOF
+            else:
+                raise
 
 
 class SslHandshakingTransport(BaseSocketTransport):
@@ -477,7 +763,7 @@ class SslHandshakingTransport(BaseSocketTransport):
 
     def __init__(self, reactor, sslsock):
         BaseSocketTransport.__init__(self, reactor, sslsock)
-        self.connected_dfr = ReactorDeferred(self.reactor)
+        self.connected_dfr = IODeferred(self.reactor)
 
     def handshake(self):
         if not self.connected_dfr.is_set():
@@ -521,4 +807,267 @@ class SslListeninglSocketTransport(ListeningSocketTransport):
         rreturn(trns)
 
 
+#===============================================================================
+# io_uring (completion-based; see IoUringReactor)
+#===============================================================================
+def _error_from_result(res):
+    err = -res
+    return socket.error(err, os.strerror(err))
+
+def _pack_sockaddr(family, addr):
+    if family == socket.AF_INET:
+        host, port = addr
+        return (struct.pack("=H", socket.AF_INET) + struct.pack("!H", port) +
+            socket.inet_aton(host) + b"\0" * 8)
+    elif family == getattr(socket, "AF_INET6", None):
+        host, port = addr[:2]
+        flowinfo, scope_id = (tuple(addr[2:]) + (0, 0))[:2]
+        return (struct.pack("=H", socket.AF_INET6) + struct.pack("!HI", port, flowinfo) +
+            socket.inet_pton(socket.AF_INET6, host) + struct.pack("=I", scope_id))
+    else:
+        raise ValueError("unsupported address family: %r" % (family,))
+
+
+class UringSocketStreamTransport(SocketStreamTransport):
+    """a stream socket whose reads and writes are submitted to the reactor's
+    ring and completed by the kernel, rather than performed upon readiness"""
+    __slots__ = ["_read_op", "_rbuf_addr", "_write_op", "_write_inflight"]
+
+    def __init__(self, reactor, sock):
+        SocketStreamTransport.__init__(self, reactor, sock)
+        # everything is received into _rbuf (which also keeps whatever a
+        # canceled read gets nonetheless), as the kernel holds on to the 
+        # buffer until the submission completes
+        self._read_op = None
+        self._rbuf_addr = None
+        self._write_op = None
+        # the number of queued writes (at its head) the send in flight covers
+        self._write_inflight = 0
+
+    def _unregister(self):
+        for op in (self._read_op, self._write_op):
+            if op is not None:
+                self.reactor._cancel_op(op)
+        self._read_op = self._write_op = None
+        self._read_req = None
+        self._write_inflight = 0
+        SocketStreamTransport._unregister(self)
+
+    def _start_read(self):
+        if self._read_op is not None:
+            # a canceled read is still in flight; it will do
+            return
+        if self._rbuf is None:
+            self._alloc_rbuf()
+        self._rbuf_start = self._rbuf_end = 0
+        self._read_op = self.reactor._submit(iouring.IORING_OP_RECV, self.fileno(), 
+            self._read_finished, self._rbuf_addr, len(self._rbuf))
+
+    def _alloc_rbuf(self):
+        SocketStreamTransport._alloc_rbuf(self)
+        self._rbuf_addr = ctypes.addressof((ctypes.c_char * 
+            len(self._rbuf)).from_buffer(self._rbuf))
+
+    def _read_finished(self, res):
+        if self._read_op is None:
+            return   # the transport has been closed
+        self._read_op = None
+        if res in (-errno.ECONNRESET, -errno.ECONNABORTED):
+            res = 0
+        req = self._read_req
+        self._read_req = None
+        if res < 0:
+            if req:
+                req[0].throw(_error_from_result(res))
+            return
+        if res == 0:
+            self._eof = True
+        self._rbuf_end = res
+        if req is None:
+            return   # the read has been canceled; keep the data for the next one
+        dfr, count, into = req
+        if res == 0:
+            dfr.set(self._eof_result(into))
+        else:
+            dfr.set(self._read_buffered(count, into))
+
+    def _cancel_read(self):
+        # the submission is left alone, as data might already be on its way
+        self._read_req = None
+
+    def write(self, data):
+        dfr = IODeferred(self.reactor)
+        # the kernel reads straight out of the buffer, which is kept alive
+        # (by the queue) until it's been sent
+        if isinstance(data, bytes):
+            keepalive = ctypes.c_char_p(data)
+        elif isinstance(data, bytearray):
+            keepalive = (ctypes.c_char * len(data)).from_buffer(data)
+            # from_buffer doesn't stop the bytearray from being resized (and
+            # reallocated) under the kernel's feet, but an exported view does
+            data = memoryview(data)
+        else:
+            # ctypes can't get at a (read-only) memoryview's buffer
+            data = memoryview(data).tobytes()
+            keepalive = ctypes.c_char_p(data)
+        dfr._canceller = self._cancel_write
+        queue = self._write_queue
+        queue.append([dfr, data, 0, keepalive, ctypes.cast(keepalive, ctypes.c_void_p).value])
+        if len(queue) == 1 and self._write_op is None:
+            # whatever is written while this one is in flight goes out
+            # together, once it completes
+            self._send_queued()
+        return dfr
+
+    def _send_queued(self):
+        queue = self._write_queue
+        if self._write_op is not None or not self.fileobj:
+            return
+        self._advance_writes(0)
+        if not queue:
+            return
+        _, data, offset, _, base = queue[0]
+        size = len(data) - offset
+        count = 1
+        if size < self.MAX_WRITE_SIZE and len(queue) > 1:
+            # the ones behind it haven't been started yet
+            chunks = [ctypes.string_at(base + offset, size)]
+            for _, data, _, _, base in islice(queue, 1, None):
+                chunk = ctypes.string_at(base, min(len(data), self.MAX_WRITE_SIZE - size))
+                chunks.append(chunk)
+                size += len(chunk)
+                count += 1
+                if size >= self.MAX_WRITE_SIZE:
+                    break
+            keepalive = "".join(chunks)
+            addr = ctypes.cast(ctypes.c_char_p(keepalive), ctypes.c_void_p).value
+        else:
+            keepalive = None
+            addr = base + offset
+        self._write_inflight = count
+        self._write_op = self.reactor._submit(iouring.IORING_OP_SEND, self.fileno(), 
+            functools.partial(self._write_finished, keepalive), addr, size, 
+            op_flags = iouring.MSG_NOSIGNAL)
+
+    def _write_finished(self, keepalive, res):
+        if self._write_op is None:
+            return   # the transport has been closed
+        inflight = self._write_inflight
+        self._write_op = None
+        self._write_inflight = 0
+        if res in (-errno.EAGAIN, -iouring.ECANCELED):
+            res = 0
+        if res < 0:
+            self._fail_writes(_error_from_result(res))
+            return
+        queue = self._write_queue
+        for i in reversed(range(inflight - self._advance_writes(res))):
+            if queue[i][0].canceled and queue[i][2] == 0:
+                # canceled while in flight, and none of it made it
+                del queue[i]
+        if queue:
+            self._send_queued()
+
+    def _cancel_write(self):
+        # like StreamTransport's, a canceled write that's been started is 
+        # sent in full. the ones in flight are dropped once the send
+        # completes (if none of them has been sent)
+        queue = self._write_queue
+        for i in range(self._write_inflight, len(queue)):
+            if queue[i][0].canceled and queue[i][2] == 0:
+                del queue[i]
+                break
+        else:
+            if self._write_inflight and queue[0][2] == 0 and all(queue[i][0].canceled 
+                    for i in range(self._write_inflight)):
+                # no one's waiting for what's being sent anymore
+                self.reactor._cancel_op(self._write_op)
+
+
+class UringListeningSocketTransport(ListeningSocketTransport):
+    __slots__ = ["_accept_op"]
+    EDGE_TRIGGERED = False
+
+    def __init__(self, reactor, sock, factory = UringSocketStreamTransport):
+        ListeningSocketTransport.__init__(self, reactor, sock, factory)
+        self._accept_op = None
+
+    def _unregister(self):
+        if self._accept_op is not None:
+            self.reactor._cancel_op(self._accept_op)
+            self._accept_op = None
+        ListeningSocketTransport._unregister(self)
+
+    def accept(self):
+        if self._accept_dfr:
+            raise OverlappingRequestError("overlapping accept")
+        dfr = self._accept_dfr = IODeferred(self.reactor)
+
+        def accept_finished(res):
+            if self._accept_op != op:
+                # canceled (but might have completed nonetheless)
+                if res >= 0:
+                    os.close(res)
+                return
+            self._accept_op = None
+            self._accept_dfr = None
+            if res < 0:
+                dfr.throw(_error_from_result(res))
+                return
+            sock = socket.fromfd(res, self.sock.family, self.sock.type)
+            os.close(res)
+            dfr.set(self.factory(self.reactor, sock))
+
+        def cancel_accept():
+            if self._accept_op == op:
+                self.reactor._cancel_op(op)
+                self._accept_op = None
+                self._accept_dfr = None
+
+        op = self._accept_op = self.reactor._submit(iouring.IORING_OP_ACCEPT,
+            self.fileno(), accept_finished, op_flags = iouring.SOCK_CLOEXEC)
+        dfr._canceller = cancel_accept
+        return dfr
+
+
+class UringConnectingSocketTransport(ConnectingSocketTransport):
+    __slots__ = ["_connect_op"]
+
+    def __init__(self, reactor, sock, addr):
+        ConnectingSocketTransport.__init__(self, reactor, sock, addr)
+        self._connect_op = None
 
+    def _unregister(self):
+        if self._connect_op is not None:
+            self.reactor._cancel_op(self._connect_op)
+            self._connect_op = None
+        ConnectingSocketTransport._unregister(self)
+
+    def connect(self, timeout = None):
+        if self._connecting:
+            raise OverlappingRequestError("already connecting")
+        self._connecting = True
+        if timeout is not None:
+            self._timeout_timer = self.reactor.call_later(timeout, self._cancel)
+        sockaddr = _pack_sockaddr(self.sock.family, self.addr)
+        buf = ctypes.create_string_buffer(sockaddr, len(sockaddr))
+
+        def connect_finished(res):
+            if self._connect_op != op or self.connected_dfr.is_set():
+                return   # canceled or timed out
+            self._connect_op = None
+            if self._timeout_timer:
+                self._timeout_timer.cancel()
+                self._timeout_timer = None
+            sock = self.sock
+            self.detach()
+            if res == 0:
+                self.connected_dfr.set(UringSocketStreamTransport(self.reactor, sock))
+            else:
+                self.connected_dfr.throw(_error_from_result(res))
+
+        # the address length goes in the offset field
+        op = self._connect_op = self.reactor._submit(iouring.IORING_OP_CONNECT,
+            self.fileno(), connect_finished, ctypes.addressof(buf), 0, len(sockaddr),
+            keepalive = buf)
+        return self.connected_dfr
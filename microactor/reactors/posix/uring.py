@@ -0,0 +1,161 @@
+import errno
+from microactor.utils import safe_import
+from ..base import BaseReactor
+from .base import PosixBaseReactor, ReactorError
+from .subsystems import URING_SUBSYSTEMS
+iouring = safe_import("microactor.arch.posix.iouring")
+
+
+class IoUringReactor(PosixBaseReactor):
+    """a completion-based reactor (linux 5.11 and up): stream sockets submit
+    their reads, writes, accepts and connects to the ring, and the kernel
+    completes them. all submissions made during an iteration are handed to
+    the kernel in a single syscall, which also waits for completions.
+
+    other transports (pipes, datagrams, SSL, the waker) still work by
+    readiness, which is emulated with one-shot poll submissions"""
+    SUBSYSTEMS = BaseReactor.SUBSYSTEMS + URING_SUBSYSTEMS
+    RING_SIZE = 1024
+    READ_MASK = iouring.POLLIN | iouring.POLLPRI if iouring else 0
+    WRITE_MASK = iouring.POLLOUT if iouring else 0
+
+    def __init__(self, ring_size = None):
+        PosixBaseReactor.__init__(self)
+        self._ring = iouring.IoUring(ring_size or self.RING_SIZE)
+        self._ops = {}          # user_data -> (callback, keepalive, fd)
+        self._next_op = 1
+        self._polls = {}        # fd -> [transport, interest, op, armed mask]
+        self._install_builtin_subsystems()
+
+    @classmethod
+    def supported(cls):
+        return bool(iouring) and iouring.is_supported()
+
+    #===========================================================================
+    # Submissions
+    #===========================================================================
+    def _submit(self, opcode, fd, callback, addr = 0, length = 0, off = 0,
+            op_flags = 0, keepalive = None):
+        """queues a submission, to be handed to the kernel on the next
+        iteration; ``callback(res)`` is invoked upon completion. returns the
+        submission's id, for ``_cancel_op``"""
+        op = self._next_op
+        self._next_op += 1
+        if not self._ring.prep(opcode, fd, addr, length, off, op_flags, op):
+            # the submission queue is full; flush it
+            self._ring.enter()
+            if not self._ring.prep(opcode, fd, addr, length, off, op_flags, op):
+                raise ReactorError("submission queue is full")
+        self._ops[op] = (callback, keepalive, fd)
+        return op
+
+    def _cancel_op(self, op):
+        """cancels a submission; its callback will be invoked with -ECANCELED,
+        unless it has already completed"""
+        if op not in self._ops:
+            return
+        if not self._ring.prep(iouring.IORING_OP_ASYNC_CANCEL, -1, op):
+            # the submission queue is full; flush it
+            self._ring.enter()
+            if not self._ring.prep(iouring.IORING_OP_ASYNC_CANCEL, -1, op):
+                # the operation would go on, with its buffer in the kernel's
+                # hands, long after its transport is gone
+                raise ReactorError("submission queue is full; can't cancel")
+
+    def _get_num_of_transports(self):
+        # the fds with submissions in flight (a transport may have several,
+        # e.g., a read and a write); only computed when stats are enabled
+        return len(set(entry[2] for entry in self._ops.itervalues()))
+
+    def _handle_transports(self, timeout):
+        if timeout > 0:
+            self._ring.enter(True, timeout)
+        else:
+            self._ring.enter()
+        completions = self._ring.reap()
+        ops = self._ops
+        for op, res in completions:
+            # cancel requests are submitted with no user_data
+            entry = ops.pop(op, None)
+            if entry is not None:
+                self._dispatch(entry[0], res)
+        return len(completions)
+
+    #===========================================================================
+    # Readiness (emulated with one-shot polls)
+    #===========================================================================
+    def _register(self, transport, mask):
+        fd = transport.fileno()
+        entry = self._polls.get(fd)
+        if entry is None:
+            entry = self._polls[fd] = [transport, 0, None, 0]
+        elif entry[0] is not transport:
+            raise ReactorError("multiple transports registered for the same fd")
+        entry[1] |= mask
+        self._arm(fd, entry)
+
+    def _arm(self, fd, entry):
+        if entry[2] is not None:
+            if entry[3] & entry[1] == entry[1]:
+                return
+            # interested in more than what's being polled for; re-arm
+            self._cancel_op(entry[2])
+        entry[3] = entry[1]
+        op = self._submit(iouring.IORING_OP_POLL_ADD, fd,
+            lambda res: self._poll_finished(fd, entry, op, res), 
+            op_flags = entry[1])
+        entry[2] = op
+
+    def _poll_finished(self, fd, entry, op, res):
+        if entry[2] != op:
+            return   # superseded
+        entry[2] = None
+        if self._polls.get(fd) is not entry:
+            return
+        trns = entry[0]
+        if res == -iouring.ECANCELED:
+            pass
+        elif res < 0:
+            self._dispatch(trns.on_error, OSError(-res, errno.errorcode.get(-res, "")))
+        else:
+            if res & (self.READ_MASK | iouring.POLLHUP | iouring.POLLERR) and entry[1] & self.READ_MASK:
+                self._dispatch(trns.on_read)
+            if res & (self.WRITE_MASK | iouring.POLLERR) and entry[1] & self.WRITE_MASK:
+                self._dispatch(trns.on_write)
+        if entry[1] and entry[2] is None and self._polls.get(fd) is entry:
+            self._arm(fd, entry)
+
+    def _unregister_mask(self, transport, mask):
+        try:
+            fd = transport.fileno()
+        except Exception:
+            self._prune(transport)
+            return
+        entry = self._polls.get(fd)
+        if entry is None or entry[0] is not transport:
+            return
+        entry[1] &= ~mask
+        if not entry[1]:
+            del self._polls[fd]
+            if entry[2] is not None:
+                self._cancel_op(entry[2])
+                entry[2] = None
+
+    def _prune(self, transport):
+        for fd, entry in self._polls.items():
+            if entry[0] is transport:
+                del self._polls[fd]
+                if entry[2] is not None:
+                    self._cancel_op(entry[2])
+                    entry[2] = None
+
+    def register_read(self, transport):
+        self._register(transport, self.READ_MASK)
+    def register_write(self, transport):
+        self._register(transport, self.WRITE_MASK)
+    def unregister_read(self, transport):
+        self._unregister_mask(transport, self.READ_MASK)
+    def unregister_write(self, transport):
+        self._unregister_mask(transport, self.WRITE_MASK)
+    def unregister(self, transport):
+        self._unregister_mask(transport, self.READ_MASK | self.WRITE_MASK)
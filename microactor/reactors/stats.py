@@ -0,0 +1,159 @@
+class RollingHistogram(object):
+    """keeps the last ``size`` samples of some metric, along with running
+    totals, and computes percentiles over them on demand"""
+    __slots__ = ["size", "_samples", "_index", "count", "total", "max"]
+    def __init__(self, size = 1024):
+        self.size = size
+        self.reset()
+    def reset(self):
+        self._samples = []
+        self._index = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+    def add(self, value):
+        if len(self._samples) < self.size:
+            self._samples.append(value)
+        else:
+            self._samples[self._index] = value
+            self._index = (self._index + 1) % self.size
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+    def percentile(self, p):
+        """returns the p-th percentile (0..100) of the retained samples"""
+        if not self._samples:
+            return 0
+        samples = sorted(self._samples)
+        index = int(round((len(samples) - 1) * p / 100.0))
+        return samples[index]
+    def snapshot(self):
+        if not self._samples:
+            return {"count" : self.count, "mean" : 0, "max" : self.max,
+                "p50" : 0, "p90" : 0, "p99" : 0}
+        samples = sorted(self._samples)
+        last = len(samples) - 1
+        return {
+            "count" : self.count,
+            "mean" : float(sum(samples)) / len(samples),
+            "max" : self.max,
+            "p50" : samples[int(round(last * 0.50))],
+            "p90" : samples[int(round(last * 0.90))],
+            "p99" : samples[int(round(last * 0.99))],
+        }
+
+
+class ReactorStats(object):
+    """loop statistics of a reactor, exposed as ``reactor.stats``. nothing is
+    recorded unless enabled (via ``enable()``), in which case every
+    iteration of the loop is measured (``last_*`` attributes) and fed into
+    rolling histograms.
+
+    ``before_poll`` hooks are called as ``func(timeout)`` right before the
+    reactor polls for I/O, and ``after_poll`` hooks as ``func(num_of_events)``
+    right after it. ``before_callback`` and ``after_callback`` hooks are 
+    called as ``func(callback, args)`` around every callback the reactor 
+    runs, I/O handlers included (which costs, so they're meant for 
+    debugging). hooks are called whether or not stats are enabled"""
+    HISTOGRAMS = ["poll_time", "callbacks_time", "iteration_time", "events",
+        "callbacks", "timer_lateness", "fds"]
+
+    def __init__(self, reactor, history = 1024):
+        self.reactor = reactor
+        self.enabled = False
+        self.history = history
+        self._before_poll = []
+        self._after_poll = []
+        self._before_callback = []
+        self._after_callback = []
+        self._callback_hooked = False
+        for name in self.HISTOGRAMS:
+            setattr(self, name, RollingHistogram(history))
+        self.reset()
+
+    def reset(self):
+        self.iterations = 0
+        self.last_poll_time = 0
+        self.last_callbacks_time = 0
+        self.last_iteration_time = 0
+        self.last_events = 0
+        self.last_callbacks = 0
+        self.last_timer_lateness = 0
+        self.last_fds = 0
+        for name in self.HISTOGRAMS:
+            getattr(self, name).reset()
+
+    def _update(self):
+        self._callback_hooked = bool(self._before_callback or self._after_callback)
+        self.reactor._instrumented = bool(self.enabled or self._before_poll or
+            self._after_poll or self._callback_hooked)
+
+    def enable(self):
+        self.enabled = True
+        self._update()
+    def disable(self):
+        self.enabled = False
+        self._update()
+
+    def add_hook(self, point, func):
+        """adds a hook; ``point`` is one of "before_poll", "after_poll",
+        "before_callback" and "after_callback" """
+        self._get_hooks(point).append(func)
+        self._update()
+    def remove_hook(self, point, func):
+        self._get_hooks(point).remove(func)
+        self._update()
+    def _get_hooks(self, point):
+        if point == "before_poll":
+            return self._before_poll
+        elif point == "after_poll":
+            return self._after_poll
+        elif point == "before_callback":
+            return self._before_callback
+        elif point == "after_callback":
+            return self._after_callback
+        else:
+            raise ValueError("invalid hook point: %r" % (point,))
+
+    def _record_lateness(self, now, timers):
+        lateness = 0
+        for timer in timers:
+            late = now - timer.when
+            self.timer_lateness.add(late)
+            if late > lateness:
+                lateness = late
+        self.last_timer_lateness = lateness
+
+    def _record_iteration(self, t0, t1, t2, events, callbacks, fds):
+        self.iterations += 1
+        self.last_poll_time = t1 - t0
+        self.last_callbacks_time = t2 - t1
+        self.last_iteration_time = t2 - t0
+        self.last_events = events
+        self.last_callbacks = callbacks
+        self.last_fds = fds
+        self.poll_time.add(self.last_poll_time)
+        self.callbacks_time.add(self.last_callbacks_time)
+        self.iteration_time.add(self.last_iteration_time)
+        self.events.add(events)
+        self.callbacks.add(callbacks)
+        self.fds.add(fds)
+
+    def snapshot(self):
+        """returns a dict with the current statistics"""
+        info = {
+            "iterations" : self.iterations,
+            "last" : {
+                "poll_time" : self.last_poll_time,
+                "callbacks_time" : self.last_callbacks_time,
+                "iteration_time" : self.last_iteration_time,
+                "events" : self.last_events,
+                "callbacks" : self.last_callbacks,
+                "timer_lateness" : self.last_timer_lateness,
+                "fds" : self.last_fds,
+            },
+        }
+        for name in self.HISTOGRAMS:
+            info[name] = getattr(self, name).snapshot()
+        return info
@@ -51,10 +51,16 @@ class IocpReactor(BaseReactor):
     def _discard_overlapped(self, overlapped):
         self._overlap_callbacks.pop(overlapped, None)
 
+    def _get_num_of_transports(self):
+        return len(self._transports)
+
     def _handle_transports(self, timeout):
+        count = 0
         for size, overlapped, exc in self._port.get_events(timeout):
             cb = self._overlap_callbacks.pop(overlapped)
-            self.call(cb, size, exc)
+            self._dispatch(cb, size, exc)
+            count += 1
+        return count
 
 
 
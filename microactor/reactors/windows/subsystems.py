@@ -2,7 +2,7 @@ import os
 import socket
 from microactor.subsystems import Subsystem
 from microactor.subsystems.net import NetSubsystem
-from microactor.utils import ReactorDeferred, reactive, rreturn, safe_import
+from microactor.utils import ReactorDeferred, IODeferred, reactive, rreturn, safe_import
 from .transports import (SocketStreamTransport, ListeningSocketTransport, 
     PipeTransport, FileTransport, ConsoleInputTransport, BlockingStreamTransport)
 import threading
@@ -21,7 +21,7 @@ class IocpNetSubsystem(NetSubsystem):
 
         yield self.reactor.started
         hostaddr = yield self.resolve(host)
-        trns_dfr = ReactorDeferred(self.reactor)
+        trns_dfr = IODeferred(self.reactor)
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.setblocking(False)
         sock.bind(('0.0.0.0', 0)) # ConnectEx requires the socket to be bound
@@ -130,10 +130,9 @@ class IOSubsystem(Subsystem):
             self._console_buffer += data
             
             if self._console_input_dfr and not self._console_input_dfr.is_set():
-                self._console_input_dfr.set(self._console_buffer)
+                self.reactor.call_threadsafe(self._console_input_dfr.set, self._console_buffer)
                 self._console_buffer = ""
                 self._console_input_dfr = None
-                self.reactor._wakeup()
     
     def _wrap_pipe(self, fileobj, mode):
         return PipeTransport(self.reactor, fileobj, mode)
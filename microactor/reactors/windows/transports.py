@@ -1,5 +1,5 @@
 import socket
-from microactor.utils import safe_import, ReactorDeferred, reactive, rreturn
+from microactor.utils import safe_import, IODeferred, reactive, rreturn
 from ..transports import ClosedFile, DetachedFile
 from ..transports import TransportError, OverlappingRequestError
 msvcrt = safe_import("msvcrt")
@@ -79,7 +79,7 @@ class StreamTransport(BaseTransport):
             else:
                 dfr.set(data)
 
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         count = min(count, self.MAX_READ_SIZE)
         if count <= 0:
             self._ongoing_read = False
@@ -141,7 +141,7 @@ class StreamTransport(BaseTransport):
                 self.reactor._discard_overlapped(overlapped)
                 dfr.throw(ex)
 
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         write_some()
         return dfr
 
@@ -285,7 +285,7 @@ class ListeningSocketTransport(BaseSocketTransport):
             else:
                 dfr.set(trns)
 
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         overlapped = self.reactor._get_overlapped(accept_finished)
         try:
             sock = socket.socket(self.sock.family, self.sock.type)
@@ -328,7 +328,7 @@ class DatagramSocketTransport(BaseSocketTransport):
             else:
                 dfr.set(size) # return actual sent size
 
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         overlapped = self.reactor._get_overlapped(write_finished)
         try:
             winsock.WSASendToSocket(self.sock, data, addr, overlapped)
@@ -354,7 +354,7 @@ class DatagramSocketTransport(BaseSocketTransport):
                 addrinfo = (sockaddr.addr_str, sockaddr.port)
                 dfr.set((data, addrinfo))
 
-        dfr = ReactorDeferred(self.reactor)
+        dfr = IODeferred(self.reactor)
         overlapped = self.reactor._get_overlapped(read_finished)
         try:
             buf, sockaddr, _ = winsock.WSARecvFromSocket(self.sock, count, overlapped)
@@ -2,5 +2,7 @@ from .base import Subsystem
 from .threads import ThreadPoolSubsystem
 from .jobs import JobSubsystem
 from .processes import ProcessSubsystem
+from .debug import DebugSubsystem
 
-GENERIC_SUBSYSTEMS = [JobSubsystem, ThreadPoolSubsystem, ProcessSubsystem]
+GENERIC_SUBSYSTEMS = [JobSubsystem, ThreadPoolSubsystem, ProcessSubsystem, 
+    DebugSubsystem]
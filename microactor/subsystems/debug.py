@@ -0,0 +1,266 @@
+import sys
+import threading
+import traceback
+from types import GeneratorType, FrameType
+from .base import Subsystem
+from microactor.utils import deferred
+from microactor.utils.timers import Timer
+
+
+def _find_generator(func):
+    # reactive continuations carry the generator they drive...
+    gen = getattr(func, "gen", None)
+    if isinstance(gen, GeneratorType):
+        return gen
+    return None
+
+def _find_deferred(func):
+    # ...and the deferred they will eventually set
+    dfr = getattr(func, "retval", None)
+    if hasattr(dfr, "tracebacks") and hasattr(dfr, "register"):
+        return dfr
+    return None
+
+def describe_callback(func):
+    """returns a tuple of (qualified name, location) of the given callback
+    (or frame); reactive continuations are described by the generator they
+    drive"""
+    if isinstance(func, FrameType):
+        return "%s.%s" % (func.f_globals.get("__name__", "?"), func.f_code.co_name), \
+            "%s:%s" % (func.f_code.co_filename, func.f_lineno)
+    self = getattr(func, "__self__", getattr(func, "im_self", None))
+    inner = getattr(func, "__func__", getattr(func, "im_func", func))
+    if self is not None and getattr(inner, "__name__", None) == "fire" and hasattr(self, "when"):
+        # a timer; describe what it fires instead
+        if self.func is not None:
+            return describe_callback(self.func)
+    gen = _find_generator(inner)
+    if gen is not None:
+        code = getattr(gen, "gi_code", None)
+        frame = gen.gi_frame
+        if frame is not None:
+            modname = frame.f_globals.get("__name__", "?")
+            location = "%s:%s" % (frame.f_code.co_filename, frame.f_lineno)
+        else:
+            modname = "?"
+            location = "%s:%s (finished)" % (code.co_filename, code.co_firstlineno)
+        return "%s.%s" % (modname, code.co_name), location
+    name = getattr(inner, "__name__", repr(inner))
+    if self is not None:
+        name = "%s.%s" % (type(self).__name__, name)
+    modname = getattr(inner, "__module__", None)
+    if modname:
+        name = "%s.%s" % (modname, name)
+    code = getattr(inner, "__code__", getattr(inner, "func_code", None))
+    if code is not None:
+        location = "%s:%s" % (code.co_filename, code.co_firstlineno)
+    else:
+        location = "?"
+    return name, location
+
+def _target_of(func, args):
+    # what a queued callback is really going to run: timers fire (and then
+    # forget) their function, and reactor deferreds deliver to their callback
+    owner = getattr(func, "__self__", None)
+    if owner is not None:
+        if owner.__class__ is Timer:
+            return owner.func
+        if isinstance(owner, deferred.ReactorDeferred) and args:
+            return args[0]
+    return func
+
+def describe_chain(func):
+    """returns the reactive call chain that led to the given (continuation)
+    callback, as recorded by the deferred it will eventually set"""
+    dfr = _find_deferred(getattr(func, "__func__", getattr(func, "im_func", func)))
+    if dfr is None:
+        return ""
+    return "".join(dfr.tracebacks[:1])
+
+
+class SlowCallbackReport(object):
+    __slots__ = ["name", "location", "duration", "chain"]
+    def __init__(self, name, location, duration, chain):
+        self.name = name
+        self.location = location
+        self.duration = duration
+        self.chain = chain
+    def __str__(self):
+        lines = ["slow callback %s (%s) took %.1f ms" % (self.name, self.location,
+            self.duration * 1000)]
+        if self.chain:
+            lines.append("reactive call chain:")
+            lines.append(self.chain.rstrip())
+        return "\n".join(lines)
+
+def _default_reporter(report):
+    print >>sys.stderr, report
+    print >>sys.stderr, "-" * 60
+
+
+class DebugSubsystem(Subsystem):
+    """opt-in debugging aids for the reactor thread: a slow-callback detector,
+    which times every callback (including transport ``on_read`` and
+    ``on_write`` handlers) and reports the ones that exceed a threshold, and a
+    watchdog thread, which dumps the reactor thread's stack whenever the loop
+    stalls"""
+    NAME = "debug"
+
+    def _init(self):
+        self.threshold = None
+        self.reporter = _default_reporter
+        self._watchdog = None
+        self._running = []      # (target, frame, start time) of callbacks
+        self._captures = False  # whether enable() turned on stack capture
+
+    def _unload(self):
+        self.disable()
+        self.stop_watchdog()
+
+    #===========================================================================
+    # Slow callbacks
+    #===========================================================================
+    def enable(self, threshold = 0.1, reporter = None, capture_every = 1):
+        """starts timing callbacks; those taking more than ``threshold``
+        seconds are passed to ``reporter`` (a SlowCallbackReport). the 
+        reactive call chain of a slow continuation comes from the stack its
+        deferred was created in, so this also turns on stack capture (see 
+        ``capture_stacks``) for every ``capture_every``-th deferred, unless 
+        it's already on or ``capture_every`` is 0"""
+        if self.threshold is None:
+            stats = self.reactor.stats
+            stats.add_hook("before_callback", self._before_callback)
+            stats.add_hook("after_callback", self._after_callback)
+            if capture_every and not deferred._capture_every:
+                deferred.set_stack_capture(capture_every)
+                self._captures = True
+        self.threshold = threshold
+        if reporter is not None:
+            self.reporter = reporter
+
+    def disable(self):
+        if self.threshold is None:
+            return
+        self.threshold = None
+        del self._running[:]
+        if self._captures:
+            self._captures = False
+            deferred.set_stack_capture(0)
+        try:
+            stats = self.reactor.stats
+            stats.remove_hook("before_callback", self._before_callback)
+            stats.remove_hook("after_callback", self._after_callback)
+        except (ValueError, ReferenceError):
+            pass
+
+    def _before_callback(self, func, args):
+        # found beforehand, as timers drop their function when fired, and 
+        # continuations their generator once it's done (its frame stays 
+        # around, at the line it got to)
+        target = _target_of(func, args)
+        gen = _find_generator(target)
+        frame = gen.gi_frame if gen is not None else None
+        self._running.append((target, frame, self.reactor.clock()))
+
+    def _after_callback(self, func, args):
+        if not self._running:
+            return
+        target, frame, t0 = self._running.pop()
+        duration = self.reactor.clock() - t0
+        if duration > self.threshold:
+            self._report_slow(target, duration, frame)
+
+    def _report_slow(self, func, duration, frame = None):
+        name, location = describe_callback(func if frame is None else frame)
+        self.reporter(SlowCallbackReport(name, location, duration, describe_chain(func)))
+
+    #===========================================================================
+    # Deferred stacks
+    #===========================================================================
+    def capture_stacks(self, every = 1):
+        """makes every ``every``-th deferred record the stack it was created
+        in (shown along with its unhandled errors, and in slow-callback 
+        reports); 0 turns it off. note that this is process-wide"""
+        deferred.set_stack_capture(every)
+
+    #===========================================================================
+    # Watchdog
+    #===========================================================================
+    def start_watchdog(self, timeout = 0.5, reporter = None):
+        """starts a watchdog thread that dumps the reactor thread's stack (to
+        ``reporter``, or stderr) whenever the loop hasn't ticked for
+        ``timeout`` seconds. time spent waiting for I/O doesn't count"""
+        if self._watchdog:
+            raise ValueError("watchdog already running")
+        self._watchdog = Watchdog(self.reactor, timeout, reporter)
+        self._watchdog.start()
+        return self._watchdog
+
+    def stop_watchdog(self):
+        if self._watchdog:
+            self._watchdog.stop()
+            self._watchdog = None
+
+
+class Watchdog(object):
+    def __init__(self, reactor, timeout, reporter = None):
+        self.reactor = reactor
+        self.timeout = timeout
+        self.reporter = reporter
+        self._thread_id = None
+        self._busy_since = None     # None while polling
+        self._reported = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.reactor.stats.add_hook("before_poll", self._before_poll)
+        self.reactor.stats.add_hook("after_poll", self._after_poll)
+        self._busy_since = self.reactor.clock()
+        self._thread = threading.Thread(name = "reactor-watchdog", target = self._run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        try:
+            self.reactor.stats.remove_hook("before_poll", self._before_poll)
+            self.reactor.stats.remove_hook("after_poll", self._after_poll)
+        except (ValueError, ReferenceError):
+            pass
+
+    def _before_poll(self, timeout):
+        if self._thread_id is None:
+            self._thread_id = threading.current_thread().ident
+        self._busy_since = None
+        self._reported = False
+
+    def _after_poll(self, count):
+        self._busy_since = self.reactor.clock()
+
+    def _run(self):
+        interval = self.timeout / 2.0
+        while not self._stopped.is_set():
+            self._stopped.wait(interval)
+            busy_since = self._busy_since
+            if busy_since is None or self._reported or self._thread_id is None:
+                continue
+            try:
+                stalled = self.reactor.clock() - busy_since
+            except ReferenceError:
+                break
+            if stalled < self.timeout:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            self._reported = True
+            text = "reactor loop stalled for %.1f ms; reactor thread stack:\n%s" % (
+                stalled * 1000, "".join(traceback.format_stack(frame)))
+            del frame
+            if self.reporter:
+                self.reporter(text)
+            else:
+                print >>sys.stderr, text
@@ -1,31 +1,65 @@
-import time
 import functools
 from .base import Subsystem
-from microactor.utils import ReactorDeferred, reactive, rreturn
+from microactor.utils import ReactorDeferred, Cancelled
+
+
+class Timeout(Exception):
+    """the deadline given to ``with_timeout`` has passed"""
+
+
+def _cancel_all(dfrlist):
+    for dfr in dfrlist:
+        dfr.cancel()
+
+def _follow(dfr, func):
+    """registers ``func`` with ``dfr``. a deferred that's already canceled
+    never calls back, so it counts as having failed with Cancelled"""
+    if dfr.canceled:
+        func(True, Cancelled("deferred already canceled"))
+    else:
+        dfr.register(func)
+
+
+class JobDeferred(ReactorDeferred):
+    """a deferred bound to a scheduled job; canceling it cancels the job's
+    timer as well"""
+    __slots__ = ["timer"]
+    def __init__(self, reactor):
+        ReactorDeferred.__init__(self, reactor)
+        self.timer = None
+    def cancel(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        ReactorDeferred.cancel(self)
 
 
 class JobSubsystem(Subsystem):
     NAME = "jobs"
-    
+
     def sleep(self, interval):
-        return self.schedule(interval, lambda: None)
-    
+        dfr = JobDeferred(self.reactor)
+        dfr.timer = self.reactor.call_later(interval, dfr.set)
+        return dfr
+
     def schedule(self, interval, func, *args, **kwargs):
         def wrapper():
+            dfr.timer = None
             try:
                 res = func(*args, **kwargs)
             except Exception as ex:
                 dfr.throw(ex)
             else:
                 dfr.set(res)
-        
+
         functools.update_wrapper(wrapper, func)
-        dfr = ReactorDeferred(self.reactor)
-        self.reactor.call_at(time.time() + interval, wrapper)
+        dfr = JobDeferred(self.reactor)
+        dfr.timer = self.reactor.call_later(interval, wrapper)
         return dfr
-    
+
     def schedule_every(self, interval, func, *args, **kwargs):
         def wrapper():
+            dfr.timer = None
             try:
                 res = func(*args, **kwargs)
             except Exception as ex:
@@ -33,22 +67,162 @@ class JobSubsystem(Subsystem):
             else:
                 if res is False:
                     dfr.set()
-                else:
-                    ts = t0 + (((time.time() - t0) // interval) + 1) * interval
-                    self.reactor.call_at(ts, wrapper)
-        
+                elif not dfr.canceled:
+                    now = self.reactor.clock()
+                    ts = t0 + (((now - t0) // interval) + 1) * interval
+                    dfr.timer = self.reactor.call_at(ts, wrapper)
+
         functools.update_wrapper(wrapper, func)
-        dfr = ReactorDeferred(self.reactor)
-        t0 = time.time()
-        self.reactor.call_at(t0, wrapper)
+        dfr = JobDeferred(self.reactor)
+        t0 = self.reactor.clock()
+        dfr.timer = self.reactor.call_at(t0, wrapper)
         return dfr
 
-    @reactive
     def joined(self, dfrlist):
-        reslist = []
+        return self.gather(dfrlist)
+
+    #===========================================================================
+    # Combinators
+    #===========================================================================
+    def gather(self, dfrlist):
+        """returns a deferred that's set with the list of results of the given
+        deferreds (in their order) once all of them are set, or fails with
+        the first exception to occur (Cancelled, for a deferred that's 
+        already canceled). canceling it cancels them all"""
+        dfrlist = list(dfrlist)
+        res = ReactorDeferred(self.reactor)
+        results = [None] * len(dfrlist)
+        remaining = [len(dfrlist)]
+
+        def collect(i, is_exc, val):
+            if res.value or res.canceled:
+                return
+            if is_exc:
+                res._set(True, val)
+                return
+            results[i] = val
+            remaining[0] -= 1
+            if not remaining[0]:
+                res.set(results)
+
+        if not dfrlist:
+            res.set(results)
+        for i, dfr in enumerate(dfrlist):
+            _follow(dfr, functools.partial(collect, i))
+        if not res.value:
+            res._canceller = functools.partial(_cancel_all, dfrlist)
+        return res
+
+    def gather_settled(self, dfrlist):
+        """like ``gather``, but never fails: the result is a list of 
+        ``(is_exc, value)`` pairs, once all of the deferreds are set"""
+        dfrlist = list(dfrlist)
+        res = ReactorDeferred(self.reactor)
+        results = [None] * len(dfrlist)
+        remaining = [len(dfrlist)]
+
+        def collect(i, is_exc, val):
+            results[i] = (is_exc, val)
+            remaining[0] -= 1
+            if not remaining[0]:
+                res.set(results)
+
+        if not dfrlist:
+            res.set(results)
+        for i, dfr in enumerate(dfrlist):
+            _follow(dfr, functools.partial(collect, i))
+        if not res.value:
+            res._canceller = functools.partial(_cancel_all, dfrlist)
+        return res
+
+    def race(self, dfrlist):
+        """returns a deferred that's set with the result (or fails with the
+        exception) of whichever of the given deferreds is set first; the rest
+        are canceled"""
+        dfrlist = list(dfrlist)
+        if not dfrlist:
+            raise ValueError("no deferreds to race")
+        res = ReactorDeferred(self.reactor)
+
+        def settle(i, is_exc, val):
+            if res.value or res.canceled:
+                return
+            res._set(is_exc, val)
+            for j, dfr in enumerate(dfrlist):
+                if j != i:
+                    dfr.cancel()
+
+        for i, dfr in enumerate(dfrlist):
+            _follow(dfr, functools.partial(settle, i))
+            if res.value:
+                break
+        else:
+            res._canceller = functools.partial(_cancel_all, dfrlist)
+        return res
+
+    def first_completed(self, dfrlist):
+        """returns a deferred that's set with the index of whichever of the 
+        given deferreds is set first (successfully or not). nothing is 
+        canceled"""
+        dfrlist = list(dfrlist)
+        if not dfrlist:
+            raise ValueError("no deferreds to wait for")
+        res = ReactorDeferred(self.reactor)
+
+        def settle(i, is_exc, val):
+            if not res.value and not res.canceled:
+                res.set(i)
+
+        for i, dfr in enumerate(dfrlist):
+            _follow(dfr, functools.partial(settle, i))
+        return res
+
+    def as_completed(self, dfrlist):
+        """returns a list of deferreds, the first of which is set with the
+        outcome of whichever of the given deferreds is set first, and so on.
+        outputs that have been canceled are skipped, so outcomes go to those
+        still waiting"""
+        dfrlist = list(dfrlist)
+        outputs = [ReactorDeferred(self.reactor) for _ in dfrlist]
+        count = [0]
+
+        def settle(is_exc, val):
+            while count[0] < len(outputs):
+                out = outputs[count[0]]
+                count[0] += 1
+                if not out.canceled:
+                    out._set(is_exc, val)
+                    break
+
         for dfr in dfrlist:
-            res = yield dfr
-            reslist.append(res)
-        rreturn(reslist)
+            _follow(dfr, settle)
+        return outputs
+
+    def with_timeout(self, dfr, timeout):
+        """returns a deferred that follows ``dfr``, unless ``timeout`` seconds
+        pass first, in which case ``dfr`` is canceled and the returned 
+        deferred fails with ``Timeout``. canceling the returned deferred
+        cancels both the timeout and ``dfr``"""
+        res = JobDeferred(self.reactor)
+
+        def expire():
+            res.timer = None
+            if res.value or res.canceled:
+                return
+            dfr.cancel()
+            res.throw(Timeout("timed out after %s seconds" % (timeout,)), False)
+
+        def done(is_exc, val):
+            if res.timer:
+                res.timer.cancel()
+                res.timer = None
+            if not res.value:
+                res._set(is_exc, val)
+
+        res.timer = self.reactor.call_later(timeout, expire)
+        _follow(dfr, done)
+        if not res.value:
+            res._canceller = dfr.cancel
+        return res
 
 
@@ -54,8 +54,31 @@ class SocketServer(object):
         listener.close()
 
 
+class ShardedServer(object):
+    """a server whose connections are spread over a group of reactors, each
+    running its own SocketServer on a shared port"""
+    def __init__(self, reactor, group, servers):
+        self.reactor = reactor
+        self.group = group
+        self.servers = servers  # list of (member reactor, SocketServer)
+
+    @reactive
+    def close(self):
+        for member, server in self.servers:
+            if member is self.reactor:
+                yield server.close()
+            else:
+                yield self.group.call_in(member, server.close)
+        self.servers = []
+        self.group.stop()
+        yield self.reactor.threadpool.call(self.group.join)
+
+
 class NetSubsystem(Subsystem):
     NAME = "net"
+    # whether serve() can spread connections over several reactors, in which
+    # case the subclass implements _serve_sharded
+    SHARDED = False
     
     def getaddrinfo(self, hostname, port = None, family = 0, socktype = 0, proto = 0, flags = 0):
         return self.reactor.threadpool.call(socket.getaddrinfo, hostname, port, 
@@ -66,8 +89,27 @@ class NetSubsystem(Subsystem):
         res = yield self.getaddrinfo(hostname, family = family)
         rreturn(res[0][4][0])
 
+    def serve(self, handler_factory, port, host = "0.0.0.0", backlog = 40, 
+            reactors = 1, use_processes = False, reuse_port = None):
+        """serves ``handler_factory`` on the given port. if ``reactors`` is
+        greater than 1, this reactor and ``reactors - 1`` additional ones 
+        (running in their own threads, or with ``use_processes``, in forked
+        processes) each accept connections on the port, and a ShardedServer
+        is returned. each reactor gets a listening socket of its own (with
+        SO_REUSEPORT) where supported, unless ``reuse_port`` is False, in 
+        which case they share a single one. reactors that can't do that
+        (see SHARDED) raise ReactorError"""
+        if reactors <= 1:
+            return self._serve(handler_factory, port, host, backlog)
+        if not self.SHARDED:
+            from microactor.reactors.base import ReactorError
+            raise ReactorError("serving over multiple reactors is not "
+                "supported by %s" % (type(self.reactor).__name__,))
+        return self._serve_sharded(handler_factory, port, host, backlog, 
+            reactors, use_processes, reuse_port)
+
     @reactive
-    def serve(self, handler_factory, port, host = "0.0.0.0", backlog = 40):
+    def _serve(self, handler_factory, port, host, backlog):
         listener = yield self.listen_tcp(port, host, backlog)
         server = SocketServer(self.reactor, handler_factory, listener)
         self.reactor.call(server.start)
@@ -47,10 +47,9 @@ class ThreadPoolSubsystem(Subsystem):
                 try:
                     res = func(*args, **kwargs)
                 except Exception as ex:
-                    dfr.throw(ex)
+                    self.reactor.call_threadsafe(dfr.throw, ex)
                 else:
-                    dfr.set(res)
-                self.reactor._wakeup()
+                    self.reactor.call_threadsafe(dfr.set, res)
         finally:
             self._workers.pop(id, None)
     
@@ -73,12 +72,11 @@ class ThreadingSubsystem(Subsystem):
             try:
                 res = func(*args, **kwargs)
             except Exception as ex:
-                dfr.throw(ex)
+                self.reactor.call_threadsafe(dfr.throw, ex)
             else:
-                dfr.set(res)
+                self.reactor.call_threadsafe(dfr.set, res)
             finally:
                 self._threads.discard(thd)
-            self.reactor._wakeup()
         
         dfr = ReactorDeferred(self.reactor)
         tid = self.ID_GENERATOR.next()
@@ -1,4 +1,4 @@
-from .deferred import Deferred, ReactorDeferred, reactive, rreturn
+from .deferred import Deferred, ReactorDeferred, IODeferred, Cancelled, reactive, rreturn, Return
 from .transports import BufferedTransport, BoundTransport
 
 
@@ -0,0 +1,54 @@
+"""
+conversions between deferreds and asyncio futures (or trollius', on python 2).
+both sides are expected to run in the same thread, e.g., with an
+AsyncioReactor on the future's event loop
+"""
+from microactor.utils import Deferred, ReactorDeferred, safe_import
+asyncio = safe_import("asyncio")
+if not asyncio:
+    asyncio = safe_import("trollius")
+
+
+def to_future(dfr, loop = None):
+    """returns an asyncio future that follows the given deferred. canceling
+    the future cancels the deferred"""
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    fut = asyncio.Future(loop = loop)
+
+    def deferred_done(is_exc, val):
+        if fut.cancelled():
+            return
+        if is_exc:
+            fut.set_exception(val)
+        else:
+            fut.set_result(val)
+
+    def future_done(fut):
+        if fut.cancelled():
+            dfr.cancel()
+
+    fut.add_done_callback(future_done)
+    dfr.register(deferred_done)
+    return fut
+
+def to_deferred(fut, reactor = None):
+    """returns a deferred that follows the given asyncio future (or
+    coroutine, which is scheduled as a task). if ``reactor`` is given, a
+    ReactorDeferred is returned"""
+    fut = asyncio.ensure_future(fut)
+    if reactor is None:
+        dfr = Deferred()
+    else:
+        dfr = ReactorDeferred(reactor)
+
+    def future_done(fut):
+        if fut.cancelled():
+            dfr.throw(asyncio.CancelledError(), False)
+        elif fut.exception() is not None:
+            dfr.throw(fut.exception(), False)
+        else:
+            dfr.set(fut.result())
+
+    fut.add_done_callback(future_done)
+    return dfr
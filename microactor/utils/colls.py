@@ -1,4 +1,5 @@
 import heapq
+from collections import deque
 from .deferred import Deferred
 
 
@@ -40,6 +41,37 @@ class MinHeap(object):
         return len(self._items)
 
 
+class CallbackQueue(object):
+    """a deque-based queue of ready callbacks, split into priority lanes 
+    (lane 0 is the most urgent). argument-less callbacks are stored as-is; 
+    others are stored as ``(func, args, kwargs)`` tuples"""
+    __slots__ = ["lanes"]
+    def __init__(self, num_of_lanes = 2):
+        self.lanes = tuple(deque() for _ in range(num_of_lanes))
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes)
+    def __nonzero__(self):
+        for lane in self.lanes:
+            if lane:
+                return True
+        return False
+    __bool__ = __nonzero__
+    def push(self, lane, func, args = (), kwargs = None):
+        if args or kwargs:
+            self.lanes[lane].append((func, args, kwargs or {}))
+        else:
+            self.lanes[lane].append(func)
+    def pop(self):
+        """pops the next callback (from the most urgent non-empty lane)"""
+        for lane in self.lanes:
+            if lane:
+                return lane.popleft()
+        raise IndexError("pop from an empty queue")
+    def clear(self):
+        for lane in self.lanes:
+            lane.clear()
+
+
 class ReactiveQueue(object):
     """a reactive queue"""
     __slots__ = ["data_queue", "waiters_queue"]
@@ -1,6 +1,6 @@
 import sys
 import functools
-import inspect
+import linecache
 import traceback
 from types import GeneratorType
 
@@ -8,65 +8,259 @@ from types import GeneratorType
 class DeferredAlreadySet(Exception):
     pass
 
+class Cancelled(Exception):
+    """thrown into a reactive function whose result has been canceled"""
+
+#===============================================================================
+# Stack capture (a debugging aid)
+#===============================================================================
+# when enabled, every n-th deferred records the stack it was created (and
+# thrown) in, to be shown when its error goes unhandled. only code objects
+# and line numbers are kept; they're formatted when (and if) reported
+_capture_every = 0
+_capture_count = 0
+
+def set_stack_capture(every = 1):
+    """records the stack of every ``every``-th deferred; 0 disables it (the
+    default). tracebacks of thrown exceptions are kept regardless"""
+    global _capture_every, _capture_count
+    _capture_every = every or 0
+    _capture_count = 0
+
+def _is_internal(filename):
+    return "microactor" in filename and "utils" in filename and "deferred" in filename
+
+def _extract_stack(frame):
+    entries = []
+    while frame is not None:
+        code = frame.f_code
+        if not _is_internal(code.co_filename):
+            entries.append((code, frame.f_lineno))
+        frame = frame.f_back
+    entries.reverse()
+    return entries
+
+def _extract_tb(tb):
+    entries = []
+    while tb is not None:
+        entries.append((tb.tb_frame.f_code, tb.tb_lineno))
+        tb = tb.tb_next
+    return entries
+
+def _format_entries(entries):
+    lines = []
+    for code, lineno in entries:
+        lines.append('  File "%s", line %d, in %s\n' % (code.co_filename, lineno, 
+            code.co_name))
+        # source lines may be missing (e.g., code run by exec)
+        line = linecache.getline(code.co_filename, lineno).strip()
+        if line:
+            lines.append("    %s\n" % (line,))
+    return "".join(lines)
+
+def format_trace(trace, exc = None):
+    """formats a deferred's recorded trace (a list of stacks and exception 
+    tracebacks) as a list of strings. ``exc`` is the exception the trace
+    belongs to, which the trace itself doesn't hold on to"""
+    texts = []
+    for item in trace or ():
+        if item[0] == "stack":
+            texts.append(_format_entries(item[1]))
+        elif item[0] == "text":
+            texts.append(item[1])
+        else:
+            _, t, v, entries = item
+            if v is None:
+                v = exc
+            texts.append("Traceback (most recent call last):\n" + 
+                _format_entries(entries) + 
+                "".join(traceback.format_exception_only(t, v)))
+    return texts
+
+class Trace(list):
+    """the stacks and tracebacks recorded by a deferred"""
+    __slots__ = []
+    def __reduce__(self):
+        # code objects can't be pickled (e.g., along with an exception sent
+        # to a remote peer), so ship it formatted
+        return (Trace, ([("text", text) for text in format_trace(self)],))
+
 def format_stack(ignore = 2):
-    frames = inspect.stack()[ignore:]
-    lines = traceback.format_list((f[1], f[2], f[3], f[4][f[5]])
-        for f in reversed(frames))
-    return "".join(l for l in lines 
-        if not ("microactor" in l and "utils" in l and "deferred" in l))
+    return _format_entries(_extract_stack(sys._getframe(ignore)))
+
 
 class Deferred(object):
-    __slots__ = ["value", "_callbacks", "canceled", "tracebacks"]
+    """a value (or an exception) that will become available later. callbacks
+    are kept in a single slot: None, the callback itself, or (only once a
+    second one is registered) a list of them.
+
+    whoever produces the deferred may install a ``_canceller``, which is 
+    called (once, with no arguments) if it's canceled before it's set, to
+    stop the operation that would have set it"""
+    __slots__ = ["value", "_callbacks", "canceled", "_trace", "_canceller"]
     def __init__(self, value = NotImplemented):
+        global _capture_count
         if value is NotImplemented:
             self.value = None
         else:
             self.value = (False, value)
-        self._callbacks = []
+        self._callbacks = None
         self.canceled = False
-        self.tracebacks = [format_stack()]
+        self._trace = None
+        self._canceller = None
+        if _capture_every:
+            _capture_count += 1
+            if _capture_count >= _capture_every:
+                _capture_count = 0
+                self._trace = Trace([("stack", _extract_stack(sys._getframe(1)))])
+    @property
+    def tracebacks(self):
+        if self.value and self.value[0]:
+            return format_trace(self._trace, self.value[1])
+        return format_trace(self._trace)
     def register(self, func):
-        #if not hasattr(self, "_callbacks") or self._callbacks:
-        #    print "!!", self, "more than one callback"
         if self.canceled:
             return
-        elif self.is_set():
+        elif self.value:
             func(*self.value)
         else:
-            self._callbacks.append(func)
+            self._add_callback(func)
+    def _add_callback(self, func):
+        cbs = self._callbacks
+        if cbs is None:
+            self._callbacks = func
+        elif cbs.__class__ is list:
+            cbs.append(func)
+        else:
+            self._callbacks = [cbs, func]
     def cancel(self):
+        """from now on, whatever the deferred is set with is ignored (and its
+        callbacks are never called); if it's still pending, the operation 
+        behind it is stopped"""
+        if self.canceled:
+            return
         self.canceled = True
+        canceller = self._canceller
+        if canceller is not None:
+            self._canceller = None
+            if not self.value:
+                canceller()
     def is_set(self):
         return bool(self.value)
     def _set(self, is_exc, val):
         if self.canceled:
             return
-        if self.is_set():
+        if self.value:
             raise DeferredAlreadySet(self)
         self.value = (is_exc, val)
-        for func in self._callbacks:
-            func(is_exc, val)
-        del self._callbacks
+        self._canceller = None
+        cbs = self._callbacks
+        if cbs is None:
+            return
+        self._callbacks = None
+        if cbs.__class__ is list:
+            for func in cbs:
+                func(is_exc, val)
+        else:
+            cbs(is_exc, val)
     def set(self, value = None):
         self._set(False, value)
+    def __await__(self):
+        return _Awaiter(self)
     def throw(self, exc, with_traceback = True):
-        self.tracebacks.append(format_stack())
-        t, v, tb = sys.exc_info()
-        if v is not None:
-            tbtext = "".join(traceback.format_exception(t, v, tb))
-            self.tracebacks.append(tbtext)
-        exc._tracebacks = self.tracebacks
+        self._record_trace(exc, with_traceback)
         self._set(True, exc)
+    def _record_trace(self, exc, with_traceback = True):
+        if self._trace is None:
+            self._trace = Trace()
+        elif _capture_every:
+            self._trace.append(("stack", _extract_stack(sys._getframe(1))))
+        t, v, tb = sys.exc_info()
+        if with_traceback and v is not None:
+            # the exception is going to hold the trace; were the trace to 
+            # hold the exception as well, it'd be a reference cycle
+            self._trace.append(("exc", t, None if v is exc else v, _extract_tb(tb)))
+        del tb
+        exc._trace = self._trace
+
+
+class _Awaiter(object):
+    """the iterator behind ``await dfr``: passes the deferred on to the 
+    coroutine's runner (unless it's already set), and then returns (or 
+    raises) whatever the runner sends (or throws) back in"""
+    __slots__ = ["dfr"]
+    def __init__(self, dfr):
+        self.dfr = dfr
+    def __iter__(self):
+        return self
+    def send(self, val):
+        dfr = self.dfr
+        if dfr is None:
+            raise StopIteration(val)
+        self.dfr = None
+        if not dfr.value:
+            return dfr
+        is_exc, val = dfr.value
+        if is_exc:
+            raise val
+        raise StopIteration(val)
+    def __next__(self):
+        return self.send(None)
+    next = __next__
+    def throw(self, typ, val = None, tb = None):
+        self.dfr = None
+        if val is None:
+            val = typ() if isinstance(typ, type) else typ
+        raise val
+    def close(self):
+        self.dfr = None
 
 
 class ReactorDeferred(Deferred):
+    """a deferred whose callbacks are invoked through the reactor's queue,
+    rather than from within the call that sets it. if it's canceled while
+    they're queued, they're dropped"""
     __slots__ = ["reactor"]
+    # whether callbacks are queued on the reactor's I/O lane (see IODeferred)
+    IO = False
     def __init__(self, reactor, value = NotImplemented):
         Deferred.__init__(self, value)
         self.reactor = reactor
     def register(self, func):
-        func2 = lambda is_exc, val: self.reactor.call(func, is_exc, val)
-        Deferred.register(self, func2)
+        if self.canceled:
+            return
+        elif self.value:
+            post = self.reactor._call_io if self.IO else self.reactor.call
+            post(self._deliver, func, *self.value)
+        else:
+            self._add_callback(func)
+    def _deliver(self, func, is_exc, val):
+        if not self.canceled:
+            func(is_exc, val)
+    def _set(self, is_exc, val):
+        if self.canceled:
+            return
+        if self.value:
+            raise DeferredAlreadySet(self)
+        self.value = (is_exc, val)
+        self._canceller = None
+        cbs = self._callbacks
+        if cbs is None:
+            return
+        self._callbacks = None
+        post = self.reactor._call_io if self.IO else self.reactor.call
+        if cbs.__class__ is list:
+            for func in cbs:
+                post(self._deliver, func, is_exc, val)
+        else:
+            post(self._deliver, cbs, is_exc, val)
+
+class IODeferred(ReactorDeferred):
+    """a ReactorDeferred for the results of transports, which is set by their
+    I/O handlers: its callbacks are queued on the reactor's I/O lane, so the
+    code waiting on I/O runs ahead of work posted with ``reactor.call``"""
+    __slots__ = []
+    IO = True
 
 
 class ReactiveReturn(Exception):
@@ -76,38 +270,183 @@ class ReactiveReturn(Exception):
 def rreturn(value):
     raise ReactiveReturn(value)
 
-def reactive(func):
-    def wrapper(*args, **kwargs):
-        def continuation(is_exc, val, gen = None, retval = None):
-            while True:
-                try:
-                    if is_exc:
-                        res = gen.throw(val)
-                    else:
-                        res = gen.send(val)
-                except (GeneratorExit, StopIteration):
-                    retval.set()
-                except ReactiveReturn as ex:
-                    retval.set(ex.value)
-                except Exception as ex:
-                    retval.throw(ex)
+class Return(object):
+    """returns a value from a reactive function without raising an exception
+    (cheaper than ``rreturn``): ``yield Return(value)``. the generator is
+    closed right away, so its finally clauses run before the value is 
+    delivered, just as with ``rreturn``"""
+    __slots__ = ["value"]
+    def __init__(self, value = None):
+        self.value = value
+
+# a reactive function that yields an already completed deferred is resumed
+# in place, in a loop, rather than by a (recursive) callback. this holds for
+# ReactorDeferreds as well, but only so many times in a row; after that the
+# resumption goes through the reactor's queue, so that a generator that is
+# never short of data can't starve everything else
+_eager_budget = 1000
+
+def set_eager_resumption(budget = 1000):
+    """sets the number of completed ReactorDeferreds a reactive function may
+    consume in a row without going through the reactor; 0 makes them always
+    go through it. completed plain deferreds are always consumed in place"""
+    global _eager_budget
+    _eager_budget = budget or 0
+
+def _excepthook(exc):
+    """prints an exception that a reactive function ended with (along with 
+    its recorded trace), unless it's been marked as ``_handled``"""
+    if getattr(exc, "_handled", False):
+        return
+    for tb in format_trace(getattr(exc, "_trace", None), exc):
+        sys.stderr.write("%s\n%s\n" % (tb, "-" * 60))
+    sys.stderr.write("$$ %r\n" % (exc,))
+    exc._handled = True
+
+class _Continuation(object):
+    """drives a reactive function's generator: registered as the callback of
+    every deferred it yields, and sets ``retval`` when it's done (after 
+    which ``gen`` is None, and resuming it does nothing)"""
+    __slots__ = ["gen", "retval", "waiting"]
+    def __init__(self, gen, retval):
+        self.gen = gen
+        self.retval = retval
+        self.waiting = None
+    def cancel(self):
+        """the result has been canceled: cancels the deferred the generator
+        is waiting on and throws Cancelled into it"""
+        waiting = self.waiting
+        if waiting is None:
+            # running (and canceling itself), or waiting on something that
+            # can't be canceled
+            return
+        self.waiting = None
+        waiting.cancel()
+        self(True, Cancelled())
+    def __call__(self, is_exc, val):
+        gen = self.gen
+        if gen is None:
+            return
+        self.waiting = None
+        budget = _eager_budget
+        while True:
+            try:
+                if is_exc:
+                    res = gen.throw(val)
+                else:
+                    res = gen.send(val)
+                if res.__class__ is Return:
+                    gen.close()
+            except (GeneratorExit, StopIteration):
+                self.gen = None
+                self.retval.set()
+            except ReactiveReturn as ex:
+                self.gen = None
+                self.retval.set(ex.value)
+            except Exception as ex:
+                self.gen = None
+                _throw(self.retval, ex)
+            else:
+                if res.__class__ is Return:
+                    self.gen = None
+                    self.retval.set(res.value)
+                elif isinstance(res, Deferred):
+                    if res.value and not res.canceled:
+                        if budget > 0 or not isinstance(res, ReactorDeferred):
+                            budget -= 1
+                            is_exc, val = res.value
+                            continue
+                    self.waiting = res
+                    res.register(self)
+                else:
+                    is_exc = False
+                    val = res
+                    continue
+            break
+
+class _CoroutineContinuation(_Continuation):
+    """drives a native coroutine (``async def``), which awaits deferreds 
+    and returns its result for real"""
+    __slots__ = []
+    def __call__(self, is_exc, val):
+        coro = self.gen
+        if coro is None:
+            return
+        self.waiting = None
+        while True:
+            try:
+                if is_exc:
+                    res = coro.throw(val)
+                else:
+                    res = coro.send(val)
+            except StopIteration as ex:
+                self.gen = None
+                self.retval.set(ex.args[0] if ex.args else None)
+            except ReactiveReturn as ex:
+                self.gen = None
+                self.retval.set(ex.value)
+            except Exception as ex:
+                self.gen = None
+                _throw(self.retval, ex)
+            else:
+                if isinstance(res, Deferred):
+                    # awaiting a set deferred doesn't get here
+                    self.waiting = res
+                    res.register(self)
+                elif getattr(res, "_asyncio_future_blocking", False):
+                    # an asyncio future, which returns (or raises) its own
+                    # outcome when resumed. it must belong to the loop we're
+                    # running on (see AsyncioReactor)
+                    res._asyncio_future_blocking = False
+                    res.add_done_callback(self._resume)
                 else:
-                    if isinstance(res, Deferred):
-                        res.register(continuation)
-                    else:
-                        val = res
-                        continue
-                break
+                    is_exc = True
+                    val = TypeError("reactive coroutines can only await deferreds, "
+                        "not %r" % (res,))
+                    continue
+            break
+    def _resume(self, fut):
+        self(False, None)
+
+# the exceptions _throw is passing up a chain of reactive functions (which
+# happens synchronously, as their results are plain deferreds)
+_unwinding = []
 
+def _is_unwinding(exc):
+    for other in _unwinding:
+        if other is exc:
+            return True
+    return False
+
+def _throw(retval, exc):
+    if _is_unwinding(exc):
+        # on its way up from a reactive function below, which reports it
+        # once it's through
+        retval.throw(exc)
+        return
+    retval._record_trace(exc)
+    trace = exc._trace
+    _unwinding.append(exc)
+    try:
+        retval._set(True, exc)
+    finally:
+        _unwinding.pop()
+    if not retval.canceled:
+        # with the trace of where it was raised, not of where it ended up
+        exc._trace = trace
+        _excepthook(exc)
+
+def _forward(retval, is_exc, val):
+    if is_exc:
+        retval._set(True, val)
+        if not retval.canceled and not _is_unwinding(val):
+            _excepthook(val)
+    else:
+        retval._set(False, val)
+
+def reactive(func):
+    def wrapper(*args, **kwargs):
         retval = Deferred()
-        def excepthook(is_exc, val):
-            if is_exc and not getattr(val, "_handled", False):
-                for tb in getattr(val, "_tracebacks", ()):
-                    print >>sys.stderr, tb
-                    print >>sys.stderr, "-" * 60
-                print >>sys.stderr, "$$", repr(val)
-                val._handled = True
-        retval.register(excepthook)
         try:
             gen = func(*args, **kwargs)
         except (GeneratorExit, StopIteration):
@@ -115,23 +454,26 @@ def reactive(func):
         except ReactiveReturn as ex:
             retval.set(ex.value)
         except Exception as ex:
-            retval.throw(ex)
+            _throw(retval, ex)
         else:
             if isinstance(gen, GeneratorType):
-                continuation.func_defaults = (gen, retval)
-                continuation(False, None)
+                cont = _Continuation(gen, retval)
+                cont(False, None)
+                if not retval.value:
+                    retval._canceller = cont.cancel
             elif isinstance(gen, Deferred):
-                gen.register(retval._set)
+                gen.register(functools.partial(_forward, retval))
+                if not retval.value:
+                    retval._canceller = gen.cancel
+            elif hasattr(gen, "send") and hasattr(gen, "throw"):
+                # a coroutine (or anything that behaves like one)
+                cont = _CoroutineContinuation(gen, retval)
+                cont(False, None)
+                if not retval.value:
+                    retval._canceller = cont.cancel
             else:
                 retval.set(gen)
         return retval
 
     functools.update_wrapper(wrapper, func)
     return wrapper
-
-
-
-
-
-
-
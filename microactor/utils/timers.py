@@ -0,0 +1,230 @@
+import sys
+import time
+import math
+import itertools
+from operator import attrgetter
+
+
+#===============================================================================
+# Monotonic clock
+#===============================================================================
+def _get_monotonic():
+    if hasattr(time, "monotonic"):
+        return time.monotonic
+    if not sys.platform.startswith("linux"):
+        return time.time
+    try:
+        import ctypes
+        import ctypes.util
+        class timespec(ctypes.Structure):
+            _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno = True)
+        clock_gettime = libc.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    except (ImportError, OSError, AttributeError):
+        return time.time
+    CLOCK_MONOTONIC = 1
+    ts = timespec()
+    tsref = ctypes.byref(ts)
+    def monotonic():
+        if clock_gettime(CLOCK_MONOTONIC, tsref) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, "clock_gettime failed")
+        return ts.tv_sec + ts.tv_nsec * 1e-9
+    return monotonic
+
+monotonic = _get_monotonic()
+
+
+#===============================================================================
+# Timing wheel
+#===============================================================================
+class Timer(object):
+    """a handle to a scheduled call, as returned by ``reactor.call_at`` and
+    ``reactor.call_later``. Canceling a timer is O(1)"""
+    __slots__ = ["when", "func", "args", "kwargs", "canceled", "_tick", "_seq",
+        "_slot", "_wheel"]
+    def __init__(self, wheel, when, tick, seq, func, args, kwargs):
+        self.when = when
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.canceled = False
+        self._tick = tick
+        self._seq = seq
+        self._slot = None
+        self._wheel = wheel
+    def __repr__(self):
+        return "<Timer %r at %.3f%s>" % (getattr(self.func, "__name__", self.func),
+            self.when, " (canceled)" if self.canceled else "")
+
+    def is_pending(self):
+        return self._slot is not None
+
+    def cancel(self):
+        if self.canceled:
+            return
+        self.canceled = True
+        if self._slot is not None:
+            self._wheel._remove(self)
+        # drop references early, so canceled timers don't keep their
+        # callbacks (and whatever those hold) alive
+        self.func = self.args = self.kwargs = None
+
+    def fire(self):
+        if self.canceled:
+            return
+        func, args, kwargs = self.func, self.args, self.kwargs
+        self.func = self.args = self.kwargs = None
+        func(*args, **kwargs)
+
+
+class TimingWheel(object):
+    """a hierarchical timing wheel (a-la the linux kernel). the first level
+    has ``2**ROOT_BITS`` slots of ``resolution`` seconds each; every subsequent
+    level has ``2**LEVEL_BITS`` slots, each spanning an entire revolution of
+    the level below it. timers are kept in per-slot sets, so scheduling and
+    canceling are O(1); timers on the upper levels are cascaded down as the
+    wheel turns. timestamps are given in terms of ``clock``"""
+    ROOT_BITS = 8
+    LEVEL_BITS = 6
+    LEVELS = 4
+
+    def __init__(self, resolution = 0.001, clock = monotonic):
+        self.resolution = resolution
+        self.clock = clock
+        self._origin = clock()
+        self._current = 0       # the next tick to be processed
+        self._seq = itertools.count()
+        root_size = 1 << self.ROOT_BITS
+        level_size = 1 << self.LEVEL_BITS
+        self._levels = [[set() for _ in range(root_size)]]
+        self._levels.extend([set() for _ in range(level_size)]
+            for _ in range(self.LEVELS - 1))
+        self._counts = [0] * self.LEVELS
+        self._shifts = [0] + [self.ROOT_BITS + self.LEVEL_BITS * i
+            for i in range(self.LEVELS - 1)]
+        self._masks = [root_size - 1] + [level_size - 1] * (self.LEVELS - 1)
+        # the span (in ticks) covered by levels 0..i
+        self._spans = [1 << (self.ROOT_BITS + self.LEVEL_BITS * i)
+            for i in range(self.LEVELS)]
+
+    def __len__(self):
+        return sum(self._counts)
+    def __nonzero__(self):
+        return any(self._counts)
+    __bool__ = __nonzero__
+
+    def _to_tick(self, ts):
+        # round up, so that timers never fire early
+        return int(math.ceil((ts - self._origin) / self.resolution))
+    def _from_tick(self, tick):
+        return self._origin + tick * self.resolution
+
+    def schedule(self, ts, func, args = (), kwargs = {}):
+        """schedules ``func(*args, **kwargs)`` to be called at ``ts`` (in terms
+        of ``clock``); returns a :class:`Timer`"""
+        timer = Timer(self, ts, self._to_tick(ts), next(self._seq), func, args, kwargs)
+        self._insert(timer)
+        return timer
+
+    def _insert(self, timer):
+        tick = max(timer._tick, self._current)
+        delta = tick - self._current
+        for level, span in enumerate(self._spans):
+            if delta < span:
+                break
+        else:
+            # beyond the wheel's range; park it in the farthest slot. it
+            # will be reinserted when that slot cascades
+            tick = self._current + span - 1
+        slot = self._levels[level][(tick >> self._shifts[level]) & self._masks[level]]
+        slot.add(timer)
+        timer._slot = (level, slot)
+        self._counts[level] += 1
+
+    def _remove(self, timer):
+        level, slot = timer._slot
+        slot.discard(timer)
+        self._counts[level] -= 1
+        timer._slot = None
+
+    def _cascade(self, level):
+        slot = self._levels[level][(self._current >> self._shifts[level]) & self._masks[level]]
+        if not slot:
+            return
+        timers = list(slot)
+        slot.clear()
+        self._counts[level] -= len(timers)
+        for timer in timers:
+            timer._slot = None
+            self._insert(timer)
+
+    def pop_expired(self, now):
+        """advances the wheel up to ``now``, returning the list of expired
+        timers, ordered by their scheduled time"""
+        end = int(math.floor((now - self._origin) / self.resolution))
+        if end < self._current:
+            return []
+        expired = []
+        root = self._levels[0]
+        root_mask = self._masks[0]
+        counts = self._counts
+        while self._current <= end:
+            cur = self._current
+            if not (cur & root_mask):
+                for level in range(1, self.LEVELS):
+                    self._cascade(level)
+                    if (cur >> self._shifts[level]) & self._masks[level]:
+                        break
+            slot = root[cur & root_mask]
+            if slot:
+                counts[0] -= len(slot)
+                for timer in slot:
+                    timer._slot = None
+                expired.extend(slot)
+                slot.clear()
+            if not any(counts):
+                self._current = end + 1
+            elif not counts[0]:
+                # skip straight to the next cascade point
+                self._current = min(end + 1, (cur | root_mask) + 1)
+            else:
+                self._current = cur + 1
+        if len(expired) > 1:
+            expired.sort(key = attrgetter("when", "_seq"))
+        return expired
+
+    def next_deadline(self):
+        """returns the time (in terms of ``clock``) at which the wheel next
+        needs to be serviced, or None if there are no pending timers"""
+        cur = self._current
+        best = None
+        if self._counts[0]:
+            root = self._levels[0]
+            mask = self._masks[0]
+            for tick in range(cur, cur + mask + 1):
+                slot = root[tick & mask]
+                if slot:
+                    best = tick
+                    break
+        for level in range(1, self.LEVELS):
+            if not self._counts[level]:
+                continue
+            shift = self._shifts[level]
+            mask = self._masks[level]
+            slots = self._levels[level]
+            unit = 1 << shift
+            first = ((cur + unit - 1) >> shift) << shift
+            if best is not None and first >= best:
+                continue
+            for i in range(mask + 1):
+                tick = first + i * unit
+                if best is not None and tick >= best:
+                    break
+                if slots[(tick >> shift) & mask]:
+                    best = tick
+                    break
+        if best is None:
+            return None
+        return self._from_tick(best)
@@ -1,7 +1,8 @@
+import re
 import sys
 import codecs
 from struct import Struct
-from .deferred import reactive, rreturn
+from .deferred import reactive, Return
 from microactor.reactors.transports import TransportClosed
 
 
@@ -45,9 +46,9 @@ class CodecTransport(StreamTransportAdapter):
     def read(self, count):
         raw = yield self.transport.read(count)
         if raw is None:
-            rreturn(self.decoder.decode("", final = True))
+            yield Return(self.decoder.decode("", final = True))
         else:
-            rreturn(self.decoder.decode(raw))
+            yield Return(self.decoder.decode(raw))
     
     @reactive
     def write(self, data):
@@ -56,13 +57,58 @@ class CodecTransport(StreamTransportAdapter):
             yield self.transport.write(raw)
 
 
+class _Delimiters(object):
+    """a set of delimiters compiled into a single regex, which finds the
+    earliest of them (and the longest, if several start there)"""
+    __slots__ = ["regex", "tail_size", "prefixes", "prefix_size", "partials"]
+    
+    def __init__(self, patterns):
+        patterns = sorted(set(patterns), key = len, reverse = True)
+        self.regex = re.compile("|".join(re.escape(p) for p in patterns))
+        self.tail_size = len(patterns[0]) - 1
+        # delimiters that may turn out to be the beginning of a longer one
+        self.prefixes = frozenset(p for p in patterns 
+            if any(p != q and q.startswith(p) for q in patterns))
+        self.prefix_size = max(len(p) for p in self.prefixes) if self.prefixes else 0
+        # the beginnings of delimiters, which may be completed by more data
+        self.partials = frozenset(p[:i] for p in patterns for i in xrange(1, len(p)))
+
+_delimiters_cache = {}
+
+def _get_delimiters(patterns):
+    if isinstance(patterns, _Delimiters):
+        return patterns
+    elif isinstance(patterns, str):
+        patterns = (patterns,)
+    elif not isinstance(patterns, tuple):
+        patterns = tuple(patterns)
+    try:
+        return _delimiters_cache[patterns]
+    except KeyError:
+        if len(_delimiters_cache) >= 100:
+            _delimiters_cache.clear()
+        delims = _delimiters_cache[patterns] = _Delimiters(patterns)
+        return delims
+
+_NEWLINES = _Delimiters(("\r\n", "\r", "\n"))
+
+
 class BufferedTransport(StreamTransportAdapter):
+    """buffers reads and writes of the underlying transport. the read buffer
+    is the list of chunks read so far, with a cursor (the first unread chunk
+    and the offset into it), so consuming data copies only what's returned;
+    the write buffer is a list of chunks, joined once when flushed"""
+    
     def __init__(self, transport, read_buffer_size = 16000, write_buffer_size = 16000):
         StreamTransportAdapter.__init__(self, transport)
         self._rbufsize = read_buffer_size
         self._wbufsize = write_buffer_size
-        self._rbuf = ""
-        self._wbuf = ""
+        self._rchunks = []
+        self._rhead = 0       # index of the first unread chunk
+        self._rpos = 0        # offset of the first unread byte in it
+        self._rlen = 0        # number of unread bytes
+        self._wchunks = []
+        self._wlen = 0
         self.properties["buffered"] = True
 
     @reactive
@@ -79,24 +125,154 @@ class BufferedTransport(StreamTransportAdapter):
             except TransportClosed:
                 data = None
             if not data:
-                rreturn(True)
-            self._rbuf += data
+                yield Return(True)
+            self._rchunks.append(data)
+            self._rlen += len(data)
             if len(data) < count:
                 break
             count -= len(data)
-        rreturn(False)
+        yield Return(False)
+    
+    def _consume(self, count):
+        """removes (and returns) the first `count` unread bytes"""
+        if count >= self._rlen:
+            return self._consume_all()
+        chunks = self._rchunks
+        head = self._rhead
+        first = chunks[head]
+        start = self._rpos
+        end = start + count
+        self._rlen -= count
+        if end < len(first):
+            self._rpos = end
+            return first[start:end]
+        # spans several chunks
+        pieces = [first[start:]] if start else [first]
+        head += 1
+        count = end - len(first)
+        while count > 0:
+            chunk = chunks[head]
+            if count < len(chunk):
+                pieces.append(chunk[:count])
+                break
+            pieces.append(chunk)
+            head += 1
+            count -= len(chunk)
+        self._rpos = count
+        if head > 32 and head * 2 > len(chunks):
+            # drop the consumed chunks every so often
+            del chunks[:head]
+            head = 0
+        self._rhead = head
+        return pieces[0] if len(pieces) == 1 else "".join(pieces)
+
+    def _consume_all(self):
+        chunks = self._rchunks[self._rhead:]
+        if chunks and self._rpos:
+            chunks[0] = chunks[0][self._rpos:]
+        del self._rchunks[:]
+        self._rhead = 0
+        self._rpos = 0
+        self._rlen = 0
+        return chunks[0] if len(chunks) == 1 else "".join(chunks)
+    
+    def _locate(self, pos):
+        """returns the index of the chunk holding the unread byte at `pos`
+        (counting from the cursor) and the position of that chunk"""
+        chunks = self._rchunks
+        index = len(chunks)
+        offset = self._rlen
+        while index > self._rhead and offset > pos:
+            index -= 1
+            offset -= len(chunks[index])
+        return index, offset
+    
+    def _scan(self, delims, start, index, offset, eof):
+        """returns the positions (counting from the cursor) where the earliest
+        of `delims` at or after `start` begins and ends, or None; the scan
+        begins with the chunk at `index`, whose position is `offset`"""
+        chunks = self._rchunks
+        search = delims.regex.search
+        tail_size = delims.tail_size
+        last = len(chunks) - 1
+        tail = ""    # the last tail_size bytes before the current chunk
+        for i in xrange(index, last + 1):
+            chunk = chunks[i]
+            if tail:
+                # matches that straddle chunks
+                text = tail + chunk[:tail_size]
+                match = search(text, max(start - offset + len(tail), 0))
+                if match and match.start() < len(tail):
+                    base = offset - len(tail)
+                    break
+            text = chunk
+            match = search(chunk, start - offset if start > offset else 0)
+            if match:
+                base = offset
+                break
+            if tail_size and i < last:
+                tail = (tail + chunk)[-tail_size:] if len(chunk) < tail_size else chunk[-tail_size:]
+                if offset < 0:
+                    # never look before the cursor
+                    tail = tail[max(len(tail) - len(chunk) - offset, 0):]
+            offset += len(chunk)
+        else:
+            return None
+        begin = base + match.start()
+        if match.end() - match.start() > delims.prefix_size or match.group() not in delims.prefixes:
+            end = base + match.end()
+        else:
+            # a longer delimiter may go on into the following chunks
+            rest = text[match.start():match.start() + tail_size + 1]
+            for j in xrange(i + 1, last + 1):
+                if len(rest) > tail_size:
+                    break
+                rest += chunks[j][:tail_size]
+            end = begin + delims.regex.match(rest).end()
+        if not eof and self._rlen - begin <= tail_size and self._is_partial(delims, begin):
+            # more data may complete a delimiter that starts here, or even 
+            # earlier ("\r" of "\r\n")
+            return None
+        return begin, end
+    
+    def _is_partial(self, delims, begin):
+        """tells whether the unread data from some position up to `begin` 
+        (counting from the cursor) to the end is the beginning of a delimiter"""
+        count = min(delims.tail_size, self._rlen)
+        chunks = self._rchunks
+        index = len(chunks)
+        pieces = []
+        remaining = count
+        while remaining > 0:
+            index -= 1
+            chunk = chunks[index]
+            if index == self._rhead and self._rpos:
+                chunk = chunk[self._rpos:]
+            pieces.append(chunk[-remaining:])
+            remaining -= len(chunk)
+        pieces.reverse()
+        tail = "".join(pieces)
+        partials = delims.partials
+        for i in xrange(count - (self._rlen - begin) + 1):
+            if tail[i:] in partials:
+                return True
+        return False
     
     @reactive
     def read(self, count):
         if count < 0:
             data = yield self.read_all()
-            rreturn(data)
-        if count > len(self._rbuf):
-            yield self._fill_rbuf(self._rbufsize - len(self._rbuf))
-
-        data = self._rbuf[:count]
-        self._rbuf = self._rbuf[count:]
-        rreturn(data)
+            yield Return(data)
+        if not self._rlen and count >= self._rbufsize:
+            # nothing buffered and a big read: no point in buffering it
+            try:
+                data = yield self.transport.read(count)
+            except TransportClosed:
+                data = None
+            yield Return(data or "")
+        if count > self._rlen:
+            yield self._fill_rbuf(self._rbufsize - self._rlen)
+        yield Return(self._consume(count))
 
     @reactive
     def read_exactly(self, count, raise_on_eof = True):
@@ -111,62 +287,109 @@ class BufferedTransport(StreamTransportAdapter):
         data = "".join(buffer)
         if raise_on_eof and count > 0:
             raise EOFError("requested %r bytes, got %r" % (orig_count, len(data)), data)
-        rreturn(data)
+        yield Return(data)
     
     @reactive
     def read_all(self, chunk = 16000):
-        chunks = [self._rbuf]
-        self._rbuf = ""
+        chunks = [self._consume_all()]
         while True:
             data = yield self.transport.read(chunk)
             if not data:
                 break
             chunks.append(data)
-        rreturn("".join(chunks))
+        yield Return("".join(chunks))
     
     @reactive
     def read_until(self, patterns, raise_on_eof = False, include_pattern = True):
-        if isinstance(patterns, str):
-            patterns = [patterns]
-        longest_pattern = max(len(p) for p in patterns)
+        delims = _get_delimiters(patterns)
         eof = False
-        last_index = 0
+        start = 0
+        index = self._rhead
+        offset = -self._rpos
         while True:
-            for pat in patterns:
-                ind = self._rbuf.find(pat, last_index)
-                if ind >= 0:
-                    if include_pattern:
-                        data = self._rbuf[:ind + len(pat)]
-                    else:
-                        data = self._rbuf[:ind]
-                    self._rbuf = self._rbuf[ind + len(pat):]
-                    rreturn(data)
-            else:
-                if eof:
-                    if raise_on_eof:
-                        raise EOFError()
-                    else:
-                        data = self._rbuf
-                        self._rbuf = ""
-                        rreturn(data)
-                eof = yield self._fill_rbuf(self._rbufsize)
-                last_index = len(self._rbuf) - longest_pattern
+            match = self._scan(delims, start, index, offset, eof)
+            if match:
+                begin, end = match
+                if include_pattern:
+                    yield Return(self._consume(end))
+                data = self._consume(begin)
+                self._consume(end - begin)
+                yield Return(data)
+            if eof:
+                if raise_on_eof:
+                    raise EOFError()
+                else:
+                    yield Return(self._consume_all())
+            # resume where this scan stopped (a delimiter may straddle the 
+            # old and the new data)
+            start = max(self._rlen - delims.tail_size, 0)
+            index, offset = self._locate(start)
+            eof = yield self._fill_rbuf(self._rbufsize)
     
     def read_line(self, include_newline = True):
-        return self.read_until(("\r\n", "\r", "\n"), include_pattern = include_newline)
+        return self.read_until(_NEWLINES, include_pattern = include_newline)
+    
+    @reactive
+    def read_lines(self, max_lines = -1, include_newline = True):
+        """returns a list of all the complete lines already buffered (up to
+        `max_lines`, if positive), waiting for one if there are none. at EOF,
+        what's left is the last line; an empty list means there's nothing
+        more to read"""
+        delims = _NEWLINES
+        lines = []
+        eof = False
+        start = 0
+        index = self._rhead
+        offset = -self._rpos
+        while True:
+            match = self._scan(delims, start, index, offset, eof)
+            if match:
+                begin, end = match
+                if include_newline:
+                    lines.append(self._consume(end))
+                else:
+                    lines.append(self._consume(begin))
+                    self._consume(end - begin)
+                if len(lines) == max_lines:
+                    break
+                start = 0
+                index = self._rhead
+                offset = -self._rpos
+            elif lines:
+                break
+            elif eof:
+                if self._rlen:
+                    lines.append(self._consume_all())
+                break
+            else:
+                start = max(self._rlen - delims.tail_size, 0)
+                index, offset = self._locate(start)
+                eof = yield self._fill_rbuf(self._rbufsize)
+        yield Return(lines)
     
     @reactive
     def flush(self):
-        data = self._wbuf
-        self._wbuf = ""
-        yield self.transport.write(data)
+        chunks = self._wchunks
+        self._wchunks = []
+        self._wlen = 0
+        yield self.transport.write(chunks[0] if len(chunks) == 1 else "".join(chunks))
         if hasattr(self.transport, "flush"):
             yield self.transport.flush()
     
     @reactive
     def write(self, data):
-        self._wbuf += data
-        if len(self._wbuf) > self._wbufsize:
+        if len(data) >= self._wbufsize:
+            # too big to be worth copying into the buffer; bytearrays and
+            # memoryviews go to the transport as they are
+            if self._wchunks:
+                yield self.flush()
+            yield self.transport.write(data)
+            return
+        if not isinstance(data, str):
+            data = memoryview(data).tobytes()
+        self._wchunks.append(data)
+        self._wlen += len(data)
+        if self._wlen > self._wbufsize:
             yield self.flush()
 
 
@@ -195,13 +418,13 @@ class BoundTransport(StreamTransportAdapter):
     def read(self, count):
         if self._rlength is None:
             data = yield self.transport.read(count)
-            rreturn(data)
+            yield Return(data)
         if self._rlength <= 0:
-            rreturn("")
+            yield Return("")
         count = min(count, self._rlength)
         data = yield self.transport.read(count)
         self._rlength -= len(data)
-        rreturn(data)
+        yield Return(data)
 
     @reactive
     def skip(self, count = -1):
@@ -214,7 +437,7 @@ class BoundTransport(StreamTransportAdapter):
                 break
             actually_read += len(data)
             count -= len(data)
-        rreturn(actually_read)
+        yield Return(actually_read)
 
     @reactive
     def write(self, data):
@@ -255,7 +478,7 @@ class PacketTransport(object):
         if self.max_length > 0 and length > self.max_length:
             raise PacketTooLong("packet length is %d, exceeding %d" % (length, self.max_length))
         data = yield self.transport.read_exactly(length)
-        rreturn(data)
+        yield Return(data)
     
     @reactive
     def send(self, data, flush = True):
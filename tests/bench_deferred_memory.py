@@ -0,0 +1,65 @@
+"""
+measures the memory held by pending operations: bare deferreds waited upon
+by a callback, and chains of reactive calls suspended on a deferred (as a
+connection handler blocked on a read would be). no reactor is involved.
+
+usage: python bench_deferred_memory.py [count]
+"""
+import os
+import gc
+import sys
+import time
+from microactor.utils import Deferred, reactive
+
+
+def rss():
+    """the resident set size of this process, in bytes"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def measure(name, count, factory):
+    gc.collect()
+    objs0 = len(gc.get_objects())
+    rss0 = rss()
+    t0 = time.time()
+    held = [factory() for _ in xrange(count)]
+    t1 = time.time()
+    gc.collect()
+    objs1 = len(gc.get_objects())
+    rss1 = rss()
+    print "%-24s %8.1f bytes/op %6.2f gc objects/op %8.2f us/op" % (name,
+        (rss1 - rss0) / float(count), (objs1 - objs0) / float(count),
+        (t1 - t0) * 1e6 / count)
+    del held
+    gc.collect()
+
+def callback(is_exc, val):
+    pass
+
+def pending_deferred():
+    dfr = Deferred()
+    dfr.register(callback)
+    return dfr
+
+@reactive
+def read_message(dfr):
+    data = yield dfr
+    yield data
+
+@reactive
+def handle_connection(dfr):
+    while True:
+        msg = yield read_message(dfr)
+        if not msg:
+            break
+
+def pending_handler():
+    dfr = Deferred()
+    handle_connection(dfr)
+    return dfr
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    measure("pending deferred", count, pending_deferred)
+    measure("pending reactive chain", count, pending_handler)
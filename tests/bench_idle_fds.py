@@ -0,0 +1,60 @@
+"""
+measures the cost of a loop iteration as a function of the number of idle 
+(registered but quiet) fds. each iteration re-registers a single fd, so with
+incremental poller updates the time per iteration should stay flat.
+
+it measures the readiness-based PosixPollingReactors, not the default reactor
+(which may be IoUringReactor); other reactors can be named on the command line
+
+usage: python bench_idle_fds.py [EpollReactor PollReactor ...]
+"""
+import sys
+import socket
+import time
+import microactor
+from microactor.reactors.posix.transports import SocketStreamTransport
+
+
+ITERATIONS = 2000
+
+@microactor.reactive
+def run_one(reactor, num_of_idle):
+    idle = []
+    for _ in range(num_of_idle // 2):
+        for s in socket.socketpair():
+            trns = SocketStreamTransport(reactor, s)
+            trns.read(1)   # never completes
+            idle.append(trns)
+    
+    s1, s2 = socket.socketpair()
+    active = SocketStreamTransport(reactor, s1)
+    t0 = time.time()
+    for _ in range(ITERATIONS):
+        s2.send("x")
+        data = yield active.read(1)
+        assert data == "x"
+    t1 = time.time()
+    print "%6d idle fds: %7.1f us/iteration" % (num_of_idle, (t1 - t0) * 1e6 / ITERATIONS)
+    sys.stdout.flush()
+    for trns in idle:
+        trns.close()
+    active.close()
+    s2.close()
+
+@microactor.reactive
+def main(reactor):
+    for num_of_idle in [0, 100, 1000, 5000, 15000]:
+        yield run_one(reactor, num_of_idle)
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or ["EpollReactor", "PollReactor"]
+    for name in names:
+        cls = getattr(microactor.reactors, name)
+        if not cls.supported():
+            print "reactor:", name, "(not supported)"
+            continue
+        reactor = cls()
+        print "reactor:", name
+        reactor.run(main)
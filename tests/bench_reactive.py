@@ -0,0 +1,87 @@
+"""
+measures the per-call overhead of reactive functions (no reactor involved):
+the time per call, and the number of objects per call left for the cyclic
+garbage collector to reclaim (ideally none).
+
+usage: python bench_reactive.py [count]
+"""
+import gc
+import sys
+import time
+from microactor.utils import Deferred, reactive, rreturn, Return
+
+
+@reactive
+def fall_through(x):
+    yield Deferred(x)
+
+@reactive
+def with_rreturn(x):
+    y = yield Deferred(x)
+    rreturn(y)
+
+@reactive
+def with_return(x):
+    y = yield Deferred(x)
+    yield Return(y)
+
+@reactive
+def nested(x):
+    y = yield with_return(x)
+    yield Return(y)
+
+@reactive
+def waiting(dfr):
+    y = yield dfr
+    yield Return(y)
+
+def pending(x):
+    dfr = Deferred()
+    waiting(dfr)
+    dfr.set(x)
+
+@reactive
+def failing(dfr):
+    yield dfr
+    raise ValueError("boom")
+
+@reactive
+def catching(dfr):
+    try:
+        yield failing(dfr)
+    except ValueError as ex:
+        ex._handled = True
+
+def caught(x):
+    dfr = Deferred()
+    catching(dfr)
+    dfr.set(x)
+
+CASES = [
+    ("fall through", fall_through),
+    ("rreturn", with_rreturn),
+    ("yield Return", with_return),
+    ("nested", nested),
+    ("pending deferred", pending),
+    ("caught exception", caught),
+]
+
+def measure(name, func, count):
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.time()
+        for i in xrange(count):
+            func(i)
+        t1 = time.time()
+    finally:
+        garbage = gc.collect()
+        gc.enable()
+    print "%-18s %8.2f us/call %6.2f cyclic objects/call" % (name,
+        (t1 - t0) * 1e6 / count, garbage / float(count))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    for name, func in CASES:
+        measure(name, func, count)
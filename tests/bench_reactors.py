@@ -0,0 +1,564 @@
+"""
+a localhost-only benchmark suite, run against every (supported) reactor
+backend. results are emitted as JSON (to stdout, or to the file given by -o),
+with a summary on stderr; the exit code is nonzero if any case fails.
+
+usage: python bench_reactors.py [-r EpollReactor,...] [-b echo_latency,...]
+                                [-s SCALE] [-o results.json]
+"""
+import sys
+import time
+import json
+import socket
+import platform
+import optparse
+import microactor
+from microactor.utils import ReactorDeferred, BufferedTransport, reactive, rreturn
+from microactor.reactors import (SelectReactor, PollReactor, EpollReactor, IoUringReactor,
+    AsyncioReactor)
+from microactor.reactors.posix.transports import SocketStreamTransport
+
+
+REACTORS = [SelectReactor, PollReactor, EpollReactor, IoUringReactor, AsyncioReactor]
+CASE_TIMEOUT = 30
+SCALE = 1.0
+
+def scaled(n):
+    return max(int(n * SCALE), 1)
+
+def percentiles(samples):
+    samples = sorted(samples)
+    last = len(samples) - 1
+    return {
+        "p50" : samples[int(round(last * 0.50))],
+        "p90" : samples[int(round(last * 0.90))],
+        "p99" : samples[int(round(last * 0.99))],
+        "max" : samples[-1],
+    }
+
+#===============================================================================
+# Helpers
+#===============================================================================
+@reactive
+def echo_server(listener):
+    while True:
+        conn = yield listener.accept()
+        echo_client(conn)
+
+@reactive
+def echo_client(conn):
+    while True:
+        data = yield conn.read(65536)
+        if not data:
+            break
+        yield conn.write(data)
+    conn.close()
+
+@reactive
+def start_echo(reactor):
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    echo_server(listener)
+    port = listener.sock.getsockname()[1]
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    rreturn((listener, conn))
+
+@reactive
+def read_exactly(conn, count):
+    chunks = []
+    while count > 0:
+        data = yield conn.read(count)
+        if not data:
+            raise EOFError("connection closed")
+        chunks.append(data)
+        count -= len(data)
+    rreturn("".join(chunks))
+
+#===============================================================================
+# Benchmarks
+#===============================================================================
+@reactive
+def bench_echo_latency(reactor):
+    """round-trip latency of small messages over a single connection"""
+    listener, conn = yield start_echo(reactor)
+    count = scaled(3000)
+    msg = "x" * 64
+    samples = []
+    for _ in range(count):
+        t0 = time.time()
+        yield conn.write(msg)
+        yield read_exactly(conn, len(msg))
+        samples.append((time.time() - t0) * 1e6)
+    conn.close()
+    listener.close()
+    res = percentiles(samples)
+    res = dict(("rtt_%s_us" % (k,), v) for k, v in res.items())
+    res["round_trips"] = count
+    rreturn(res)
+
+@reactive
+def bench_echo_throughput(reactor):
+    """bytes per second echoed back over a single connection"""
+    listener, conn = yield start_echo(reactor)
+    chunk = "x" * 65536
+    total = scaled(32 * 1024 * 1024)
+    done = ReactorDeferred(reactor)
+
+    @reactive
+    def reader():
+        remaining = total
+        while remaining > 0:
+            data = yield conn.read(remaining)
+            if not data:
+                raise EOFError("connection closed")
+            remaining -= len(data)
+        done.set()
+
+    t0 = time.time()
+    reader()
+    sent = 0
+    while sent < total:
+        data = chunk[:total - sent]
+        yield conn.write(data)
+        sent += len(data)
+    yield done
+    t1 = time.time()
+    conn.close()
+    listener.close()
+    rreturn({"bytes" : total, "mb_per_sec" : total / (t1 - t0) / 1e6})
+
+@reactive
+def bench_large_write(reactor):
+    """bytes per second of a single large write() (of a string, a bytearray
+    and a memoryview), drained by the other side"""
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+    payload = "x" * scaled(64 * 1024 * 1024)
+
+    @reactive
+    def drain(done):
+        remaining = len(payload)
+        while remaining > 0:
+            data = yield peer.read(remaining)
+            if not data:
+                raise EOFError("connection closed")
+            remaining -= len(data)
+        done.set()
+
+    res = {"bytes" : len(payload)}
+    for name, data in [("str", payload), ("bytearray", bytearray(payload)),
+            ("memoryview", memoryview(payload))]:
+        done = ReactorDeferred(reactor)
+        t0 = time.time()
+        drain(done)
+        yield conn.write(data)
+        yield done
+        t1 = time.time()
+        res["%s_mb_per_sec" % (name,)] = len(payload) / (t1 - t0) / 1e6
+    conn.close()
+    peer.close()
+    listener.close()
+    rreturn(res)
+
+@reactive
+def bench_read_modes(reactor):
+    """bytes per second received with read() (a new string per read), 
+    readinto() a preallocated buffer, and read_view() of the transport's 
+    own buffer"""
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+    total = scaled(64 * 1024 * 1024)
+    payload = "x" * (1024 * 1024)
+    buf = memoryview(bytearray(65536))
+
+    @reactive
+    def feed():
+        sent = 0
+        while sent < total:
+            yield peer.write(payload[:total - sent])
+            sent += len(payload)
+
+    res = {"bytes" : total}
+    for mode in ["read", "readinto", "read_view"]:
+        t0 = time.time()
+        feed()
+        received = 0
+        while received < total:
+            if mode == "read":
+                data = yield conn.read(65536)
+                count = len(data) if data else 0
+            elif mode == "readinto":
+                count = yield conn.readinto(buf)
+            else:
+                data = yield conn.read_view(65536)
+                count = len(data) if data else 0
+            if not count:
+                raise EOFError("connection closed")
+            received += count
+        res["%s_mb_per_sec" % (mode,)] = total / (time.time() - t0) / 1e6
+    conn.close()
+    peer.close()
+    listener.close()
+    rreturn(res)
+
+@reactive
+def bench_small_writes(reactor):
+    """small writes per second, each one waited for before the next, and all
+    issued at once (queued by the transport, and coalesced into fewer sends)"""
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+    count = scaled(20000)
+    msg = "x" * 32
+
+    @reactive
+    def drain(done):
+        remaining = count * len(msg)
+        while remaining > 0:
+            data = yield peer.read(65536)
+            if not data:
+                raise EOFError("connection closed")
+            remaining -= len(data)
+        done.set()
+
+    res = {"writes" : count}
+    done = ReactorDeferred(reactor)
+    drain(done)
+    t0 = time.time()
+    for _ in xrange(count):
+        yield conn.write(msg)
+    yield done
+    res["serialized_writes_per_sec"] = count / (time.time() - t0)
+
+    done = ReactorDeferred(reactor)
+    drain(done)
+    t0 = time.time()
+    dfrs = [conn.write(msg) for _ in xrange(count)]
+    yield dfrs[-1]
+    yield done
+    res["pipelined_writes_per_sec"] = count / (time.time() - t0)
+    conn.close()
+    peer.close()
+    listener.close()
+    rreturn(res)
+
+@reactive
+def bench_idle_connections(reactor):
+    """round-trip time of one active socketpair, with and without many idle
+    (registered but quiet) ones"""
+    iterations = scaled(2000)
+    res = {}
+    for num_of_idle in [0, scaled(2000)]:
+        idle = []
+        for _ in range(num_of_idle // 2):
+            for s in socket.socketpair():
+                trns = SocketStreamTransport(reactor, s)
+                trns.read(1)
+                idle.append(trns)
+        s1, s2 = socket.socketpair()
+        active = SocketStreamTransport(reactor, s1)
+        t0 = time.time()
+        for _ in range(iterations):
+            s2.send("x")
+            yield active.read(1)
+        t1 = time.time()
+        res["us_per_iteration_%d_idle" % (num_of_idle,)] = (t1 - t0) * 1e6 / iterations
+        for trns in idle:
+            trns.close()
+        active.close()
+        s2.close()
+    rreturn(res)
+
+@reactive
+def bench_timer_churn(reactor):
+    """scheduling and canceling timers, most of which never fire"""
+    count = scaled(100000)
+    t0 = time.time()
+    for i in range(count):
+        timer = reactor.call_later(10 + (i % 1000) * 0.01, None)
+        timer.cancel()
+    t1 = time.time()
+    fired = []
+    for i in range(scaled(1000)):
+        reactor.call_later((i % 50) * 0.001, fired.append, i)
+    yield reactor.jobs.sleep(0.1)
+    if len(fired) != scaled(1000):
+        raise AssertionError("only %d timers fired" % (len(fired),))
+    rreturn({"schedule_cancel_per_sec" : count / (t1 - t0)})
+
+@reactive
+def bench_call_throughput(reactor):
+    """callbacks per second through reactor.call"""
+    count = scaled(200000)
+    done = ReactorDeferred(reactor)
+    counter = [0]
+    def cb():
+        counter[0] += 1
+        if counter[0] == count:
+            done.set()
+    t0 = time.time()
+    for _ in range(count):
+        reactor.call(cb)
+    yield done
+    t1 = time.time()
+    rreturn({"calls_per_sec" : count / (t1 - t0)})
+
+@reactive
+def bench_threadpool(reactor):
+    """thread-pool completions per second"""
+    count = scaled(5000)
+    t0 = time.time()
+    dfrs = [reactor.threadpool.call(abs, -i) for i in range(count)]
+    for dfr in dfrs:
+        yield dfr
+    t1 = time.time()
+    rreturn({"completions_per_sec" : count / (t1 - t0)})
+
+@reactive
+def bench_read_line(reactor):
+    """lines per second read off a BufferedTransport, most of which are
+    already buffered by the time they're asked for"""
+    listener, conn = yield start_echo(reactor)
+    line = "x" * 30 + "\r\n"
+    count = scaled(200000)
+    per_chunk = 2000
+    done = ReactorDeferred(reactor)
+
+    @reactive
+    def reader():
+        bt = BufferedTransport(conn, read_buffer_size = 65536)
+        for _ in xrange(count):
+            data = yield bt.read_line()
+            if data != line:
+                raise AssertionError("got %r" % (data[:100],))
+        done.set()
+
+    t0 = time.time()
+    reader()
+    remaining = count
+    while remaining > 0:
+        n = min(per_chunk, remaining)
+        yield conn.write(line * n)
+        remaining -= n
+    yield done
+    t1 = time.time()
+    conn.close()
+    listener.close()
+    rreturn({"lines" : count, "lines_per_sec" : count / (t1 - t0)})
+
+class MemoryTransport(object):
+    """hands out ``data`` in reads of at most ``chunk`` bytes and swallows 
+    writes, all completing straight away"""
+    def __init__(self, reactor, data = "", chunk = 1400):
+        self.reactor = reactor
+        self.properties = {"readable" : True, "writable" : True}
+        self.data = data
+        self.chunk = chunk
+        self.pos = 0
+        self.written = 0
+    def read(self, count):
+        data = self.data[self.pos:self.pos + min(count, self.chunk)]
+        self.pos += len(data)
+        return ReactorDeferred(self.reactor, data or None)
+    def write(self, data):
+        self.written += len(data)
+        return ReactorDeferred(self.reactor, None)
+
+@reactive
+def bench_buffering(reactor):
+    """BufferedTransport on top of a transport that hands out 1400-byte 
+    chunks straight away, so only the buffering is measured: short lines 
+    (one by one, LF-terminated in 16000-byte chunks, and in batches), 
+    HTTP-style header blocks, a single 
+    multi-megabyte line, multi-megabyte bodies, and small writes"""
+    metrics = {}
+    line = "x" * 30 + "\r\n"
+    count = scaled(200000)
+    bt = BufferedTransport(MemoryTransport(reactor, line * count))
+    t0 = time.time()
+    for _ in xrange(count):
+        data = yield bt.read_line()
+        if data != line:
+            raise AssertionError("got %r" % (data[:100],))
+    metrics["lines_per_sec"] = count / (time.time() - t0)
+
+    # the usual socket reads are bigger, and most line protocols end lines
+    # with LF alone
+    lf_line = line[:-2] + "\n"
+    bt = BufferedTransport(MemoryTransport(reactor, lf_line * count, 16000))
+    t0 = time.time()
+    for _ in xrange(count):
+        data = yield bt.read_line()
+        if data != lf_line:
+            raise AssertionError("got %r" % (data[:100],))
+    metrics["lf_lines_per_sec"] = count / (time.time() - t0)
+
+    bt = BufferedTransport(MemoryTransport(reactor, line * count))
+    t0 = time.time()
+    remaining = count
+    while remaining > 0:
+        lines = yield bt.read_lines()
+        if lines[0] != line or lines[-1] != line:
+            raise AssertionError("got %r" % (lines[:2],))
+        remaining -= len(lines)
+    metrics["batched_lines_per_sec"] = count / (time.time() - t0)
+
+    bt = BufferedTransport(MemoryTransport(reactor, "a: b\n" * 10 + "\r\n\r\n" * count))
+    t0 = time.time()
+    for _ in xrange(count):
+        yield bt.read_until(("\r\n\r\n", "\n\n"))
+    metrics["headers_per_sec"] = count / (time.time() - t0)
+
+    size = scaled(4 * 1024 * 1024)
+    bt = BufferedTransport(MemoryTransport(reactor, "x" * size + "\n"))
+    t0 = time.time()
+    data = yield bt.read_line()
+    if len(data) != size + 1:
+        raise AssertionError("got %r bytes" % (len(data),))
+    metrics["long_line_bytes_per_sec"] = size / (time.time() - t0)
+
+    bt = BufferedTransport(MemoryTransport(reactor, "x" * (4 * size)))
+    t0 = time.time()
+    for _ in range(4):
+        data = yield bt.read_exactly(size)
+        if len(data) != size:
+            raise AssertionError("got %r bytes" % (len(data),))
+    metrics["body_bytes_per_sec"] = 4 * size / (time.time() - t0)
+
+    trns = MemoryTransport(reactor)
+    bt = BufferedTransport(trns, write_buffer_size = 65536)
+    piece = "y" * 10
+    count = size // len(piece)
+    t0 = time.time()
+    for _ in xrange(count):
+        yield bt.write(piece)
+    yield bt.flush()
+    if trns.written != count * len(piece):
+        raise AssertionError("wrote %r bytes" % (trns.written,))
+    metrics["small_write_bytes_per_sec"] = count * len(piece) / (time.time() - t0)
+    rreturn(metrics)
+
+@reactive
+def bench_completed_yield(reactor):
+    """yields per second of deferreds that are already set"""
+    count = scaled(200000)
+    t0 = time.time()
+    for i in xrange(count):
+        res = yield ReactorDeferred(reactor, i)
+        if res != i:
+            raise AssertionError("got %r" % (res,))
+    t1 = time.time()
+    rreturn({"yields_per_sec" : count / (t1 - t0)})
+
+BENCHMARKS = [
+    ("echo_latency", bench_echo_latency),
+    ("echo_throughput", bench_echo_throughput),
+    ("large_write", bench_large_write),
+    ("small_writes", bench_small_writes),
+    ("read_modes", bench_read_modes),
+    ("read_line", bench_read_line),
+    ("buffering", bench_buffering),
+    ("idle_connections", bench_idle_connections),
+    ("timer_churn", bench_timer_churn),
+    ("call_throughput", bench_call_throughput),
+    ("completed_yield", bench_completed_yield),
+    ("threadpool", bench_threadpool),
+]
+
+#===============================================================================
+# Runner
+#===============================================================================
+@reactive
+def run_case(reactor, bench, result):
+    try:
+        result["metrics"] = yield bench(reactor)
+    except Exception as ex:
+        ex._handled = True
+        result["status"] = "error"
+        result["error"] = "%s: %s" % (type(ex).__name__, ex)
+    else:
+        result["status"] = "ok"
+    reactor.stop()
+
+def timed_out(reactor, result):
+    if "status" not in result:
+        result["status"] = "timeout"
+        result["error"] = "did not complete within %s seconds" % (CASE_TIMEOUT,)
+    reactor.stop()
+
+def run_one(factory, name, bench):
+    result = {"reactor" : factory.__name__, "benchmark" : name}
+    t0 = time.time()
+    try:
+        reactor = factory()
+        reactor.call_later(CASE_TIMEOUT, timed_out, reactor, result)
+        reactor.run(lambda reactor: run_case(reactor, bench, result))
+    except Exception as ex:
+        # the reactor itself blew up
+        result["status"] = "error"
+        result["error"] = "%s: %s" % (type(ex).__name__, ex)
+    result.setdefault("status", "error")
+    result["elapsed"] = time.time() - t0
+    return result
+
+def main():
+    global SCALE
+    parser = optparse.OptionParser(usage = "%prog [options]")
+    parser.add_option("-r", "--reactors", default = None,
+        help = "comma-separated reactor classes (default: all supported)")
+    parser.add_option("-b", "--benchmarks", default = None,
+        help = "comma-separated benchmarks (default: all)")
+    parser.add_option("-s", "--scale", type = "float", default = 1.0,
+        help = "scales the size of every benchmark")
+    parser.add_option("-o", "--output", default = None,
+        help = "write the JSON results to this file instead of stdout")
+    options, _ = parser.parse_args()
+    SCALE = options.scale
+
+    factories = [cls for cls in REACTORS if cls.supported()]
+    if options.reactors:
+        names = options.reactors.split(",")
+        factories = [cls for cls in factories if cls.__name__ in names]
+    benchmarks = BENCHMARKS
+    if options.benchmarks:
+        names = options.benchmarks.split(",")
+        benchmarks = [(n, b) for n, b in BENCHMARKS if n in names]
+
+    results = []
+    for factory in factories:
+        for name, bench in benchmarks:
+            res = run_one(factory, name, bench)
+            results.append(res)
+            if res["status"] == "ok":
+                summary = ", ".join(("%s=%.1f" if isinstance(v, float) else "%s=%s")
+                    % (k, v) for k, v in sorted(res["metrics"].items()))
+            else:
+                summary = res["error"]
+            print >>sys.stderr, "%-14s %-18s %-7s %s" % (factory.__name__, name,
+                res["status"], summary)
+
+    doc = {
+        "python" : sys.version.split()[0],
+        "platform" : platform.platform(),
+        "scale" : SCALE,
+        "results" : results,
+    }
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(doc, f, indent = 2, sort_keys = True)
+    else:
+        json.dump(doc, sys.stdout, indent = 2, sort_keys = True)
+        print
+    failed = [res for res in results if res["status"] != "ok"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
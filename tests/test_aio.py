@@ -0,0 +1,89 @@
+import microactor
+from microactor.reactors import AsyncioReactor
+from microactor.utils.aio import asyncio, to_future, to_deferred
+
+
+PAYLOAD = "x" * (1024 * 1024)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    reactor.call(do_server, listener)
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    received = 0
+    while True:
+        data = yield conn.read(100000)
+        if not data:
+            break
+        received += len(data)
+    conn.close()
+    listener.close()
+    if received == len(PAYLOAD):
+        print "OK: got", received, "bytes"
+    else:
+        print "ERROR: got", received, "bytes out of", len(PAYLOAD)
+
+    t0 = reactor.clock()
+    yield reactor.jobs.sleep(0.1)
+    t1 = reactor.clock()
+    if 0.09 <= t1 - t0 < 0.5:
+        print "OK: slept", t1 - t0
+    else:
+        print "ERROR: slept", t1 - t0
+
+    res = yield reactor.threadpool.call(abs, -7)
+    print "OK" if res == 7 else "ERROR", "threadpool result", res
+
+    # asyncio -> deferred
+    fut = asyncio.Future(loop = reactor.loop)
+    reactor.loop.call_later(0.05, fut.set_result, 17)
+    res = yield to_deferred(fut)
+    print "OK" if res == 17 else "ERROR", "future result", res
+
+    fut = asyncio.Future(loop = reactor.loop)
+    reactor.loop.call_soon(fut.set_exception, ValueError("boom"))
+    try:
+        yield to_deferred(fut)
+    except ValueError as ex:
+        ex._handled = True
+        print "OK: future raised", ex
+    else:
+        print "ERROR: future didn't raise"
+
+    # deferred -> asyncio
+    fut = to_future(reactor.jobs.schedule(0.05, lambda: 42), reactor.loop)
+    done = microactor.utils.Deferred()
+    fut.add_done_callback(lambda fut: done.set(fut.result()))
+    res = yield done
+    print "OK" if res == 42 else "ERROR", "deferred result", res
+
+    # stats are recorded per batch of the reactor's callbacks; the loop is
+    # woken up by call_soon_threadsafe, not by a waker fd
+    calls = []
+    reactor.stats.add_hook("before_poll", lambda timeout: calls.append("before"))
+    reactor.stats.enable()
+    for i in range(3):
+        yield reactor.jobs.sleep(0.01)
+    stats = reactor.stats
+    print "OK" if stats.iterations >= 3 and stats.callbacks.total >= 3 else "ERROR", \
+        "stats", stats.iterations, "iterations"
+    print "OK" if len(calls) >= 3 else "ERROR", "before_poll hooks", len(calls)
+    print "OK" if not hasattr(reactor, "_waker") else "ERROR", "no waker"
+
+    reactor.stop()
+
+@microactor.reactive
+def do_server(listener):
+    conn = yield listener.accept()
+    yield conn.write(PAYLOAD)
+    conn.close()
+
+
+if __name__ == "__main__":
+    if not AsyncioReactor.supported():
+        print "asyncio not available; skipping"
+    else:
+        reactor = AsyncioReactor(asyncio.new_event_loop())
+        reactor.run(main)
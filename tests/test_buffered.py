@@ -0,0 +1,104 @@
+import sys
+import microactor
+from microactor.utils import BufferedTransport
+
+
+def check(what, got, expected):
+    if got == expected:
+        print "OK:", what
+    else:
+        print "ERROR:", what, "got", repr(got)[:80], "expected", repr(expected)[:80]
+
+@microactor.reactive
+def send_pieces(reactor, trns, pieces):
+    # one piece at a time, so they arrive as separate reads
+    for piece in pieces:
+        yield trns.write(piece)
+        yield reactor.jobs.sleep(0.01)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(20, reactor.stop)
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+    bt = BufferedTransport(conn, read_buffer_size = 100)
+
+    # lines and patterns straddling reads
+    send_pieces(reactor, peer, ["hel", "lo\r", "\nwor", "ld\n", "a|", "|b||", "c"])
+    check("line over three reads", (yield bt.read_line()), "hello\r\n")
+    check("line without newline", (yield bt.read_line(False)), "world")
+    check("straddling pattern", (yield bt.read_until("||")), "a||")
+    check("pattern left out", (yield bt.read_until("||", include_pattern = False)), "b")
+    check("read", (yield bt.read(1)), "c")
+
+    # the earliest delimiter wins, whatever order they're given in
+    yield peer.write("a\nb\r\nc\n\nd")
+    check("earliest delimiter", (yield bt.read_until(("\r\n", "\n"))), "a\n")
+    check("longest delimiter", (yield bt.read_until(["\n", "\r\n"])), "b\r\n")
+    check("delimiters left out", (yield bt.read_until(("\r\n\r\n", "\n\n"), 
+        include_pattern = False)), "c")
+    check("read", (yield bt.read(1)), "d")
+
+    # a delimiter that may be the beginning of a longer one, or that may
+    # come after the beginning of one, waits for more data
+    send_pieces(reactor, peer, ["xb\r", "\nyy"])
+    check("longest delimiter over two reads", (yield bt.read_until(("b\r\n", "b"))), "xb\r\n")
+    check("read", (yield bt.read_exactly(2)), "yy")
+    send_pieces(reactor, peer, ["zab", "cdc"])
+    check("earliest delimiter over two reads", (yield bt.read_until(("c", "abcd"))), "zabcd")
+    check("read", (yield bt.read_exactly(1)), "c")
+
+    # a line much longer than the read buffer
+    long_line = "".join(chr(65 + i % 26) for i in xrange(100000)) + "\n"
+    peer.write(long_line)
+    check("long line", (yield bt.read_line()), long_line)
+
+    # bodies, read in pieces and whole
+    body = "".join(chr(i % 251) for i in xrange(300000))
+    peer.write(body * 2)
+    check("small reads", (yield bt.read(10)) + (yield bt.read(20)), body[:30])
+    check("read_exactly", (yield bt.read_exactly(len(body) - 30)), body[30:])
+    check("big read_exactly", (yield bt.read_exactly(len(body))), body)
+
+    # small writes (of any buffer type) are buffered until flushed, big ones
+    # go straight through
+    writer = BufferedTransport(peer, write_buffer_size = 1000)
+    yield writer.write("abc")
+    yield writer.write(bytearray("def"))
+    yield writer.write(memoryview("ghi"))
+    yield writer.flush()
+    check("flushed", (yield bt.read_exactly(9)), "abcdefghi")
+    yield writer.write("x" * 10)
+    yield writer.write(bytearray("y" * 2000))
+    check("big write", (yield bt.read_exactly(2010)), "x" * 10 + "y" * 2000)
+
+    # batches of lines; a trailing "\r" waits for what follows it
+    yield peer.write("1\n2\r\n3\r")
+    yield reactor.jobs.sleep(0.05)
+    check("read_lines", (yield bt.read_lines()), ["1\n", "2\r\n"])
+    yield peer.write("\n4\n5\n6\n")
+    yield reactor.jobs.sleep(0.05)
+    check("max_lines", (yield bt.read_lines(2, include_newline = False)), ["3", "4"])
+    check("rest of the batch", (yield bt.read_lines()), ["5\n", "6\n"])
+
+    # EOF
+    yield writer.write("7\r")
+    yield writer.flush()
+    peer.close()
+    check("lines before EOF", (yield bt.read_lines()), ["7\r"])
+    check("read_lines at EOF", (yield bt.read_lines()), [])
+    check("read at EOF", (yield bt.read(10)), "")
+    conn.close()
+    listener.close()
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
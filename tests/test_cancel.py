@@ -0,0 +1,128 @@
+import microactor
+from microactor.utils import Cancelled, Deferred, ReactorDeferred
+
+
+def check(what, got, expected):
+    if got == expected:
+        print "OK:", what, got
+    else:
+        print "ERROR:", what, "got", got, "expected", expected
+
+@microactor.reactive
+def waiter(dfr, log):
+    try:
+        yield dfr
+    except Cancelled:
+        log.append("cancelled")
+        raise
+    finally:
+        log.append("finally")
+
+@microactor.reactive
+def outer(dfr, log):
+    yield waiter(dfr, log)
+    log.append("ERROR: outer resumed")
+
+@microactor.reactive
+def sleep_when_cancelled(reactor, dfr, log):
+    try:
+        yield dfr
+    except Cancelled:
+        t0 = reactor.clock()
+        res = yield reactor.jobs.sleep(0.1)
+        log.append((res, reactor.clock() - t0 >= 0.09))
+
+@microactor.reactive
+def reader(conn):
+    data = yield conn.read(100)
+    microactor.utils.rreturn(data)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+    initial = reactor._get_num_of_transports()
+
+    # nested reactive calls
+    log = []
+    inner = Deferred()
+    res = outer(inner, log)
+    res.cancel()
+    check("generator", log, ["cancelled", "finally"])
+    check("innermost deferred canceled", inner.canceled, True)
+
+    # jobs
+    sleeper = reactor.jobs.sleep(1)
+    res = outer(sleeper, [])
+    res.cancel()
+    check("sleep timer released", (sleeper.canceled, sleeper.timer), (True, None))
+
+    # canceled after what it waits on was set, but before it was resumed:
+    # the stale resumption must not reach the cleanup code
+    log = []
+    dfr = ReactorDeferred(reactor)
+    res = sleep_when_cancelled(reactor, dfr, log)
+    yield reactor.jobs.sleep(0.01)
+    dfr.set("data")
+    res.cancel()
+    yield reactor.jobs.sleep(0.2)
+    check("cleanup after late cancel", log, [(None, True)])
+
+    # transports
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    server = yield accepted
+    base = reactor._get_num_of_transports()
+    pending = reader(conn)
+    yield reactor.jobs.sleep(0.05)
+    pending.cancel()
+    yield reactor.jobs.sleep(0.05)
+    check("read dropped", conn._read_req, None)
+    if not hasattr(conn, "_read_op"):
+        # (io_uring leaves the recv in flight, holding on to what it gets)
+        check("read unregistered", reactor._get_num_of_transports(), base)
+    yield server.write("hello")
+    data = yield conn.read(100)
+    check("next read", data, "hello")
+
+    # with_timeout frees the read it gave up on
+    t0 = reactor.clock()
+    try:
+        yield reactor.jobs.with_timeout(reader(conn), 0.05)
+    except microactor.subsystems.jobs.Timeout as ex:
+        print "OK: timed out after", reactor.clock() - t0
+    else:
+        print "ERROR: didn't time out"
+    yield server.write("world")
+    data = yield conn.read(100)
+    check("read after timeout", data, "world")
+
+    # gather cancels everything it gathers
+    sleepers = [reactor.jobs.sleep(1), reactor.jobs.sleep(2)]
+    reactor.jobs.gather(sleepers).cancel()
+    check("gathered timers released", [s.timer for s in sleepers], [None, None])
+
+    # accepts
+    pending = listener.accept()
+    pending.cancel()
+    accepted = listener.accept()
+    conn2 = yield reactor.net.connect_tcp("127.0.0.1", port)
+    server2 = yield accepted
+    check("accept after cancel", server2 is not None, True)
+
+    for trns in (conn, conn2, server, server2, listener):
+        trns.close()
+    yield reactor.jobs.sleep(0.05)
+    check("transports left", reactor._get_num_of_transports(), initial)
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    import sys
+    import microactor.subsystems.jobs
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
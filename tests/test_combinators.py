@@ -0,0 +1,121 @@
+import microactor
+from microactor.utils import Cancelled
+from microactor.subsystems.jobs import Timeout
+
+
+def check(what, got, expected):
+    if got == expected:
+        print "OK:", what, got
+    else:
+        print "ERROR:", what, "got", got, "expected", expected
+
+@microactor.reactive
+def fail_after(reactor, interval, exc):
+    yield reactor.jobs.sleep(interval)
+    exc._handled = True
+    raise exc
+
+def with_deadline(reactor, dfr):
+    return reactor.jobs.with_timeout(dfr, 1)
+
+@microactor.reactive
+def main(reactor):
+    jobs = reactor.jobs
+    t0 = reactor.clock()
+    res = yield jobs.gather([jobs.schedule(0.2, lambda: "slow"),
+        jobs.schedule(0.1, lambda: "fast"), jobs.schedule(0, lambda: "now")])
+    check("gather", res, ["slow", "fast", "now"])
+    elapsed = reactor.clock() - t0
+    if elapsed < 0.35:
+        print "OK: gather took", elapsed
+    else:
+        print "ERROR: gather took", elapsed
+    check("gather of nothing", (yield jobs.gather([])), [])
+
+    try:
+        yield jobs.gather([jobs.sleep(1), fail_after(reactor, 0.05, ValueError("boom"))])
+    except ValueError as ex:
+        ex._handled = True
+        print "OK: gather failed with", ex
+    else:
+        print "ERROR: gather didn't fail"
+
+    res = yield jobs.gather_settled([jobs.schedule(0.01, lambda: 1),
+        fail_after(reactor, 0.02, KeyError("x"))])
+    check("gather_settled", [(is_exc, type(v).__name__) for is_exc, v in res],
+        [(False, "int"), (True, "KeyError")])
+
+    loser = jobs.schedule(0.5, lambda: "loser")
+    res = yield jobs.race([loser, jobs.schedule(0.05, lambda: "winner")])
+    check("race", res, "winner")
+    check("race loser canceled", loser.canceled, True)
+
+    dfrs = [jobs.schedule(0.1, lambda: "b"), jobs.schedule(0.05, lambda: "a")]
+    check("first_completed", (yield jobs.first_completed(dfrs)), 1)
+
+    order = []
+    for dfr in jobs.as_completed([jobs.schedule(0.1, lambda: 3),
+            jobs.schedule(0.05, lambda: 2), jobs.schedule(0, lambda: 1)]):
+        order.append((yield dfr))
+    check("as_completed", order, [1, 2, 3])
+
+    check("with_timeout in time", (yield jobs.with_timeout(
+        jobs.schedule(0.01, lambda: "done"), 1)), "done")
+    slow = jobs.sleep(1)
+    t0 = reactor.clock()
+    try:
+        yield jobs.with_timeout(slow, 0.05)
+    except Timeout as ex:
+        print "OK: timed out after", reactor.clock() - t0, "-", ex
+    else:
+        print "ERROR: didn't time out"
+    check("timed out deferred canceled", slow.canceled, True)
+
+    # deferreds that are already canceled count as failed, rather than 
+    # leaving the combination hanging
+    def canceled():
+        dfr = jobs.sleep(1)
+        dfr.cancel()
+        return dfr
+    for name in ["gather", "race"]:
+        try:
+            yield with_deadline(reactor, getattr(jobs, name)([canceled(), 
+                jobs.schedule(0.01, lambda: 1)]))
+        except Cancelled:
+            print "OK: %s of a canceled deferred failed" % (name,)
+        except Timeout:
+            print "ERROR: %s of a canceled deferred hung" % (name,)
+        else:
+            print "ERROR: %s of a canceled deferred didn't fail" % (name,)
+    res = yield with_deadline(reactor, jobs.gather_settled([canceled(), 
+        jobs.schedule(0.01, lambda: 1)]))
+    check("gather_settled of a canceled deferred", 
+        [(is_exc, type(v).__name__) for is_exc, v in res], [(True, "Cancelled"), (False, "int")])
+    outputs = jobs.as_completed([jobs.schedule(0.01, lambda: 1), canceled()])
+    try:
+        yield with_deadline(reactor, outputs[0])
+    except Cancelled:
+        print "OK: as_completed of a canceled deferred failed"
+    except Timeout:
+        print "ERROR: as_completed of a canceled deferred hung"
+    else:
+        print "ERROR: as_completed of a canceled deferred didn't fail"
+    check("as_completed after a canceled deferred", (yield with_deadline(reactor, outputs[1])), 1)
+
+    # outcomes skip the outputs that have been canceled
+    outputs = jobs.as_completed([jobs.schedule(0.01, lambda: 1), 
+        jobs.schedule(0.05, lambda: 2), jobs.schedule(0.1, lambda: 3)])
+    outputs[0].cancel()
+    order = []
+    for dfr in outputs[1:]:
+        try:
+            order.append((yield with_deadline(reactor, dfr)))
+        except Timeout:
+            order.append("hung")
+    check("as_completed skips canceled outputs", order, [1, 2])
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    reactor = microactor.get_reactor()
+    reactor.run(main)
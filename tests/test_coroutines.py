@@ -0,0 +1,168 @@
+from __future__ import print_function
+import sys
+import functools
+import microactor
+from microactor.utils.deferred import Cancelled
+
+
+def check(what, ok, got):
+    if ok:
+        print("OK:", what)
+    else:
+        print("ERROR:", what, "got", repr(got)[:200])
+
+ASYNC_SOURCE = '''
+async def double(dfr):
+    val = await dfr
+    return val * 2
+
+async def catch(dfr):
+    try:
+        await dfr
+    except ValueError as ex:
+        return "caught %s" % (ex,)
+
+async def propagate(dfr):
+    await dfr
+    return "unreached"
+
+async def hold(dfr, log):
+    try:
+        await dfr
+    finally:
+        log.append("finally")
+'''
+
+class Coroutine(object):
+    """stands in for a native coroutine where ``async def`` is a syntax
+    error: the generator yields ``dfr`` where a coroutine would ``await dfr``,
+    and the rest goes through ``dfr.__await__()``, as ``yield from`` would"""
+    def __init__(self, gen):
+        self.gen = gen
+        self.awaiter = None
+    def send(self, val):
+        return self._resume(False, val)
+    def throw(self, exc):
+        return self._resume(True, exc)
+    def _resume(self, is_exc, val):
+        while True:
+            if self.awaiter is not None:
+                try:
+                    if is_exc:
+                        return self.awaiter.throw(val)
+                    else:
+                        return self.awaiter.send(val)
+                except StopIteration as ex:
+                    is_exc, val = False, (ex.args[0] if ex.args else None)
+                except Exception as ex:
+                    is_exc, val = True, ex
+                self.awaiter = None
+            if is_exc:
+                dfr = self.gen.throw(val)
+            else:
+                dfr = self.gen.send(val)
+            self.awaiter = dfr.__await__()
+            is_exc, val = False, None
+
+def coroutine(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return Coroutine(func(*args, **kwargs))
+    return wrapper
+
+if sys.version_info >= (3, 5):
+    exec(ASYNC_SOURCE)
+else:
+    @coroutine
+    def double(dfr):
+        val = yield dfr
+        microactor.rreturn(val * 2)
+
+    @coroutine
+    def catch(dfr):
+        try:
+            yield dfr
+        except ValueError as ex:
+            microactor.rreturn("caught %s" % (ex,))
+
+    @coroutine
+    def propagate(dfr):
+        yield dfr
+        microactor.rreturn("unreached")
+
+    @coroutine
+    def hold(dfr, log):
+        try:
+            yield dfr
+        finally:
+            log.append("finally")
+
+double = microactor.reactive(double)
+catch = microactor.reactive(catch)
+propagate = microactor.reactive(propagate)
+hold = microactor.reactive(hold)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+
+    # awaiting a pending deferred suspends the coroutine until it's set
+    dfr = microactor.Deferred()
+    res = double(dfr)
+    check("pending await suspends", not res.is_set(), res.value)
+    reactor.jobs.schedule(0.01, dfr.set, 21)
+    val = yield res
+    check("pending await", val == 42, val)
+
+    # awaiting a completed one returns in place
+    dfr = microactor.Deferred()
+    dfr.set(5)
+    res = double(dfr)
+    check("completed await", res.value == (False, 10), res.value)
+
+    # an exception the awaited deferred is set with is raised at the await
+    dfr = microactor.Deferred()
+    res = catch(dfr)
+    reactor.jobs.schedule(0.01, dfr.throw, ValueError("boom"))
+    val = yield res
+    check("exception caught in the coroutine", val == "caught boom", val)
+
+    dfr = microactor.Deferred()
+    dfr.throw(ValueError("boom"))
+    res = catch(dfr)
+    check("completed exception caught", res.value == (False, "caught boom"),
+        res.value)
+
+    # and propagates to whoever awaits the coroutine
+    dfr = microactor.Deferred()
+    res = propagate(dfr)
+    exc = ValueError("boom")
+    exc._handled = True
+    reactor.jobs.schedule(0.01, dfr.throw, exc)
+    try:
+        val = yield res
+    except ValueError as ex:
+        val = ex
+    check("exception propagates", val is exc, val)
+
+    # canceling the coroutine's result cancels what it's awaiting, and
+    # throws Cancelled in at the await
+    dfr = microactor.Deferred()
+    log = []
+    res = hold(dfr, log)
+    res.cancel()
+    check("cancel reaches the awaited deferred", dfr.canceled, dfr)
+    check("cancel unwinds the coroutine", log == ["finally"], log)
+    check("canceled result isn't set", not res.is_set(), res.value)
+    dfr.set(1)
+    check("setting after cancel is ignored", log == ["finally"], log)
+
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
@@ -0,0 +1,88 @@
+import sys
+import time
+import microactor
+from microactor.utils import ReactorDeferred
+
+
+def slow_timer():
+    time.sleep(0.1)
+
+@microactor.reactive
+def slow_reactive(dfr):
+    yield dfr
+    time.sleep(0.1)
+
+def stall():
+    time.sleep(0.3)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+    reports = []
+    reactor.debug.enable(0.05, reporter = reports.append)
+
+    # a slow timer is reported by what it fired
+    reactor.jobs.schedule(0, slow_timer)
+    yield reactor.jobs.sleep(0.05)
+    names = [rep.name for rep in reports]
+    if len(reports) == 1 and names[0].endswith(".slow_timer") and reports[0].duration >= 0.1:
+        print "OK: slow timer reported as", names[0]
+    else:
+        print "ERROR: slow timer reported as", names
+
+    # and a slow reactive function by its generator, along with the call 
+    # chain that led to it
+    del reports[:]
+    dfr = ReactorDeferred(reactor)
+    slow_reactive(dfr)
+    dfr.set()
+    yield reactor.jobs.sleep(0.05)
+    names = [rep.name for rep in reports]
+    if len(reports) == 1 and names[0].endswith(".slow_reactive"):
+        print "OK: slow reactive function reported as", names[0], reports[0].location
+    else:
+        print "ERROR: slow reactive function reported as", names
+    chain = reports[0].chain if reports else ""
+    if "in main" in chain and "slow_reactive(dfr)" in chain and "reactive call chain" in str(reports[0]):
+        print "OK: call chain reported"
+    else:
+        print "ERROR: call chain reported as", repr(chain)
+
+    # nothing is reported once disabled
+    del reports[:]
+    reactor.debug.disable()
+    reactor.jobs.schedule(0, slow_timer)
+    yield reactor.jobs.sleep(0.05)
+    if not reports:
+        print "OK: nothing reported when disabled"
+    else:
+        print "ERROR: reported when disabled", [rep.name for rep in reports]
+    if not microactor.utils.deferred._capture_every:
+        print "OK: stack capture turned off"
+    else:
+        print "ERROR: stack capture left on"
+
+    # the watchdog dumps the stack of a stalled loop, but not of an idle one
+    stalls = []
+    reactor.debug.start_watchdog(0.1, reporter = stalls.append)
+    yield reactor.jobs.sleep(0.3)
+    if not stalls:
+        print "OK: idle loop not reported"
+    else:
+        print "ERROR: idle loop reported", stalls
+    reactor.call(stall)
+    yield reactor.jobs.sleep(0.05)
+    reactor.debug.stop_watchdog()
+    if len(stalls) == 1 and "stalled" in stalls[0] and "in stall" in stalls[0]:
+        print "OK: stall reported"
+    else:
+        print "ERROR: stall reported as", stalls
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
@@ -0,0 +1,40 @@
+import microactor
+from microactor.reactors.posix.polling import EpollReactor
+
+
+PAYLOAD = "x" * (4 * 1024 * 1024)
+
+@microactor.reactive
+def main(reactor):
+    listener = yield reactor.net.listen_tcp(12346)
+    reactor.call(do_server, listener)
+    conn = yield reactor.net.connect_tcp("localhost", 12346)
+    # small reads, so data is left behind after each edge
+    received = 0
+    while True:
+        data = yield conn.read(1000)
+        if not data:
+            break
+        received += len(data)
+    conn.close()
+    print "edge-triggered transports:", len(reactor._edge_transports)
+    if received == len(PAYLOAD):
+        print "OK: got", received, "bytes"
+    else:
+        print "ERROR: got", received, "bytes out of", len(PAYLOAD)
+    reactor.stop()
+
+@microactor.reactive
+def do_server(listener):
+    conn = yield listener.accept()
+    # the send buffer fills up, so writes run into EAGAIN
+    yield conn.write(PAYLOAD)
+    conn.close()
+
+
+if __name__ == "__main__":
+    if not EpollReactor.supported():
+        print "epoll not supported; skipping"
+    else:
+        reactor = EpollReactor(edge_triggered = True)
+        reactor.run(main)
@@ -0,0 +1,99 @@
+import os
+import sys
+import errno
+import resource
+from StringIO import StringIO
+import microactor
+from microactor.utils import Deferred
+
+
+@microactor.reactive
+def inner(dfr):
+    yield dfr
+    raise ValueError("boom")   # raised here
+
+@microactor.reactive
+def middle(dfr):
+    yield inner(dfr)
+
+@microactor.reactive
+def outer(dfr):
+    yield middle(dfr)
+
+@microactor.reactive
+def catching(dfr):
+    try:
+        yield middle(dfr)
+    except ValueError as ex:
+        ex._handled = True
+
+def report_of(func):
+    dfr = Deferred()
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+        func(dfr)
+        dfr.set()
+        return sys.stderr.getvalue()
+    finally:
+        sys.stderr = stderr
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+    report = report_of(outer)
+    if "# raised here" in report and report.count("$$") == 1:
+        print "OK: unhandled error reported once, where it was raised"
+    else:
+        print "ERROR: unhandled error reported as", repr(report)
+    report = report_of(catching)
+    if not report:
+        print "OK: handled error not reported"
+    else:
+        print "ERROR: handled error reported as", repr(report)
+
+    # an accept that fails (running out of fds) fails its deferred, and the
+    # listener can be accepted on again
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    limits = resource.getrlimit(resource.RLIMIT_NOFILE)
+    highest = max(int(fd) for fd in os.listdir("/proc/self/fd"))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (highest + 1, limits[1]))
+    fillers = []
+    try:
+        # use up whatever fds are left below the limit
+        while True:
+            try:
+                fillers.append(os.open(os.devnull, os.O_RDONLY))
+            except OSError:
+                break
+        yield reactor.jobs.with_timeout(listener.accept(), 1)
+    except EnvironmentError as ex:
+        ex._handled = True
+        if ex.errno == errno.EMFILE:
+            print "OK: accept failed with", ex
+        else:
+            print "ERROR: accept failed with", ex
+    except Exception as ex:
+        ex._handled = True
+        print "ERROR: accept failed with", repr(ex)
+    else:
+        print "ERROR: accepted past the fd limit"
+    finally:
+        for fd in fillers:
+            os.close(fd)
+        resource.setrlimit(resource.RLIMIT_NOFILE, limits)
+    peer = yield reactor.jobs.with_timeout(listener.accept(), 1)
+    print "OK: accepted after the error"
+    for trns in (peer, conn, listener):
+        trns.close()
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
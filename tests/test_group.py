@@ -0,0 +1,117 @@
+import os
+import sys
+import threading
+import microactor
+from microactor.subsystems.net import BaseHandler
+from microactor.reactors import ReactorError, ReactorGroup
+from microactor.reactors import group as group_module
+from microactor.utils import MissingModule
+from microactor.reactors.windows.subsystems import IocpNetSubsystem
+
+
+class EchoHandler(BaseHandler):
+    @microactor.reactive
+    def start(self):
+        print "accepted in", threading.current_thread().name
+        data = yield self.transport.read(100)
+        yield self.transport.write(data)
+        self.transport.close()
+
+class WhereHandler(BaseHandler):
+    @microactor.reactive
+    def start(self):
+        yield self.transport.write("%d %s" % (os.getpid(), threading.current_thread().name))
+        self.transport.close()
+
+@microactor.reactive
+def ask_all(reactor, port, count):
+    # connects ``count`` clients at once, and returns where each was served
+    conns = []
+    for i in range(count):
+        conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+        conns.append(conn)
+    answers = []
+    for conn in conns:
+        answers.append((yield conn.read(100)))
+        conn.close()
+    microactor.rreturn(answers)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(20, reactor.stop)
+    server = yield reactor.net.serve(EchoHandler, 12346, reactors = 3)
+    for i in range(10):
+        conn = yield reactor.net.connect_tcp("localhost", 12346)
+        yield conn.write("hello %d" % (i,))
+        data = yield conn.read(100)
+        print "client got", repr(data)
+        conn.close()
+    yield server.close()
+
+    # members in forked processes, each with a listening socket of its own
+    server = yield reactor.net.serve(WhereHandler, 12347, reactors = 3,
+        use_processes = True)
+    answers = yield ask_all(reactor, 12347, 30)
+    pids = set(ans.split()[0] for ans in answers)
+    if len(answers) == 30 and all(answers) and len(pids) > 1:
+        print "OK: served by %d processes" % (len(pids),)
+    else:
+        print "ERROR: process mode answered", answers
+    group = server.group
+    yield server.close()
+    if not group._pids:
+        print "OK: processes reaped"
+    else:
+        print "ERROR: processes left", group._pids
+
+    # members sharing a single listening socket
+    server = yield reactor.net.serve(WhereHandler, 12348, reactors = 3,
+        reuse_port = False)
+    answers = yield ask_all(reactor, 12348, 30)
+    if len(answers) == 30 and all(answers):
+        print "OK: shared socket served by", sorted(set(ans.split()[1] for ans in answers))
+    else:
+        print "ERROR: shared socket answered", answers
+    listeners = [srv.listener for _, srv in server.servers]
+    if len(listeners) == 3 and all(trns.exclusive for trns in listeners):
+        print "OK: shared listeners are exclusive"
+    else:
+        print "ERROR: shared listeners", [(trns, trns.exclusive) for trns in listeners]
+    if getattr(reactor, "EXCLUSIVE_MASK", 0):
+        masks = [member._registered.get(trns.fileno(), 0)
+            for member, trns in zip([m for m, _ in server.servers], listeners)]
+        if all(mask & reactor.EXCLUSIVE_MASK for mask in masks):
+            print "OK: registered with EPOLLEXCLUSIVE"
+        else:
+            print "ERROR: registered with", masks
+    yield server.close()
+
+    # reactors with no sharded implementation refuse it up front
+    net = IocpNetSubsystem(reactor)
+    try:
+        yield net.serve(EchoHandler, 12349, reactors = 3)
+    except ReactorError as ex:
+        print "OK: not supported:", ex
+    else:
+        print "ERROR: served over multiple IOCP reactors"
+
+    # and so are groups pinned to CPUs where affinity can't be set
+    affinity = group_module.affinity
+    group_module.affinity = MissingModule("microactor.arch.posix.affinity", "not here")
+    try:
+        ReactorGroup(2, pin_cpus = True)
+    except ReactorError as ex:
+        print "OK: not supported:", ex
+    else:
+        print "ERROR: pinned without affinity"
+    finally:
+        group_module.affinity = affinity
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
@@ -0,0 +1,65 @@
+import sys
+import microactor
+
+
+BACKLOG = 50000
+
+def check(what, ok, got):
+    if ok:
+        print "OK:", what
+    else:
+        print "ERROR:", what, "got", repr(got)[:200]
+
+@microactor.reactive
+def read_one(trns, ran, got):
+    data = yield trns.read(100)
+    got.append((data, ran[0]))
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(20, reactor.stop)
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+
+    # a read that completes while the default lane is saturated resumes its
+    # reader from the I/O lane, ahead of the backlog
+    ran = [0]
+    def work():
+        ran[0] += 1
+    got = []
+    read_one(conn, ran, got)
+    for i in xrange(BACKLOG):
+        reactor.call(work)
+    peer.write("hello")
+    while ran[0] < BACKLOG:
+        yield reactor.jobs.sleep(0.01)
+    check("read ahead of the backlog", got and got[0][0] == "hello" and
+        got[0][1] < BACKLOG // 2, got)
+
+    # so do writes
+    order = []
+    def wrote(is_exc, val):
+        order.append("write")
+    for i in xrange(BACKLOG):
+        reactor.call(work)
+    reactor.call(order.append, "call")
+    peer.write("x" * 10).register(wrote)
+    while len(order) < 2:
+        yield reactor.jobs.sleep(0.01)
+    check("write ahead of the backlog", order == ["write", "call"], order)
+
+    conn.close()
+    peer.close()
+    listener.close()
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
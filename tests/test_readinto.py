@@ -0,0 +1,91 @@
+import sys
+import microactor
+
+
+PAYLOAD = "".join(chr(i % 251) for i in xrange(1024 * 1024 + 7))
+
+def check(what, got, expected):
+    if got == expected:
+        print "OK:", what
+    else:
+        print "ERROR:", what, "got", repr(got)[:80], "expected", repr(expected)[:80]
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(20, reactor.stop)
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+
+    # a view read before any other read (which allocates the buffer)
+    yield peer.write("first")
+    data = yield conn.read_view(100)
+    check("first read_view", data.tobytes(), "first")
+
+    # into a caller-supplied buffer
+    buf = bytearray(len(PAYLOAD))
+    view = memoryview(buf)
+    peer.write(PAYLOAD)
+    pos = 0
+    while pos < len(buf):
+        count = yield conn.readinto(view[pos:])
+        if not count:
+            break
+        pos += count
+    check("readinto", str(buf), PAYLOAD)
+
+    # views into the transport's own buffer
+    peer.write(PAYLOAD)
+    chunks = []
+    received = 0
+    while received < len(PAYLOAD):
+        data = yield conn.read_view(10000)
+        if not data:
+            break
+        if not isinstance(data, memoryview) or len(data) > 10000:
+            print "ERROR: read_view returned", type(data), len(data)
+        chunks.append(data.tobytes())
+        received += len(data)
+    check("read_view", "".join(chunks), PAYLOAD)
+
+    # what a view read leaves behind is served to the next read, whatever
+    # kind it is
+    yield peer.write("hello world")
+    yield reactor.jobs.sleep(0.05)
+    data = yield conn.read_view(2)
+    check("short read_view", data.tobytes(), "he")
+    data = yield conn.read(3)
+    check("read after read_view", data, "llo")
+    small = bytearray(4)
+    count = yield conn.readinto(small)
+    check("readinto after read_view", str(small[:count]), " wor")
+    data = yield conn.read_view(100)
+    check("rest", data.tobytes(), "ld")
+
+    # EOF
+    peer.close()
+    check("readinto at EOF", (yield conn.readinto(small)), 0)
+    check("read_view at EOF", (yield conn.read_view(10)), None)
+    check("read at EOF", (yield conn.read(10)), None)
+    conn.close()
+    listener.close()
+
+    # pipes (file objects)
+    reader, writer = yield reactor.io.pipe()
+    yield writer.write("pipe data")
+    buf = bytearray(20)
+    count = yield reader.readinto(buf)
+    check("pipe readinto", str(buf[:count]), "pipe data")
+    reader.close()
+    writer.close()
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
@@ -0,0 +1,120 @@
+import sys
+import microactor
+
+
+def check(what, ok, got):
+    if ok:
+        print "OK:", what
+    else:
+        print "ERROR:", what, "got", repr(got)[:200]
+
+def noop():
+    pass
+
+@microactor.reactive
+def settle(reactor):
+    # lets a few full iterations go by
+    for i in range(3):
+        yield reactor.jobs.sleep(0.01)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+    stats = reactor.stats
+
+    # hooks are called around every poll, even with stats disabled
+    calls = []
+    before = lambda timeout: calls.append(("before", timeout))
+    after = lambda count: calls.append(("after", count))
+    stats.add_hook("before_poll", before)
+    stats.add_hook("after_poll", after)
+    yield settle(reactor)
+    stats.remove_hook("before_poll", before)
+    stats.remove_hook("after_poll", after)
+    points = [point for point, _ in calls]
+    check("hooks alternate", len(calls) >= 6 and
+        points == ["before", "after"] * (len(calls) // 2) + ["before"] * (len(calls) % 2),
+        points)
+    check("hook arguments", all(arg >= 0 for _, arg in calls) and
+        any(arg > 0 for point, arg in calls if point == "before"), calls)
+    check("nothing recorded while disabled", stats.iterations == 0, stats.iterations)
+    count = len(calls)
+    yield settle(reactor)
+    check("hooks removed", len(calls) == count, calls[count:])
+
+    # counters
+    stats.enable()
+    for i in range(20):
+        reactor.call(noop)
+    reactor.jobs.schedule(0.01, noop)
+    yield settle(reactor)
+    check("iterations counted", stats.iterations >= 4 and
+        stats.iterations == stats.iteration_time.count == stats.poll_time.count ==
+        stats.callbacks.count == stats.events.count == stats.fds.count,
+        stats.snapshot())
+    check("callbacks counted", stats.callbacks.total >= 20 and stats.callbacks.max >= 20,
+        stats.callbacks.snapshot())
+    check("timers lateness", stats.timer_lateness.count >= 4 and
+        stats.last_timer_lateness >= 0, stats.timer_lateness.snapshot())
+    check("times", stats.last_iteration_time >= stats.last_poll_time >= 0 and
+        stats.poll_time.max > 0.005, stats.snapshot())
+
+    # fds the reactor is waiting on; a transport reading and writing at once
+    # counts once
+    idle_fds = stats.last_fds
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+    listener.accept()
+    conn.read(10)
+    yield settle(reactor)
+    fds = stats.last_fds
+    check("fds counted", fds == idle_fds + 2, (idle_fds, fds))
+    check("events counted", stats.events.total >= 2, stats.events.snapshot())
+    # the peer doesn't read, so the write stays pending
+    conn.write("x" * 50000000)
+    yield settle(reactor)
+    check("reading and writing counts once", stats.last_fds == fds, (fds, stats.last_fds))
+
+    # callback hooks are called around every callback, I/O handlers included
+    calls = []
+    before = lambda func, args: calls.append(("before", func))
+    after = lambda func, args: calls.append(("after", func))
+    stats.add_hook("before_callback", before)
+    stats.add_hook("after_callback", after)
+    reactor.call(noop)
+    peer.write("hello")
+    yield settle(reactor)
+    stats.remove_hook("before_callback", before)
+    stats.remove_hook("after_callback", after)
+    # the hooks are removed from within a callback, which is left unpaired
+    del calls[-1]
+    check("callback hooks pair up", calls and [point for point, _ in calls] == 
+        ["before", "after"] * (len(calls) // 2) and all(calls[i][1] is calls[i + 1][1] 
+        for i in range(0, len(calls), 2)), [(p, getattr(f, "__name__", f)) for p, f in calls])
+    funcs = [func for _, func in calls]
+    check("callback hooks see callbacks and I/O handlers", noop in funcs and 
+        any(getattr(func, "__self__", None) is conn for func in funcs), funcs)
+
+    for trns in (conn, peer, listener):
+        trns.close()
+    snap = stats.snapshot()
+    check("snapshot", snap["iterations"] == stats.iterations and
+        snap["last"]["fds"] == stats.last_fds and snap["fds"]["count"] == stats.iterations,
+        snap)
+    stats.reset()
+    stats.disable()
+    yield settle(reactor)
+    check("reset and disabled", stats.iterations == 0 and stats.fds.count == 0,
+        stats.snapshot())
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
@@ -0,0 +1,129 @@
+import sys
+import time
+import threading
+import microactor
+from microactor.utils import ReactorDeferred
+
+
+THREADS = 4
+POSTS = 5000
+
+def check(what, ok, got):
+    if ok:
+        print "OK:", what
+    else:
+        print "ERROR:", what, "got", repr(got)[:200]
+
+@microactor.reactive
+def wait_for(reactor, cond, timeout = 5):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline:
+        yield reactor.jobs.sleep(0.01)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(20, reactor.stop)
+
+    # the waker is an eventfd where available (reading and writing the same fd)
+    waker = getattr(reactor, "_waker", None)
+    if waker is not None:
+        print "waker:", "eventfd" if waker.rfd == waker.wfd else "pipe"
+
+    # wakeups are counted on their way to the real waker
+    wakeups = [0]
+    wakeup = reactor._wakeup
+    def counting_wakeup():
+        wakeups[0] += 1
+        wakeup()
+    reactor._wakeup = counting_wakeup
+
+    # many callbacks posted from several threads: each thread's run in order
+    got = dict((i, []) for i in range(THREADS))
+    plain = []
+    def post(index):
+        seq = got[index]
+        for i in range(POSTS):
+            reactor.call_threadsafe(seq.append, i)
+            if i % 100 == 0:
+                reactor.call_threadsafe(lambda: plain.append(None))
+    threads = [threading.Thread(target = post, args = (i,)) for i in range(THREADS)]
+    for thd in threads:
+        thd.start()
+    yield wait_for(reactor, lambda: sum(len(seq) for seq in got.values()) == THREADS * POSTS)
+    for thd in threads:
+        thd.join()
+    check("all posted callbacks ran in order",
+        all(seq == range(POSTS) for seq in got.values()) and len(plain) == THREADS * POSTS // 100,
+        dict((i, len(seq)) for i, seq in got.items()))
+    posts = THREADS * (POSTS + POSTS // 100)
+    check("wakeups coalesced (%d for %d posts)" % (wakeups[0], posts),
+        0 < wakeups[0] < posts, wakeups[0])
+
+    # an idle reactor is woken up right away (not at its poll timeout)
+    dfr = ReactorDeferred(reactor)
+    posted = []
+    def post_later():
+        time.sleep(0.1)
+        posted.append(time.time())
+        reactor.call_threadsafe(dfr.set)
+    thd = threading.Thread(target = post_later)
+    thd.start()
+    yield dfr
+    woken = time.time() - posted[0]
+    thd.join()
+    check("idle reactor woken up", woken < 0.1, woken)
+    del reactor._wakeup
+
+    # callbacks beyond the per-iteration budget are left for the next
+    # iterations, with polls in between
+    polls = [0]
+    def count_poll(events):
+        polls[0] += 1
+    reactor.stats.add_hook("after_poll", count_poll)
+    reactor.CALLBACKS_BUDGET = 100
+    reactor.CALLBACKS_TIME_BUDGET = None
+    ran = []
+    for i in range(250):
+        reactor.call(lambda: ran.append(polls[0]))
+    yield wait_for(reactor, lambda: len(ran) == 250)
+    sizes = [ran.count(p) for p in sorted(set(ran))]
+    check("count budget", sizes == [100, 100, 50], sizes)
+
+    # the same goes for callbacks drained from the inbox
+    del ran[:]
+    def post_many():
+        for i in range(250):
+            reactor.call_threadsafe(lambda: ran.append(polls[0]))
+    thd = threading.Thread(target = post_many)
+    thd.start()
+    thd.join()
+    yield wait_for(reactor, lambda: len(ran) == 250)
+    sizes = [ran.count(p) for p in sorted(set(ran))]
+    check("count budget of posted callbacks", len(sizes) >= 3 and max(sizes) <= 100 and
+        sum(sizes) == 250, sizes)
+
+    # and with a time budget (checked every 16 callbacks)
+    reactor.CALLBACKS_BUDGET = None
+    reactor.CALLBACKS_TIME_BUDGET = 0.01
+    del ran[:]
+    def slow():
+        ran.append(polls[0])
+        time.sleep(0.001)
+    for i in range(64):
+        reactor.call(slow)
+    yield wait_for(reactor, lambda: len(ran) == 64)
+    sizes = [ran.count(p) for p in sorted(set(ran))]
+    check("time budget", len(sizes) >= 4 and max(sizes) == 16, sizes)
+
+    del reactor.CALLBACKS_BUDGET
+    del reactor.CALLBACKS_TIME_BUDGET
+    reactor.stats.remove_hook("after_poll", count_poll)
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)
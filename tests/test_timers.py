@@ -0,0 +1,27 @@
+import microactor
+
+
+@microactor.reactive
+def main(reactor):
+    fired = []
+    t0 = reactor.clock()
+    reactor.call_later(0.2, fired.append, "late")
+    reactor.call_later(0.1, fired.append, "early")
+    canceled = reactor.call_later(0.15, fired.append, "canceled")
+    canceled.cancel()
+    job = reactor.jobs.schedule(0.05, fired.append, "job")
+    dead_job = reactor.jobs.schedule(0.05, fired.append, "dead job")
+    dead_job.cancel()
+    yield job
+    yield reactor.jobs.sleep(0.3)
+    print "fired", fired, "after", reactor.clock() - t0
+    if fired == ["job", "early", "late"]:
+        print "OK: timers fired in order"
+    else:
+        print "ERROR: unexpected timers", fired
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    reactor = microactor.get_reactor()
+    reactor.run(main)
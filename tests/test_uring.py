@@ -0,0 +1,50 @@
+import socket
+import microactor
+from microactor.reactors import IoUringReactor
+
+
+PAYLOAD = "x" * (4 * 1024 * 1024)
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(10, reactor.stop)
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    reactor.call(do_server, listener)
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    print "connected", type(conn).__name__
+    received = 0
+    while True:
+        data = yield conn.read(100000)
+        if not data:
+            break
+        received += len(data)
+    conn.close()
+    if received == len(PAYLOAD):
+        print "OK: got", received, "bytes"
+    else:
+        print "ERROR: got", received, "bytes out of", len(PAYLOAD)
+
+    listener.close()
+    try:
+        yield reactor.net.connect_tcp("127.0.0.1", port)
+    except socket.error as ex:
+        ex._handled = True
+        print "OK: connection refused", ex
+    else:
+        print "ERROR: connected to a closed port"
+    reactor.stop()
+
+@microactor.reactive
+def do_server(listener):
+    conn = yield listener.accept()
+    yield conn.write(PAYLOAD)
+    conn.close()
+
+
+if __name__ == "__main__":
+    if not IoUringReactor.supported():
+        print "io_uring not supported; skipping"
+    else:
+        reactor = IoUringReactor()
+        reactor.run(main)
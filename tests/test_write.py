@@ -0,0 +1,113 @@
+import microactor
+
+
+PAYLOAD = "".join(chr(i % 251) for i in xrange(3 * 1024 * 1024 + 17))
+
+@microactor.reactive
+def drain(trns, count):
+    chunks = []
+    while count > 0:
+        data = yield trns.read(count)
+        if not data:
+            break
+        chunks.append(data)
+        count -= len(data)
+    microactor.utils.rreturn("".join(chunks))
+
+@microactor.reactive
+def main(reactor):
+    reactor.jobs.schedule(20, reactor.stop)
+    listener = yield reactor.net.listen_tcp(0, "127.0.0.1")
+    port = listener.sock.getsockname()[1]
+    accepted = listener.accept()
+    conn = yield reactor.net.connect_tcp("127.0.0.1", port)
+    peer = yield accepted
+    for name, data in [("str", PAYLOAD), ("bytearray", bytearray(PAYLOAD)),
+            ("memoryview", memoryview(PAYLOAD)[17:]), ("small bytearray", bytearray("hello"))]:
+        expected = str(data) if not isinstance(data, memoryview) else data.tobytes()
+        received = drain(peer, len(data))
+        yield conn.write(data)
+        got = yield received
+        if got == expected:
+            print "OK:", name, len(got), "bytes"
+        else:
+            print "ERROR:", name, "got", len(got), "bytes out of", len(expected)
+
+    # a bytearray can't be resized while it's being written
+    data = bytearray(PAYLOAD)
+    received = drain(peer, len(PAYLOAD))
+    dfr = conn.write(data)
+    try:
+        del data[len(data) // 2:]
+    except BufferError:
+        resized = False
+    else:
+        resized = True
+    yield dfr
+    got = yield received
+    if not resized and got == PAYLOAD:
+        print "OK: bytearray locked while written"
+    else:
+        print "ERROR: bytearray resized while written", resized, len(got)
+
+    # many writes at once, without waiting for each other
+    msgs = ["%d," % (i,) for i in range(1000)]
+    received = drain(peer, len("".join(msgs)))
+    dfrs = [conn.write(msg) for msg in msgs]
+    yield reactor.jobs.gather(dfrs)
+    got = yield received
+    if got == "".join(msgs):
+        print "OK: pipelined writes", len(dfrs)
+    else:
+        print "ERROR: pipelined writes got", repr(got[:100])
+
+    # canceling a queued write leaves out just that one
+    dfrs = [conn.write(msg) for msg in ["a", "b", "c"]]
+    dfrs[1].cancel()
+    received = drain(peer, 2)
+    yield dfrs[2]
+    got = yield received
+    if got == "ac" and not dfrs[1].is_set():
+        print "OK: canceled queued write", got
+    else:
+        print "ERROR: canceled queued write", got
+    # canceling a write that's partly out sends the rest of it anyway, so
+    # the next message doesn't follow a truncated one
+    big = PAYLOAD * 3
+    dfr = conn.write(big)
+    yield reactor.jobs.sleep(0.1)
+    started = not dfr.is_set()
+    dfr.cancel()
+    received = drain(peer, len(big) + 6)
+    yield conn.write("<NEXT>")
+    conn.close()
+    got = yield received
+    if started and got == big + "<NEXT>":
+        print "OK: canceled started write", len(got)
+    else:
+        print "ERROR: canceled started write", started, len(got), repr(got[-20:])
+    peer.close()
+    listener.close()
+
+    # pipes go through file objects, which report no count (keep within the
+    # pipe's buffer, as they don't cope with partial writes)
+    reader, writer = yield reactor.io.pipe()
+    received = drain(reader, 50000)
+    yield writer.write(PAYLOAD[:50000])
+    got = yield received
+    if got == PAYLOAD[:50000]:
+        print "OK: pipe", len(got), "bytes"
+    else:
+        print "ERROR: pipe got", len(got), "bytes"
+    reader.close()
+    writer.close()
+    reactor.stop()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        reactor = getattr(microactor.reactors, sys.argv[1])()
+    else:
+        reactor = microactor.get_reactor()
+    reactor.run(main)